@@ -0,0 +1,185 @@
+"""Admission control for the expensive sync endpoints.
+
+FastAPI runs every sync handler on one shared threadpool, so a burst of
+requests stuck waiting on POWER can take every thread, and then /forecast and
+/stats queue behind them. Routes decorated with @limit() instead run in a
+lane: a ThreadPoolExecutor of its own ("upstream" for handlers that wait on
+POWER, "cpu" for ones that compute), which leaves the shared pool to the cheap
+endpoints.
+
+Each route also has a concurrency limit. Requests over it wait on the event
+loop, which holds no thread, and once max_waiting of them are waiting further
+ones are shed. A lane whose own queue is at max_queue sheds too. Shed requests
+get a 503 whose Retry-After is estimated from the recent service time. All of
+this is per process; stats() backs /api/admission.
+"""
+import asyncio, functools, math, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from app.config import (
+    CPU_LANE_WORKERS, LANE_MAX_QUEUE, ROUTE_CONCURRENCY, ROUTE_MAX_WAITING, UPSTREAM_LANE_WORKERS,
+)
+
+MAX_RETRY_AFTER = 60
+# Weight of the newest request in the service time averages
+EWMA_ALPHA = 0.2
+
+
+class OverloadedError(Exception):
+    """Raised when a lane or route can't take another request."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(service_seconds: float, backlog: int, parallelism: int) -> int:
+    """Seconds until backlog requests ahead of this one should have been served."""
+    return min(MAX_RETRY_AFTER, max(1, math.ceil(service_seconds * (backlog + 1) / max(parallelism, 1))))
+
+
+class Lane:
+    """A fixed pool of threads with a bounded queue."""
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queued = self.active = 0
+        self.completed = self.shed = 0
+        self.service_seconds = 0.0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); OverloadedError if the queue is full."""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.shed += 1
+                raise OverloadedError(
+                    f"{self.name} lane is full",
+                    _retry_after(self.service_seconds, self.queued, self.workers),
+                )
+            self.queued += 1
+            if self._executor is None:
+                # Created on first use so no threads exist in the gunicorn master
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"lane-{self.name}")
+        future = self._executor.submit(self._run, fn, args, kwargs)
+        future.add_done_callback(self._dequeue_cancelled)
+        return future
+
+    def _run(self, fn, args, kwargs):
+        started = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self.service_seconds += EWMA_ALPHA * (elapsed - self.service_seconds)
+
+    def _dequeue_cancelled(self, future):
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "shed": self.shed,
+            "service_ms": round(self.service_seconds * 1000, 1),
+        }
+
+
+class RouteLimit:
+    """At most concurrency requests of one route in its lane, max_waiting more waiting."""
+
+    def __init__(self, name: str, lane: Lane, concurrency: int, max_waiting: int):
+        self.name = name
+        self.lane = lane
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.running = self.waiting = 0
+        self.shed = 0
+        self.service_seconds = 0.0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(self, fn, *args, **kwargs):
+        # Only touched from the event loop, so the counters need no lock
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.shed += 1
+            raise OverloadedError(
+                f"Too many {self.name} requests",
+                _retry_after(self.service_seconds, self.waiting, self.concurrency),
+            )
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            future = self.lane.submit(fn, *args, **kwargs)
+        except OverloadedError:
+            self._semaphore.release()
+            raise
+        self.running += 1
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        # The slot is held until the thread is done, even if the client goes away
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, started))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, started: float):
+        self.running -= 1
+        self.service_seconds += EWMA_ALPHA * (time.monotonic() - started - self.service_seconds)
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "lane": self.lane.name,
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "shed": self.shed,
+            "service_ms": round(self.service_seconds * 1000, 1),
+        }
+
+
+lanes = {
+    "upstream": Lane("upstream", UPSTREAM_LANE_WORKERS, LANE_MAX_QUEUE),
+    "cpu": Lane("cpu", CPU_LANE_WORKERS, LANE_MAX_QUEUE),
+}
+routes = {}
+
+
+def limit(name: str, lane: str):
+    """Run a sync handler in lane under the ROUTE_CONCURRENCY[name] limit; 503 when shed."""
+    route = routes[name] = RouteLimit(name, lanes[lane], ROUTE_CONCURRENCY[name], ROUTE_MAX_WAITING)
+
+    def decorate(handler):
+        # functools.wraps keeps the handler's signature for FastAPI's parameter parsing
+        @functools.wraps(handler)
+        async def admitted(*args, **kwargs):
+            try:
+                return await route.call(handler, *args, **kwargs)
+            except OverloadedError as e:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        return admitted
+    return decorate
+
+
+def stats() -> dict:
+    """Queue depths and shed counts per lane and per route."""
+    return {
+        "lanes": {name: lane.stats() for name, lane in lanes.items()},
+        "routes": {name: route.stats() for name, route in sorted(routes.items())},
+    }
@@ -0,0 +1,84 @@
+"""Local archive of POWER daily history, one .npz file per grid cell.
+
+Each file holds one LocationSeries (start day, column names, float32 block,
+QC flags). The backfill command (python -m app.backfill) fills it in bulk;
+fetch_history reads from it before asking POWER, which then only has to send the
+days since the last backfill. Writes merge with what is
+already stored and replace the file atomically, so a crash never leaves a
+half-written cell behind.
+"""
+import os
+import numpy as np
+from app.config import ARCHIVE_DIR
+from app.grid import from_key
+from app.qc import QC_MISSING
+from app.series import LocationSeries, day_number
+
+
+def path(cell, directory: str = ARCHIVE_DIR) -> str:
+    return os.path.join(directory, cell.key + ".npz")
+
+
+# Suffix of a cell file still being written by write()
+TMP_SUFFIX = ".tmp.npz"
+
+
+def cells(directory: str = ARCHIVE_DIR):
+    """Every archived cell, leaving out files a running backfill hasn't finished."""
+    if not os.path.isdir(directory):
+        return []
+    return [from_key(f[:-4]) for f in sorted(os.listdir(directory)) if f.endswith(".npz") and not f.endswith(TMP_SUFFIX)]
+
+
+def load(cell, directory: str = ARCHIVE_DIR):
+    """The archived series for cell, or None."""
+    try:
+        with np.load(path(cell, directory)) as f:
+            return LocationSeries(int(f["start"]), [str(n) for n in f["names"]], f["values"], f["qc"])
+    except FileNotFoundError:
+        return None
+
+
+def read_window(cell, start, end, directory: str = ARCHIVE_DIR):
+    """Archived part of [start, end] for cell, or None if the archive doesn't reach start.
+
+    The archive stops where the last backfill did, so the part returned may
+    end before end; the caller fetches the remaining days from POWER.
+    """
+    series = load(cell, directory)
+    if series is None or series.start > day_number(start) or series.end < day_number(start):
+        return None
+    window = series.window(start, end)
+    # Detach from the full-length arrays so only the window stays in memory
+    return LocationSeries(window.start, window.names, window.values.copy(), window.qc.copy())
+
+
+def merge(old: LocationSeries, new: LocationSeries) -> LocationSeries:
+    """Union of two series for the same cell; new values win unless they are missing."""
+    names = list(old.names) + [n for n in new.names if n not in old.names]
+    start = min(old.start, new.start)
+    end = max(old.end, new.end)
+    values = np.full((len(names), end - start + 1), np.nan, dtype=np.float32)
+    qc = np.full(end - start + 1, QC_MISSING, dtype=np.uint8)
+    for series in (old, new):
+        i = series.start - start
+        j = i + len(series)
+        usable = (series.qc & QC_MISSING) == 0
+        for k, name in enumerate(series.names):
+            target = values[names.index(name), i:j]
+            target[usable] = series.values[k][usable]
+        qc[i:j][usable] = series.qc[usable]
+    return LocationSeries(start, names, values, qc)
+
+
+def write(cell, series: LocationSeries, directory: str = ARCHIVE_DIR) -> LocationSeries:
+    """Merge series into the cell's archive file. Returns what was stored."""
+    old = load(cell, directory)
+    if old is not None:
+        series = merge(old, series)
+    os.makedirs(directory, exist_ok=True)
+    target = path(cell, directory)
+    tmp = target[:-4] + TMP_SUFFIX
+    np.savez(tmp, start=series.start, names=np.array(series.names), values=series.values, qc=series.qc)
+    os.replace(tmp, target)
+    return series
@@ -0,0 +1,110 @@
+"""Process-wide read-only store for models and climatology arrays.
+
+In production the pre-fork master (see gunicorn.conf.py) calls preload() and
+freeze() before forking, so every worker shares the same physical pages
+copy-on-write instead of loading its own copy. Arrays are marked read-only so
+nothing in a worker dirties those pages by accident. Climatology arrays are
+memory-mapped .npy files, which the OS page cache shares between processes
+even without fork. In development (uvicorn --reload) everything loads lazily
+on first use instead.
+"""
+import gc, os, threading
+from app.config import CLIMATOLOGY_DIR, MODEL_PRELOAD
+from app.memory import register_cache
+
+_models = {}
+_arrays = {}
+_lock = threading.RLock()  # reentrant: a loader may itself call get_model()
+_preloaded = False
+
+def put_array(name: str, arr):
+    """Register an array, made contiguous and read-only."""
+    import numpy as np
+
+    arr = np.ascontiguousarray(arr)
+    arr.setflags(write=False)
+    _arrays[name] = arr
+    return arr
+
+def get_array(name: str):
+    return _arrays.get(name)
+
+def get_model(name: str, loader):
+    """Return the model registered as name, loading it once with loader() if needed."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        if name not in _models:
+            _models[name] = loader()
+        return _models[name]
+
+def load_climatology(directory: str = CLIMATOLOGY_DIR) -> int:
+    """Memory-map every .npy file in directory into the arena. Returns the count."""
+    if not os.path.isdir(directory):
+        return 0
+    import numpy as np
+
+    count = 0
+    for fname in sorted(os.listdir(directory)):
+        if fname.endswith(".npy"):
+            put_array(fname[:-4], np.load(os.path.join(directory, fname), mmap_mode="r"))
+            count += 1
+    return count
+
+def preload():
+    """Load everything a worker needs up front. Safe to call more than once."""
+    global _preloaded
+    with _lock:
+        if _preloaded:
+            return
+        _preloaded = True
+    try:
+        from app import ml
+    except ImportError:
+        print("⚠️  ML libraries not found - nothing to preload")
+        return
+    from app.forest import IncompatibleModelError
+
+    try:
+        ml.load_forest()
+        print("✅ Global model preloaded")
+    except FileNotFoundError:
+        print("No trained model found, workers will use the seasonal fallback")
+    except IncompatibleModelError as e:
+        print(f"⚠️  Global model not usable ({e}), workers will use the seasonal fallback")
+    if MODEL_PRELOAD:
+        from app.model_store import model_store
+
+        print(f"✅ {model_store.warm(MODEL_PRELOAD)} site/region models preloaded")
+    n = load_climatology()
+    if n:
+        print(f"✅ {n} climatology arrays mapped")
+
+def warm_up():
+    """Run preload() on a background thread so startup isn't blocked on heavy imports."""
+    thread = threading.Thread(target=preload, name="arena-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def freeze():
+    """Move everything allocated so far out of the GC's reach before forking.
+
+    Without this the collector touches every object header in each worker and
+    the shared pages get copied anyway.
+    """
+    gc.collect()
+    gc.freeze()
+
+def stats() -> dict:
+    arrays = {name: int(arr.nbytes) for name, arr in _arrays.items()}
+    models = sorted(_models)
+    compiled = sum(m.nbytes for m in _models.values() if hasattr(m, "nbytes"))
+    return {
+        "entries": len(models) + len(arrays),
+        "bytes": sum(arrays.values()) + compiled,
+        "models": models,
+        "arrays": arrays,
+    }
+
+register_cache("arena", stats)
@@ -0,0 +1,171 @@
+"""Bulk backfill of POWER daily history into the local archive (app.archive).
+
+    python -m app.backfill --bbox 35,-80,45,-70 --years 1991-2020
+    python -m app.backfill --location 40.71,-74.01 --location 51.51,-0.13 --years 2000-2024
+    python -m app.backfill --locations-file sites.csv --years 1981-2024 --concurrency 8 --rate 4
+
+Locations are snapped to POWER grid cells, so a bounding box becomes every
+cell inside it and duplicate sites are fetched once. Each cell's year range is
+split into --chunk-years requests; chunks run through a shared token bucket
+(--rate requests/second) on --concurrency threads, are merged in memory and
+written to the cell's archive file in one go. Finished cells are appended to a
+checkpoint file, so rerunning the same command after an interruption skips
+them; cells whose archive already covers the range are skipped too.
+"""
+import argparse, datetime as dt, os, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app import archive
+from app.config import ARCHIVE_DIR
+from app.grid import Cell, N_COLS, snap
+from app.resilience import TokenBucket
+
+DEFAULT_PARAMS = "TS,WS10M,RH2M,PS"
+
+
+def cells_in_bbox(south: float, west: float, north: float, east: float):
+    """Every grid cell with its centre in the box (west > east crosses the antimeridian)."""
+    lo, hi = snap(south, west), snap(north, east)
+    n_cols = (hi.col - lo.col) % N_COLS + 1
+    return [Cell(row, (lo.col + k) % N_COLS) for row in range(lo.row, hi.row + 1) for k in range(n_cols)]
+
+
+def parse_locations(values, filename: str = None):
+    """Cells for 'lat,lon' strings and/or a file with one 'lat,lon' per line, deduplicated."""
+    lines = list(values or [])
+    if filename:
+        with open(filename) as f:
+            lines += [line for line in f if line.strip() and not line.startswith("#")]
+    cells = []
+    for line in lines:
+        lat, lon = (float(x) for x in line.replace(";", ",").split(",")[:2])
+        cells.append(snap(lat, lon))
+    return list(dict.fromkeys(cells))
+
+
+def year_chunks(first_year: int, last_year: int, chunk_years: int):
+    """[(start, end)] POWER date strings covering the years, clamped to yesterday."""
+    yesterday = dt.date.today() - dt.timedelta(days=1)
+    ranges = []
+    for year in range(first_year, last_year + 1, chunk_years):
+        start = dt.date(year, 1, 1)
+        end = min(dt.date(min(year + chunk_years - 1, last_year), 12, 31), yesterday)
+        if start <= end:
+            ranges.append((start.strftime("%Y%m%d"), end.strftime("%Y%m%d")))
+    return ranges
+
+
+class Checkpoint:
+    """Append-only record of finished (cell, years, params) units."""
+
+    def __init__(self, filename: str, tag: str):
+        self.filename = filename
+        self.tag = tag
+        self._lock = threading.Lock()
+        self.done = set()
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.done = {line.split()[0] for line in f if line.rstrip().endswith(" " + tag)}
+
+    def mark(self, cell):
+        with self._lock:
+            with open(self.filename, "a") as f:
+                f.write(f"{cell.key} {self.tag}\n")
+            self.done.add(cell.key)
+
+
+def backfill_cell(cell, ranges, bucket: TokenBucket, params: str = DEFAULT_PARAMS,
+                  retries: int = 3, directory: str = ARCHIVE_DIR):
+    """Fetch every chunk for one cell and write them to its archive. Returns the request count."""
+    from app.nasa_client import fetch_power_arrays
+    from app.series import LocationSeries
+
+    merged, requests = None, 0
+    for start, end in ranges:
+        for attempt in range(retries + 1):
+            bucket.acquire()
+            requests += 1
+            try:
+                part = LocationSeries.from_arrays(*fetch_power_arrays(cell.lat, cell.lon, start, end, params, timeout=120))
+                break
+            except Exception as e:
+                # CircuitOpenError included: back off and let the upstream recover
+                if attempt == retries:
+                    raise
+                print(f"  {cell.key} {start}-{end} failed ({e}), retrying")
+                time.sleep(min(60, 2 ** attempt * 5))
+        merged = part if merged is None else archive.merge(merged, part)
+    if merged is not None:
+        archive.write(cell, merged, directory)
+    return requests
+
+
+def _covered(cell, ranges, directory: str) -> bool:
+    from app.series import day_number
+
+    series = archive.load(cell, directory)
+    return series is not None and series.start <= day_number(ranges[0][0]) and series.end >= day_number(ranges[-1][1])
+
+
+def run(cells, ranges, concurrency: int = 4, rate: float = 2.0, params: str = DEFAULT_PARAMS,
+        checkpoint: Checkpoint = None, directory: str = ARCHIVE_DIR) -> dict:
+    """Backfill cells over ranges. Returns counts of done, skipped and failed cells."""
+    pending = [c for c in cells if not (checkpoint and c.key in checkpoint.done) and not _covered(c, ranges, directory)]
+    skipped = len(cells) - len(pending)
+    print(f"{len(cells)} cells, {skipped} already done, {len(pending)} to fetch in {len(ranges)} chunk(s) each")
+
+    bucket = TokenBucket(rate, burst=max(1.0, rate))
+    started = time.monotonic()
+    done, failed, requests = 0, [], 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="backfill") as pool:
+        futures = {pool.submit(backfill_cell, c, ranges, bucket, params, directory=directory): c for c in pending}
+        for future in as_completed(futures):
+            cell = futures[future]
+            try:
+                requests += future.result()
+                done += 1
+                if checkpoint:
+                    checkpoint.mark(cell)
+            except Exception as e:
+                failed.append(cell.key)
+                print(f"  {cell.key} gave up: {e}")
+            elapsed = time.monotonic() - started
+            print(f"[{done + len(failed)}/{len(pending)}] {cell.key}  {requests / elapsed:.2f} req/s")
+    return {"done": done, "skipped": skipped, "failed": failed, "requests": requests,
+            "seconds": round(time.monotonic() - started, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    where = parser.add_argument_group("locations (at least one)")
+    where.add_argument("--bbox", help="south,west,north,east in degrees")
+    where.add_argument("--location", action="append", help="lat,lon (repeatable)")
+    where.add_argument("--locations-file", help="file with one lat,lon per line")
+    parser.add_argument("--years", required=True, help="first-last, e.g. 1991-2020")
+    parser.add_argument("--chunk-years", type=int, default=10, help="years per POWER request")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="max POWER requests per second")
+    parser.add_argument("--params", default=DEFAULT_PARAMS)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--checkpoint", help="default: <archive-dir>/backfill.checkpoint")
+    args = parser.parse_args(argv)
+
+    cells = parse_locations(args.location, args.locations_file)
+    if args.bbox:
+        cells = list(dict.fromkeys(cells + cells_in_bbox(*(float(x) for x in args.bbox.split(",")))))
+    if not cells:
+        parser.error("give --bbox, --location or --locations-file")
+    first, _, last = args.years.partition("-")
+    ranges = year_chunks(int(first), int(last or first), args.chunk_years)
+
+    os.makedirs(args.archive_dir, exist_ok=True)
+    checkpoint = Checkpoint(
+        args.checkpoint or os.path.join(args.archive_dir, "backfill.checkpoint"),
+        tag=f"{args.years}:{args.params}",
+    )
+    summary = run(cells, ranges, args.concurrency, args.rate, args.params, checkpoint, args.archive_dir)
+    print(f"Done: {summary}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
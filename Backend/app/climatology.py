@@ -0,0 +1,86 @@
+"""Monthly climatology grids for the map tiles (app.tiles), built from the archive.
+
+    python -m app.climatology
+    python -m app.climatology --archive-dir data/archive --out data/climatology
+
+Every cell archived by app.backfill contributes the mean and standard
+deviation of each column per calendar month, over the days that are not
+QC_MISSING. They are written to <column>.npy and <column>_std.npy, float32
+(12, N_ROWS, N_COLS) grids that are NaN wherever a cell has fewer than
+MIN_DAYS usable days in a month; tiles use the seasonal model there. Files
+are replaced atomically. Workers map them at start (app.arena), so restart
+them after a rebuild.
+"""
+import argparse, os
+import numpy as np
+from app import archive
+from app.config import ARCHIVE_DIR, CLIMATOLOGY_DIR
+from app.grid import N_COLS, N_ROWS
+from app.qc import QC_MISSING
+
+COLUMNS = ("ts", "rh2m", "ws10m", "ps")
+# Fewer usable days of a calendar month than this and the cell stays NaN
+MIN_DAYS = 20
+
+
+def monthly_stats(series, column: str):
+    """(mean, std) arrays of shape (12,) for column, NaN for months with too few days."""
+    mean = np.full(12, np.nan, dtype=np.float32)
+    std = np.full(12, np.nan, dtype=np.float32)
+    if column not in series:
+        return mean, std
+    values = series[column].astype(np.float64)
+    usable = ((series.qc & QC_MISSING) == 0) & ~np.isnan(values)
+    months = series.dates().astype("datetime64[M]").astype(np.int64) % 12
+    for m in range(12):
+        v = values[usable & (months == m)]
+        if len(v) >= MIN_DAYS:
+            mean[m], std[m] = v.mean(), v.std()
+    return mean, std
+
+
+def build(archive_dir: str = ARCHIVE_DIR, columns=COLUMNS):
+    """{name: grid} for every column and its _std, from all archived cells."""
+    shape = (12, N_ROWS, N_COLS)
+    grids = {}
+    for column in columns:
+        grids[column] = np.full(shape, np.nan, dtype=np.float32)
+        grids[column + "_std"] = np.full(shape, np.nan, dtype=np.float32)
+    cells = archive.cells(archive_dir)
+    for cell in cells:
+        series = archive.load(cell, archive_dir)
+        for column in columns:
+            mean, std = monthly_stats(series, column)
+            grids[column][:, cell.row, cell.col] = mean
+            grids[column + "_std"][:, cell.row, cell.col] = std
+    return grids, len(cells)
+
+
+def write(grids, directory: str = CLIMATOLOGY_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for name, grid in grids.items():
+        target = os.path.join(directory, name + ".npy")
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, grid)
+        os.replace(tmp, target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--out", default=CLIMATOLOGY_DIR, help="directory the tiles read (CLIMATOLOGY_DIR)")
+    args = parser.parse_args(argv)
+
+    grids, n = build(args.archive_dir)
+    if not n:
+        print(f"No archived cells in {args.archive_dir}; run python -m app.backfill first")
+        return 1
+    write(grids, args.out)
+    covered = int((~np.isnan(grids[COLUMNS[0]])).any(axis=0).sum())
+    print(f"Wrote {len(grids)} grids to {args.out} from {n} archived cells ({covered} with data)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,4 +2,121 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 NASA_POWER_URL = os.getenv("NASA_POWER_URL", "https://power.larc.nasa.gov/api/temporal")
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
\ No newline at end of file
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+# Shared secret for /api/admin/* (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# POWER circuit breaker and /current stale-while-revalidate cache
+POWER_BREAKER_WINDOW = float(os.getenv("POWER_BREAKER_WINDOW", "60"))
+POWER_BREAKER_MIN_CALLS = int(os.getenv("POWER_BREAKER_MIN_CALLS", "5"))
+POWER_BREAKER_ERROR_RATE = float(os.getenv("POWER_BREAKER_ERROR_RATE", "0.5"))
+POWER_BREAKER_BASE_BACKOFF = float(os.getenv("POWER_BREAKER_BASE_BACKOFF", "5"))
+POWER_BREAKER_MAX_BACKOFF = float(os.getenv("POWER_BREAKER_MAX_BACKOFF", "300"))
+CURRENT_FRESH_SECONDS = float(os.getenv("CURRENT_FRESH_SECONDS", "900"))
+CURRENT_MAX_STALE_SECONDS = float(os.getenv("CURRENT_MAX_STALE_SECONDS", "86400"))
+
+# Timeout of a single POWER request. It is independent of the endpoint
+# deadlines below: the caller stops waiting at its deadline, but the request
+# runs on and fills the caches for the next caller
+POWER_TIMEOUT_SECONDS = float(os.getenv("POWER_TIMEOUT_SECONDS", "10"))
+
+# HTTP cache lifetimes (seconds) for responses not tied to POWER's daily cadence
+FALLBACK_MAX_AGE = int(os.getenv("FALLBACK_MAX_AGE", "60"))
+SYNTHETIC_MAX_AGE = int(os.getenv("SYNTHETIC_MAX_AGE", "300"))
+# Seed the synthetic weather model per (grid cell, hour) so repeated requests
+# return identical, cacheable payloads; 0 draws fresh random numbers each time
+SYNTHETIC_DETERMINISTIC = os.getenv("SYNTHETIC_DETERMINISTIC", "1") != "0"
+
+# Directory of .npy climatology arrays memory-mapped into the shared arena
+CLIMATOLOGY_DIR = os.getenv("CLIMATOLOGY_DIR", "data/climatology")
+
+# p99 latency SLO per endpoint (ms). SOURCE_BUDGET_FRACTION of it is given to
+# the data-source chain, the rest is kept for computing the response.
+LATENCY_SLO_MS = {
+    "current": float(os.getenv("SLO_CURRENT_MS", "800")),
+    "predict": float(os.getenv("SLO_PREDICT_MS", "2500")),
+    "probability": float(os.getenv("SLO_PROBABILITY_MS", "2500")),
+    "analyze": float(os.getenv("SLO_ANALYZE_MS", "5000")),
+}
+SOURCE_BUDGET_FRACTION = float(os.getenv("SOURCE_BUDGET_FRACTION", "0.7"))
+SOURCE_WORKERS = int(os.getenv("SOURCE_WORKERS", "32"))
+# An archive read (including any recent days it has to fetch) still running
+# after this long is hedged by starting the live POWER request alongside it
+ARCHIVE_HEDGE_MS = float(os.getenv("ARCHIVE_HEDGE_MS", "100"))
+HISTORY_CACHE_MB = float(os.getenv("HISTORY_CACHE_MB", "64"))
+
+# When POWER can't answer, a cached neighbouring grid cell within this
+# distance is preferred over the synthetic model
+NEIGHBOR_FALLBACK_KM = float(os.getenv("NEIGHBOR_FALLBACK_KM", "75"))
+
+# Admission control (app.admission): thread pools for handlers that wait on
+# POWER and for CPU-bound ones, the most requests each pool queues, and per
+# route how many run at once and how many more may wait before 503s
+UPSTREAM_LANE_WORKERS = int(os.getenv("UPSTREAM_LANE_WORKERS", "32"))
+CPU_LANE_WORKERS = int(os.getenv("CPU_LANE_WORKERS", str(os.cpu_count() or 2)))
+LANE_MAX_QUEUE = int(os.getenv("LANE_MAX_QUEUE", "64"))
+ROUTE_CONCURRENCY = {
+    "current": int(os.getenv("CONCURRENCY_CURRENT", "16")),
+    "at_time": int(os.getenv("CONCURRENCY_AT_TIME", "8")),
+    "predict": int(os.getenv("CONCURRENCY_PREDICT", "8")),
+    "probability": int(os.getenv("CONCURRENCY_PROBABILITY", "8")),
+    "analyze": int(os.getenv("CONCURRENCY_ANALYZE", "4")),
+    "tiles": int(os.getenv("CONCURRENCY_TILES", str(os.cpu_count() or 2))),
+}
+ROUTE_MAX_WAITING = int(os.getenv("ROUTE_MAX_WAITING", "32"))
+
+# Longest run of missing POWER days (hours, for hourly data) filled by
+# interpolation at ingest
+QC_MAX_GAP_DAYS = int(os.getenv("QC_MAX_GAP_DAYS", "3"))
+QC_MAX_GAP_HOURS = int(os.getenv("QC_MAX_GAP_HOURS", "6"))
+
+# Hourly POWER requests (/api/weather/at-time): long ranges are split into
+# chunks of this many days fetched by up to POWER_HOURLY_WORKERS threads, and
+# hourly series are cached per grid cell up to HOURLY_CACHE_MB
+POWER_HOURLY_CHUNK_DAYS = int(os.getenv("POWER_HOURLY_CHUNK_DAYS", "31"))
+POWER_HOURLY_WORKERS = int(os.getenv("POWER_HOURLY_WORKERS", "4"))
+HOURLY_CACHE_MB = float(os.getenv("HOURLY_CACHE_MB", "32"))
+
+# Background analysis jobs (POST /api/ml/analyze?mode=job)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+# Finished jobs are kept this long for polling and deduplication
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+# Jobs don't hold a client connection, so they can wait longer for real data
+JOB_DEADLINE_SECONDS = float(os.getenv("JOB_DEADLINE_SECONDS", "30"))
+
+# Memory cap for memoized /analyze results; entries expire when the daily
+# POWER data they were computed from is replaced (next UTC midnight)
+ANALYSIS_MEMO_MB = float(os.getenv("ANALYSIS_MEMO_MB", "16"))
+
+# Server-sent events (/api/weather/stream): how often each watched grid cell
+# is recomputed, and the idle keepalive interval
+PUSH_INTERVAL_SECONDS = float(os.getenv("PUSH_INTERVAL_SECONDS", "60"))
+PUSH_HEARTBEAT_SECONDS = float(os.getenv("PUSH_HEARTBEAT_SECONDS", "15"))
+
+# Smallest per-day standard deviation (°C) taken from the forest's tree spread,
+# so days where every tree agrees don't produce 0%/100% probabilities
+PREDICT_SPREAD_FLOOR = float(os.getenv("PREDICT_SPREAD_FLOOR", "0.5"))
+
+# Monte Carlo period probabilities (app.montecarlo): trajectories drawn per
+# request, and the time after which a simulation is abandoned (the response
+# then falls back to independent days and is flagged)
+MONTE_CARLO_SAMPLES = int(os.getenv("MONTE_CARLO_SAMPLES", "8000"))
+MONTE_CARLO_BUDGET_MS = float(os.getenv("MONTE_CARLO_BUDGET_MS", "250"))
+
+# Per-site/per-region models (app.model_store): directory of <key>.pkl files,
+# memory budget for the compiled models kept resident, region size in degrees,
+# and comma-separated keys to load before forking
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MODEL_CACHE_MB = float(os.getenv("MODEL_CACHE_MB", "256"))
+MODEL_REGION_DEGREES = float(os.getenv("MODEL_REGION_DEGREES", "5"))
+MODEL_PRELOAD = [k for k in os.getenv("MODEL_PRELOAD", "").split(",") if k]
+
+# Memory cap for the engineered feature rows kept per grid cell (app.features)
+FEATURE_CACHE_MB = float(os.getenv("FEATURE_CACHE_MB", "32"))
+
+# Encoded map tiles (/api/weather/tiles) kept in memory
+TILE_CACHE_MB = float(os.getenv("TILE_CACHE_MB", "64"))
+
+# Local archive of POWER daily history filled by `python -m app.backfill`
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "data/archive")
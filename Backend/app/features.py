@@ -0,0 +1,223 @@
+"""Model inputs: one feature schema shared by training and inference.
+
+FEATURE_SCHEMA fixes the model's input columns and their order. Rows are
+built straight from a LocationSeries into a contiguous float32
+(n_days, n_features) block, so training, the backtest's batch prediction and
+the API's single predictions all compute features with the same code.
+
+The POWER columns of a day's row hold the values observed LAG_DAYS earlier.
+A model predicting a day's POWER values (app.ml.TARGETS) therefore never sees
+that day's own values, and a block built from history up to day d already
+has complete rows for d+1..d+LAG_DAYS: forecasting up to LAG_DAYS ahead uses
+the same inputs the model was trained on.
+
+feature_store keeps one block per grid cell. As a cell's history moves
+forward only the new days (and any days POWER has revised since) are
+computed and appended; a forecast then only copies a slice of rows.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.config import FEATURE_CACHE_MB
+from app.grid import snap
+from app.memory import register_cache
+from app.series import LocationSeries
+
+# Date and location features first, then the (lagged) POWER columns. A model
+# with k inputs reads the first k columns, so models trained without the POWER
+# columns keep working.
+FEATURE_SCHEMA = ("doy", "month", "lat", "lon", "ws10m", "rh2m", "ps", "ts")
+BASE_FEATURES = 4
+# Days between a row's date and the POWER observations in it; /predict's
+# longest horizon
+LAG_DAYS = 14
+# Location features used when training without a location
+DEFAULT_LOCATION = (40.7, -74.0)
+
+
+def schema_for(series) -> tuple:
+    """The leading part of FEATURE_SCHEMA that series has the columns for."""
+    names = list(FEATURE_SCHEMA[:BASE_FEATURES])
+    for name in FEATURE_SCHEMA[BASE_FEATURES:]:
+        if name not in series:
+            break
+        names.append(name)
+    return tuple(names)
+
+
+def date_features(days) -> np.ndarray:
+    """(n, 2) day of year and month for day numbers (days since 1970-01-01)."""
+    d = np.asarray(days, dtype=np.int64).astype("datetime64[D]")
+    year = d.astype("datetime64[Y]")
+    out = np.empty((len(d), 2), dtype=np.float32)
+    out[:, 0] = (d - year).astype(np.int64) + 1
+    out[:, 1] = (d.astype("datetime64[M]") - year).astype(np.int64) + 1
+    return out
+
+
+def as_series(hist) -> LocationSeries:
+    return hist if isinstance(hist, LocationSeries) else LocationSeries.from_frame(hist)
+
+
+class FeatureBlock:
+    """Feature rows for consecutive days of one location; row i is day start + i.
+
+    Rows run LAG_DAYS past the last observed day, and the POWER columns of the
+    first LAG_DAYS rows are NaN.
+    """
+
+    __slots__ = ("start", "names", "lat", "lon", "_rows", "_n")
+
+    def __init__(self, start: int, names, lat: float, lon: float, capacity: int = 0):
+        self.start = int(start)
+        self.names = tuple(names)
+        self.lat = lat
+        self.lon = lon
+        self._rows = np.empty((max(capacity, 1), len(self.names)), dtype=np.float32)
+        self._n = 0
+
+    @classmethod
+    def build(cls, series, lat: float = None, lon: float = None) -> "FeatureBlock":
+        if lat is None or lon is None:
+            lat, lon = DEFAULT_LOCATION
+        block = cls(series.start, schema_for(series), lat, lon, capacity=len(series) + LAG_DAYS)
+        if len(series):
+            block._write(series, series.start)
+        return block
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def end(self) -> int:
+        """Day number of the last row (inclusive)."""
+        return self.start + self._n - 1
+
+    @property
+    def last_observed(self) -> int:
+        """Day number of the last observation the rows were built from."""
+        return self.end - LAG_DAYS
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._rows[:self._n]
+
+    @property
+    def nbytes(self) -> int:
+        return self._rows.nbytes
+
+    def rows(self, first_day: int, last_day: int) -> np.ndarray:
+        """View of the rows for first_day..last_day (inclusive), clipped to the block."""
+        i = max(0, first_day - self.start)
+        j = min(self._n, last_day - self.start + 1)
+        return self._rows[i:max(i, j)]
+
+    def extend(self, series) -> bool:
+        """Bring the rows for series' days up to date; False if the block can't take it."""
+        if (schema_for(series) != self.names or series.start < self.start
+                or series.start > self.last_observed + 1):
+            return False
+        first = self.end + 1
+        overlap = min(self.last_observed, series.end)
+        power = self.names[BASE_FEATURES:]
+        if power and overlap >= series.start:
+            # POWER revises its most recent days; recompute from the first
+            # row holding a changed one
+            old = self.rows(series.start + LAG_DAYS, overlap + LAG_DAYS)[:, BASE_FEATURES:]
+            new = np.stack([series[n][:len(old)] for n in power], axis=1)
+            changed = ~((old == new) | (np.isnan(old) & np.isnan(new))).all(axis=1)
+            if changed.any():
+                first = series.start + LAG_DAYS + int(changed.argmax())
+        if first <= series.end + LAG_DAYS:
+            self._write(series, first)
+        return True
+
+    def _write(self, series, first_day: int):
+        i = first_day - self.start
+        j = series.end + LAG_DAYS - self.start + 1
+        if j > len(self._rows):
+            grown = np.empty((max(j, 2 * len(self._rows)), len(self.names)), dtype=np.float32)
+            grown[:self._n] = self._rows[:self._n]
+            self._rows = grown
+        rows = self._rows[i:j]
+        rows[:, :2] = date_features(np.arange(first_day, first_day + len(rows)))
+        rows[:, 2] = self.lat
+        rows[:, 3] = self.lon
+        # Index into series of the first row's observations; rows before the
+        # series has any get NaN
+        offset = first_day - LAG_DAYS - series.start
+        pad = max(0, -offset)
+        for c, name in enumerate(self.names[BASE_FEATURES:], BASE_FEATURES):
+            rows[:pad, c] = np.nan
+            rows[pad:, c] = series[name][offset + pad:]
+        self._n = max(self._n, j)
+
+
+def forecast_rows(block: FeatureBlock, last_day: int, future_days) -> np.ndarray:
+    """Inputs for future_days given observations up to last_day.
+
+    Days up to LAG_DAYS after last_day get their own rows; further ones get
+    the latest observations (the row of last_day + LAG_DAYS) with their own
+    date features.
+    """
+    future_days = np.asarray(future_days)
+    days = np.minimum(future_days, last_day + LAG_DAYS)
+    X = block.values[np.clip(days - block.start, 0, len(block) - 1)]
+    X[:, :2] = date_features(future_days)
+    return X
+
+
+def future_day_numbers(future_dates) -> np.ndarray:
+    """Day numbers of a pandas DatetimeIndex."""
+    return np.asarray(future_dates.values.astype("datetime64[D]").astype(np.int64))
+
+
+class FeatureStore:
+    """LRU of FeatureBlocks per grid cell, bounded by bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.builds = self.extends = 0
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def forecast(self, lat: float, lon: float, hist, future_dates) -> np.ndarray:
+        """forecast_rows() for the location's grid cell, from its history up to the last day."""
+        cell = snap(lat, lon)
+        series = as_series(hist)
+        with self._lock:
+            block = self._block(cell, series)
+            # Copied under the lock: a later extend() may rewrite these rows in place
+            return forecast_rows(block, series.end, future_day_numbers(future_dates))
+
+    def _block(self, cell, series) -> FeatureBlock:
+        block = self._blocks.pop(cell, None)
+        if block is not None:
+            self.nbytes -= block.nbytes
+            if block.extend(series):
+                self.extends += 1
+            else:
+                block = None
+        if block is None:
+            block = FeatureBlock.build(series, cell.lat, cell.lon)
+            self.builds += 1
+        self._blocks[cell] = block
+        self.nbytes += block.nbytes
+        while self.nbytes > self.max_bytes and len(self._blocks) > 1:
+            _, evicted = self._blocks.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        return block
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._blocks),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "builds": self.builds,
+            "extends": self.extends,
+        }
+
+
+feature_store = FeatureStore(int(FEATURE_CACHE_MB * 1024 * 1024))
+register_cache("features", feature_store.stats)
@@ -0,0 +1,122 @@
+"""Random forest compiled to flat numpy arrays.
+
+sklearn's RandomForestRegressor.predict() only returns the mean over trees;
+getting each tree's output means calling every estimator separately. Here the
+fitted trees are copied once into padded (n_trees, max_nodes) arrays and all
+trees are walked together, one depth level per step, so a single vectorized
+pass yields the full (n_trees, n_samples, n_outputs) distribution of tree
+outputs. Its mean is the forest prediction; its spread is the uncertainty.
+
+Leaves point back at themselves, so nodes that reach a leaf early just stay
+there until the deepest tree is done. A NaN feature goes to the side sklearn
+learned for missing values at that node (tree_.missing_go_to_left), as
+sklearn's own predict() does.
+
+A multi-output model (see app.ml.train_model) predicts several POWER columns
+from one traversal; `targets` names them in output order. Models trained on
+standardized targets have their leaf values scaled back to physical units here.
+
+Models record the feature schema and lag they were trained with
+(feature_schema_, lag_days_); compile_forest() refuses any other, since fed
+today's feature rows they would silently predict from the wrong inputs.
+"""
+import numpy as np
+from app.features import FEATURE_SCHEMA, LAG_DAYS
+
+
+class IncompatibleModelError(Exception):
+    """Raised for a model trained on a different feature schema than the current one."""
+
+
+class CompiledForest:
+    __slots__ = ("feature", "threshold", "left", "right", "missing_left", "value", "depth", "n_features", "targets")
+
+    def __init__(self, feature, threshold, left, right, value, depth: int, n_features: int, targets=("ts",),
+                 missing_left=None):
+        self.feature = feature        # (n_trees, max_nodes) int32, 0 at leaves
+        self.threshold = threshold    # (n_trees, max_nodes) float64
+        self.left = left              # (n_trees, max_nodes) int32, self at leaves
+        self.right = right
+        self.value = value            # (n_trees, max_nodes, n_outputs) float64
+        self.depth = depth
+        self.n_features = n_features
+        self.targets = tuple(targets)    # POWER column of each output
+        # (n_trees, max_nodes) bool: where a NaN feature goes
+        self.missing_left = missing_left if missing_left is not None else np.zeros(feature.shape, dtype=bool)
+
+    @property
+    def n_trees(self) -> int:
+        return self.feature.shape[0]
+
+    @property
+    def n_outputs(self) -> int:
+        return self.value.shape[2]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.missing_left, self.value))
+
+    def tree_outputs(self, X) -> np.ndarray:
+        """Every tree's prediction for every row: (n_trees, n_samples, n_outputs)."""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n = X.shape[0]
+        trees = np.arange(self.n_trees)[:, None]
+        rows = np.broadcast_to(np.arange(n), (self.n_trees, n))
+        node = np.zeros((self.n_trees, n), dtype=np.int32)
+        for _ in range(self.depth):
+            x = X[rows, self.feature[trees, node]]
+            go_left = np.where(np.isnan(x), self.missing_left[trees, node], x <= self.threshold[trees, node])
+            node = np.where(go_left, self.left[trees, node], self.right[trees, node])
+        return self.value[trees, node]
+
+    def predict(self, X) -> np.ndarray:
+        return self.tree_outputs(X).mean(axis=0)
+
+
+def check_schema(model):
+    """Raise IncompatibleModelError unless model was trained on today's feature rows."""
+    expected = FEATURE_SCHEMA[:model.n_features_in_]
+    schema = tuple(getattr(model, "feature_schema_", ()))
+    lag = getattr(model, "lag_days_", None)
+    if schema != expected or lag != LAG_DAYS:
+        raise IncompatibleModelError(
+            f"model was trained on features {schema or 'of an older version'} with lag {lag}, "
+            f"expected {expected} with lag {LAG_DAYS}; retrain it"
+        )
+
+
+def compile_forest(model) -> CompiledForest:
+    """Copy a fitted sklearn forest regressor's trees into padded arrays.
+
+    Raises IncompatibleModelError for a model of another feature schema.
+    """
+    check_schema(model)
+    trees = [est.tree_ for est in model.estimators_]
+    n_trees = len(trees)
+    max_nodes = max(t.node_count for t in trees)
+    n_outputs = trees[0].value.shape[1]
+
+    feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    threshold = np.zeros((n_trees, max_nodes), dtype=np.float64)
+    left = np.tile(np.arange(max_nodes, dtype=np.int32), (n_trees, 1))
+    right = left.copy()
+    missing_left = np.zeros((n_trees, max_nodes), dtype=bool)
+    value = np.zeros((n_trees, max_nodes, n_outputs), dtype=np.float64)
+    for i, t in enumerate(trees):
+        k = t.node_count
+        internal = t.children_left[:k] >= 0
+        feature[i, :k] = np.where(internal, t.feature[:k], 0)
+        threshold[i, :k] = t.threshold[:k]
+        left[i, :k] = np.where(internal, t.children_left[:k], np.arange(k))
+        right[i, :k] = np.where(internal, t.children_right[:k], np.arange(k))
+        # Only in sklearn >= 1.3; older versions reject NaN inputs anyway
+        if hasattr(t, "missing_go_to_left"):
+            missing_left[i, :k] = np.asarray(t.missing_go_to_left[:k], dtype=bool) & internal
+        value[i, :k] = t.value[:k, :, 0]
+    # Single-output temperature models predate these attributes
+    if hasattr(model, "target_scale_"):
+        value = value * model.target_scale_ + model.target_mean_
+    depth = max(t.max_depth for t in trees)
+    targets = getattr(model, "targets_", ("ts",))
+    return CompiledForest(feature, threshold, left, right, value, depth, model.n_features_in_, targets, missing_left)
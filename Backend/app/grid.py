@@ -0,0 +1,113 @@
+"""Snap coordinates onto the NASA POWER grid.
+
+POWER's meteorological parameters come from MERRA-2, a 0.5° x 0.625° grid, and
+a point request returns the value of the cell containing the point. Two clicks
+a few hundred metres apart are therefore the same data; every cache keys on
+the Cell instead of raw coordinates so they share entries.
+"""
+import math, threading
+from typing import NamedTuple
+
+LAT_STEP = 0.5
+LON_STEP = 0.625
+N_ROWS = int(180 / LAT_STEP) + 1
+N_COLS = int(360 / LON_STEP)
+EARTH_RADIUS_KM = 6371.0
+
+
+class Cell(NamedTuple):
+    row: int
+    col: int
+
+    @property
+    def lat(self) -> float:
+        return -90.0 + self.row * LAT_STEP
+
+    @property
+    def lon(self) -> float:
+        lon = -180.0 + self.col * LON_STEP
+        return lon - 360.0 if lon >= 180.0 else lon
+
+    @property
+    def key(self) -> str:
+        """Stable string form for file names and logs."""
+        return f"r{self.row:03d}c{self.col:03d}"
+
+
+def snap(lat: float, lon: float) -> Cell:
+    """Return the grid cell whose centre is nearest to (lat, lon)."""
+    row = min(N_ROWS - 1, max(0, int(math.floor((lat + 90.0) / LAT_STEP + 0.5))))
+    col = int(math.floor((lon + 180.0) / LON_STEP + 0.5)) % N_COLS
+    return Cell(row, col)
+
+def snap_many(lats, lons):
+    """Vectorized snap(): returns (rows, cols) integer arrays."""
+    import numpy as np
+
+    rows = np.clip(np.floor((np.asarray(lats) + 90.0) / LAT_STEP + 0.5), 0, N_ROWS - 1).astype(np.int32)
+    cols = (np.floor((np.asarray(lons) + 180.0) / LON_STEP + 0.5) % N_COLS).astype(np.int32)
+    return rows, cols
+
+def from_key(key: str) -> Cell:
+    return Cell(int(key[1:4]), int(key[5:8]))
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def cells_within(lat: float, lon: float, radius_km: float):
+    """All grid cells whose centres lie within radius_km of (lat, lon), nearest first."""
+    dlat = radius_km / 111.0
+    coslat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(180.0, radius_km / (111.0 * coslat))
+    lo, hi = snap(max(-90.0, lat - dlat), lon), snap(min(90.0, lat + dlat), lon)
+    n_cols = min(N_COLS, int(math.ceil(2 * dlon / LON_STEP)) + 3)
+    first_col = snap(lat, lon - dlon).col - 1
+    found = []
+    for row in range(lo.row, hi.row + 1):
+        for k in range(n_cols):
+            cell = Cell(row, (first_col + k) % N_COLS)
+            d = haversine_km(lat, lon, cell.lat, cell.lon)
+            if d <= radius_km:
+                found.append((d, cell))
+    return [cell for _, cell in sorted(set(found))]
+
+
+class CellIndex:
+    """Set of grid cells we hold data for, with radius and nearest-neighbour queries."""
+
+    def __init__(self):
+        self._cells = set()
+        self._lock = threading.Lock()
+
+    def add(self, cell: Cell):
+        with self._lock:
+            self._cells.add(cell)
+
+    def discard(self, cell: Cell):
+        with self._lock:
+            self._cells.discard(cell)
+
+    def __contains__(self, cell: Cell) -> bool:
+        return cell in self._cells
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def within(self, lat: float, lon: float, radius_km: float):
+        """Known cells within radius_km of (lat, lon), nearest first."""
+        candidates = cells_within(lat, lon, radius_km)
+        # Scanning the known set is cheaper once it is smaller than the search disc
+        if len(self._cells) < len(candidates):
+            with self._lock:
+                known = list(self._cells)
+            hits = [(haversine_km(lat, lon, c.lat, c.lon), c) for c in known]
+            return [c for d, c in sorted(hits) if d <= radius_km]
+        return [c for c in candidates if c in self._cells]
+
+    def nearest(self, lat: float, lon: float, max_km: float):
+        """The closest known cell within max_km, or None."""
+        hits = self.within(lat, lon, max_km)
+        return hits[0] if hits else None
@@ -0,0 +1,47 @@
+import hashlib, json
+from datetime import datetime, timedelta
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Top-level keys that describe the request rather than the data; they are left
+# out of the ETag so identical data hashes the same on every call
+VOLATILE_KEYS = ("timestamp", "generated_at", "provenance")
+
+def compute_etag(payload: dict, volatile=VOLATILE_KEYS) -> str:
+    """Return a strong ETag derived from the response content."""
+    content = {k: v for k, v in payload.items() if k not in volatile}
+    body = json.dumps(jsonable_encoder(content), sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return etag in candidates or f"W/{etag}" in candidates
+
+def seconds_until_utc_midnight(now: datetime = None) -> int:
+    """Max-age for data that only changes when POWER publishes a new day."""
+    now = now or datetime.utcnow()
+    tomorrow = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return max(60, int((tomorrow - now).total_seconds()))
+
+def seconds_until_next_hour(now: datetime = None) -> int:
+    """Max-age for synthetic data that is regenerated every UTC hour (see app.rng)."""
+    now = now or datetime.utcnow()
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return max(1, int((next_hour - now).total_seconds()))
+
+def cached_json(request: Request, payload: dict, max_age: int, stale_while_revalidate: int = 0) -> Response:
+    """Return payload as JSON with ETag/Cache-Control, or a bare 304 if the client is current."""
+    etag = compute_etag(payload)
+    cache_control = f"public, max-age={int(max_age)}"
+    if stale_while_revalidate:
+        cache_control += f", stale-while-revalidate={int(stale_while_revalidate)}"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(payload), headers=headers)
@@ -0,0 +1,127 @@
+"""In-process job queue for long-running analyses.
+
+A bounded PriorityQueue feeds a fixed pool of worker threads, so heavy work
+runs off the HTTP workers and clients poll (or long-poll) for the result
+instead of holding a request open. Submitting a job whose key is already
+queued, running or recently finished returns that job rather than starting a
+second one. Workers start lazily on the first submit so nothing is spawned in
+the gunicorn master before fork.
+"""
+import itertools, queue, threading, time
+from app.config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RESULT_TTL
+from app.memory import register_cache
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    __slots__ = ("key", "priority", "status", "result", "error",
+                 "submitted_at", "started_at", "finished_at", "_fn", "_done")
+
+    def __init__(self, key, fn, priority: int):
+        self.key = key
+        self.priority = priority
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._fn = fn
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        out = {
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == DONE:
+            out["result"] = self.result
+        elif self.status == FAILED:
+            out["error"] = self.error
+        return out
+
+
+class JobQueue:
+    """Bounded priority queue (lower number runs first, FIFO within a priority)."""
+
+    def __init__(self, workers: int, max_pending: int, result_ttl: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._queue = queue.PriorityQueue()
+        self._jobs = {}      # key -> Job
+        self._seq = itertools.count()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, priority: int = 1):
+        """Queue fn() under key. Returns (job, created)."""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            created = job is None or job.status == FAILED
+            if created:
+                if self._queue.qsize() >= self.max_pending:
+                    raise QueueFullError(f"{self._queue.qsize()} jobs already queued")
+                job = Job(key, fn, priority)
+                self._jobs[key] = job
+                self._queue.put((priority, next(self._seq), job))
+                self._start_workers()
+        return job, created
+
+    def get(self, key):
+        """Job by key, or None once it has expired."""
+        with self._lock:
+            return self._jobs.get(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": len(self._threads), "pending": self._queue.qsize(), "jobs": counts}
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        for key in [k for k, j in self._jobs.items() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[key]
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name=f"job-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = job._fn()
+                job.status = DONE
+            except Exception as e:
+                print(f"Job {job.key} failed: {e}")
+                job.error = str(e)
+                job.status = FAILED
+            job.finished_at = time.time()
+            job._fn = None
+            job._done.set()
+
+
+analysis_jobs = JobQueue(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RESULT_TTL)
+register_cache("analysis_jobs", analysis_jobs.stats)
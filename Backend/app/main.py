@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import weather
+from app import admission, arena
+from app.routers import weather, ml, admin
 
 app = FastAPI(title="Jupiter", version="1.0.0")
 
@@ -13,7 +14,19 @@ app.add_middleware(
 )
 
 app.include_router(weather.router)
+app.include_router(ml.router)
+app.include_router(admin.router)
+
+@app.on_event("startup")
+def warm_up():
+    # Heavy ML imports and the model load happen off the request path
+    arena.warm_up()
 
 @app.get("/")
 def root():
-    return {"message": "Jupiter - NASA Weather Intelligence API"}
\ No newline at end of file
+    return {"message": "Jupiter - NASA Weather Intelligence API"}
+
+@app.get("/api/admission")
+async def admission_status():
+    """Queue depths of the admission-controlled lanes and routes (async: answers even when they're saturated)."""
+    return admission.stats()
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""Memoized analysis results.
+
+Results are stored under the normalized criteria (grid cell, parameter,
+operator, threshold, dates) with a per-entry expiry, evicted least recently
+used once the stored payloads exceed a byte budget. Entry size is the length
+of the JSON encoding, which is what the result costs to hold and send.
+"""
+import json, threading, time
+from collections import OrderedDict
+from app.config import ANALYSIS_MEMO_MB
+from app.grid import snap
+from app.memory import register_cache
+
+
+def analysis_key(lat: float, lon: float, parameter: str, operator: str, threshold: float,
+                 start_date: str, end_date: str) -> tuple:
+    """Normalized criteria: points in the same POWER cell analyse the same data."""
+    return (snap(lat, lon), parameter, operator, float(threshold), start_date, end_date)
+
+
+class TTLMemo:
+    """Thread-safe LRU of results with per-entry expiry and a byte cap."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The stored value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl: float):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.time() + ttl, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self.nbytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+analysis_memo = TTLMemo(int(ANALYSIS_MEMO_MB * 1024 * 1024))
+register_cache("analysis_memo", analysis_memo.stats)
@@ -0,0 +1,125 @@
+"""Process memory introspection: RSS, registered cache sizes and tracemalloc.
+
+Every in-process cache registers a stats function here with register_cache()
+so /api/admin/memory can show what each one holds. Allocation tracing is off
+by default (it slows allocation down noticeably) and is switched on and off
+through the admin endpoints; named snapshots can then be compared to find what
+grows. All of it is per process: with several gunicorn workers each one
+answers for itself.
+"""
+import os, threading, tracemalloc
+from collections import OrderedDict
+
+MAX_SNAPSHOTS = 10
+
+_caches = {}
+_snapshots = OrderedDict()  # label -> tracemalloc.Snapshot
+_lock = threading.Lock()
+
+
+def register_cache(name: str, stats_fn):
+    """Report stats_fn() (a dict, ideally with "entries" and "bytes") under name."""
+    _caches[name] = stats_fn
+
+
+def cache_sizes() -> dict:
+    out = {}
+    for name, stats_fn in sorted(_caches.items()):
+        try:
+            out[name] = stats_fn()
+        except Exception as e:
+            out[name] = {"error": str(e)}
+    return out
+
+
+def rss_bytes() -> dict:
+    """Current and peak resident set size of this process."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        pass
+    return {"rss": current, "peak_rss": peak}
+
+
+def start_tracing(frames: int = 1) -> bool:
+    """Start tracemalloc keeping `frames` frames per allocation. False if already running."""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+
+def stop_tracing():
+    """Stop tracemalloc and drop the snapshots (they can't be compared with later ones)."""
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+
+
+def tracing_status() -> dict:
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        "snapshots": list(_snapshots),
+    }
+
+
+def _snapshot():
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("allocation tracing is not running")
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def take_snapshot(label: str) -> str:
+    """Store a snapshot under label; the oldest is dropped beyond MAX_SNAPSHOTS."""
+    snapshot = _snapshot()
+    with _lock:
+        _snapshots.pop(label, None)
+        _snapshots[label] = snapshot
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return label
+
+
+def _get_snapshot(label: str = None):
+    if label is None:
+        return _snapshot()
+    try:
+        return _snapshots[label]
+    except KeyError:
+        raise KeyError(f"no snapshot named {label!r}")
+
+
+def _describe(stat, group_by: str) -> dict:
+    where = stat.traceback.format() if group_by == "traceback" else str(stat.traceback[0])
+    return {"where": where, "bytes": stat.size, "count": stat.count}
+
+
+def top(limit: int = 20, group_by: str = "lineno", label: str = None) -> list:
+    """Largest allocation sites in a stored snapshot (or a fresh one)."""
+    stats = _get_snapshot(label).statistics(group_by)
+    return [_describe(s, group_by) for s in stats[:limit]]
+
+
+def diff(base: str, compare: str = None, limit: int = 20, group_by: str = "lineno") -> list:
+    """Sites whose allocations changed most between two snapshots (compare defaults to now)."""
+    stats = _get_snapshot(compare).compare_to(_get_snapshot(base), group_by)
+    return [
+        {**_describe(s, group_by), "bytes_diff": s.size_diff, "count_diff": s.count_diff}
+        for s in stats[:limit]
+    ]
@@ -1,80 +1,164 @@
-import joblib, os, pandas as pd, numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.metrics import mean_squared_error
+import joblib, os, numpy as np
+from app import arena
+from app.config import PREDICT_SPREAD_FLOOR
 
 MODEL_PATH = "rf_temp.pkl"
 
-def engineer(df: pd.DataFrame) -> pd.DataFrame:
-    """Add temporal features."""
-    df = df.copy()
-    df["doy"] = df.index.dayofyear
-    df["month"] = df.index.month
-    if hasattr(df, 'lat') and not df.empty:
-        df["lat"] = df.lat.iloc[0] if 'lat' in df.columns else 40.7  # Default lat
-        df["lon"] = df.lon.iloc[0] if 'lon' in df.columns else -74.0  # Default lon
-    else:
-        df["lat"] = 40.7
-        df["lon"] = -74.0
-    return df
-
-def train_model(df: pd.DataFrame):
-    """Train Random-Forest on TS (temperature)."""
-    df = engineer(df)
-    # Updated column names for new NASA POWER parameters
-    feature_cols = ["doy", "month", "lat", "lon"]
-    if "ws10m" in df.columns:
-        feature_cols.append("ws10m")
-    if "rh2m" in df.columns:
-        feature_cols.append("rh2m") 
-    if "ps" in df.columns:
-        feature_cols.append("ps")
-    
-    X = df[feature_cols]
-    y = df["ts"]
+# POWER columns the model predicts, in output order. ts is always one; the
+# others are added when the training history has them
+TARGETS = ("ts", "rh2m", "ws10m", "ps")
+# PREDICT_SPREAD_FLOOR for every target
+SPREAD_FLOOR = {"ts": PREDICT_SPREAD_FLOOR, "rh2m": 2.0, "ws10m": 0.3, "ps": 0.05}  # °C, %, m/s, kPa
+
+def train_model(df, key: str = None, lat: float = None, lon: float = None):
+    """Train one multi-output Random-Forest on TS, RH2M, WS10M and PS.
+
+    df is the history of one location (DataFrame or LocationSeries); lat/lon
+    are its location features (see app.features). Targets missing from the
+    history are left out, except ts which is required. They are standardized
+    for fitting so each weighs the same in the split criterion; the model
+    keeps targets_, target_mean_ and target_scale_ for app.forest to undo
+    that, and feature_schema_ and lag_days_ so a model from an older schema
+    is refused rather than fed rows it wasn't trained on. With key (a grid cell or region key, see app.model_store) the model
+    is saved as that site's/region's model instead of the global one.
+    """
+    # Training-only imports; serving gets sklearn through unpickling the model
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import TimeSeriesSplit
+    from app.features import FEATURE_SCHEMA, LAG_DAYS, FeatureBlock, as_series
+    from app.qc import QC_MISSING
+
+    series = as_series(df)
+    targets = [t for t in TARGETS if t in series]
+    X = FeatureBlock.build(series, lat, lon).rows(series.start, series.end)
+    Y = np.stack([series[t] for t in targets], axis=1).astype(np.float64)
+    # Rows the ingest QC stage couldn't repair can't be used as targets, and
+    # the first LAG_DAYS rows have no lagged inputs
+    keep = ((series.qc & QC_MISSING) == 0) & ~np.isnan(Y).any(axis=1) & ~np.isnan(X).any(axis=1)
+    X, Y = X[keep], Y[keep]
+    mean, scale = Y.mean(axis=0), Y.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = (Y - mean) / scale
+    if len(targets) == 1:
+        Z = Z[:, 0]
     tscv = TimeSeriesSplit(n_splits=5)
     best = None
-    best_rmse = 1e9
+    best_rmse = None
     for train_idx, test_idx in tscv.split(X):
         rf = RandomForestRegressor(
             n_estimators=100, max_depth=15, random_state=42
         )
-        rf.fit(X.iloc[train_idx], y.iloc[train_idx])
-        pred = rf.predict(X.iloc[test_idx])
-        rmse = mean_squared_error(y.iloc[test_idx], pred, squared=False)
-        if rmse < best_rmse:
+        rf.fit(X[train_idx], Z[train_idx])
+        err = rf.predict(X[test_idx]) - Z[test_idx]
+        rmse = np.sqrt((err.reshape(len(test_idx), -1) ** 2).mean(axis=0))
+        # Standardized errors, so the targets count equally
+        if best_rmse is None or rmse.mean() < best_rmse.mean():
             best_rmse = rmse
             best = rf
-    joblib.dump(best, MODEL_PATH)
-    print("Model saved – RMSE", best_rmse)
+    best.targets_ = tuple(targets)
+    best.target_mean_ = mean
+    best.target_scale_ = scale
+    best.feature_schema_ = FEATURE_SCHEMA[:X.shape[1]]
+    best.lag_days_ = LAG_DAYS
+    if key:
+        from app.model_store import model_store
 
-def load_model():
+        model_store.save(key, best)
+    else:
+        joblib.dump(best, MODEL_PATH)
+    print("Model saved – RMSE", ", ".join(f"{t} {r:.3f}" for t, r in zip(targets, best_rmse * scale)))
+
+def _load_model_file():
     if not os.path.exists(MODEL_PATH):
         raise FileNotFoundError("Run training first")
     return joblib.load(MODEL_PATH)
 
-def predict(df_future: pd.DataFrame) -> np.ndarray:
-    """Return 14-day temperature predictions."""
+def load_model():
+    """Return the global model, loaded from disk once per process (or pre-fork)."""
+    return arena.get_model(MODEL_PATH, _load_model_file)
+
+def load_forest():
+    """The global model compiled for whole-forest evaluation (see app.forest)."""
+    from app.forest import compile_forest
+
+    return arena.get_model(MODEL_PATH + "#compiled", lambda: compile_forest(load_model()))
+
+def forecast(hist, future_dates, lat: float, lon: float, quantiles=(0.025, 0.975)) -> dict:
+    """Predictions for future_dates of every TARGETS column in a location's history.
+
+    hist is the history (DataFrame or LocationSeries) of the location's grid
+    cell; its feature rows come from app.features.feature_store. All columns
+    the model predicts come from one pass over the forest (see
+    predict_features()). Columns it doesn't predict (single-output models)
+    fall back to persistence_forecast(), and ts without any model to the
+    seasonal fallback; those have lower, upper and scale set to None.
+    """
+    from app.features import as_series, feature_store
+
+    series = as_series(hist)
+    X = feature_store.forecast(lat, lon, series, future_dates)
+    out = predict_features(X, lat, lon, quantiles)
+    for target in TARGETS[1:]:
+        if target not in out and target in series:
+            recent = series[target][-14:]
+            out[target] = (persistence_forecast(recent, future_dates, target), None, None, None)
+    return out
+
+def predict_with_spread(hist, future_dates, lat: float, lon: float, quantiles=(0.025, 0.975), target: str = "ts"):
+    """forecast()'s (mean, lower, upper, scale) for one target."""
+    return forecast(hist, future_dates, lat, lon, quantiles)[target]
+
+def predict_features(X: np.ndarray, lat: float = None, lon: float = None, quantiles=(0.025, 0.975)) -> dict:
+    """Predictions plus per-row uncertainty from the spread of the trees.
+
+    X holds feature rows in app.features.FEATURE_SCHEMA order, for any number
+    of days. Given lat/lon, the location's site or region model is used when
+    one exists (see app.model_store), otherwise the global model.
+
+    Returns {target: (mean, lower, upper, scale)} for each column the model
+    predicts: lower/upper are the given quantiles of the individual tree
+    outputs and scale is their standard deviation (floored at
+    SPREAD_FLOOR[target]). Every target comes from one vectorized pass over
+    the forest. Without a trained model only ts is returned, from the
+    seasonal fallback, with lower, upper and scale set to None; so does a
+    model trained on another feature schema.
+    """
+    from app.forest import IncompatibleModelError
+
     try:
-        model = load_model()
-        df = engineer(df_future)
-        
-        # Use available features
-        feature_cols = ["doy", "month", "lat", "lon"]
-        if "ws10m" in df.columns:
-            feature_cols.append("ws10m")
-        if "rh2m" in df.columns:
-            feature_cols.append("rh2m")
-        if "ps" in df.columns:
-            feature_cols.append("ps")
-            
-        X = df[feature_cols]
-        preds = model.predict(X)
-        return preds
-    except FileNotFoundError:
-        # Fallback: simple seasonal model if no trained model
-        print("No trained model found, using seasonal fallback")
-        df = engineer(df_future)  # Make sure df is defined for fallback
+        if lat is not None and lon is not None:
+            from app.model_store import model_store
+
+            _, forest = model_store.forest_for(lat, lon)
+        else:
+            forest = load_forest()
+    except (FileNotFoundError, IncompatibleModelError) as e:
+        # Fallback: simple seasonal model if no usable trained model
+        print(f"No usable trained model ({e}), using seasonal fallback")
         base_temp = 20.0
-        seasonal_variation = np.sin(df.index.dayofyear * 2 * np.pi / 365) * 10
-        return base_temp + seasonal_variation
\ No newline at end of file
+        seasonal_variation = np.sin(X[:, 0].astype(np.float64) * 2 * np.pi / 365) * 10
+        return {"ts": (base_temp + seasonal_variation, None, None, None)}
+
+    if X.shape[1] < forest.n_features:
+        raise ValueError(f"model expects {forest.n_features} features, the history provides {X.shape[1]}")
+    outputs = forest.tree_outputs(X[:, :forest.n_features])  # (n_trees, n_rows, n_targets)
+    lower, upper = np.quantile(outputs, quantiles, axis=0)
+    mean = outputs.mean(axis=0)
+    std = outputs.std(axis=0)
+    return {
+        target: (mean[:, k], lower[:, k], upper[:, k], np.maximum(std[:, k], SPREAD_FLOOR.get(target, 0.0)))
+        for k, target in enumerate(forest.targets)
+    }
+
+def predict(hist, future_dates, lat: float, lon: float) -> np.ndarray:
+    """Return temperature predictions for future_dates."""
+    return predict_with_spread(hist, future_dates, lat, lon)[0]
+
+# Seasonal swing added to the persistence baseline for the non-temperature parameters
+PERSISTENCE_AMPLITUDE = {"rh2m": 10, "ws10m": 2, "ps": 5}  # %, m/s, kPa
+
+def persistence_forecast(recent: np.ndarray, future_dates, parameter: str) -> np.ndarray:
+    """Mean of the recent values plus a seasonal term; for parameters the model doesn't predict."""
+    base = np.nanmean(recent)
+    seasonal_factor = np.sin(np.asarray(future_dates.dayofyear) * 2 * np.pi / 365)
+    return base + seasonal_factor * PERSISTENCE_AMPLITUDE.get(parameter, 0)
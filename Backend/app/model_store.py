@@ -0,0 +1,146 @@
+"""Per-site and per-region models on disk, with a memory-budgeted LRU in front.
+
+Models live in MODEL_DIR as <key>.pkl, where key is a POWER grid cell key
+(e.g. r261c170, one site) or a region key (e.g. g26x30, a MODEL_REGION_DEGREES
+square). They are compiled (app.forest) as they are loaded and only the
+compiled arrays are kept, so the byte accounting is exact. A location uses its
+site model if there is one, else its region's, else the global model.
+"""
+import math, os, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app.config import MODEL_DIR, MODEL_CACHE_MB, MODEL_REGION_DEGREES
+from app.grid import snap
+from app.memory import register_cache
+
+
+def region_key(lat: float, lon: float, degrees: float = MODEL_REGION_DEGREES) -> str:
+    """Region of the grid cell containing (lat, lon), so every point of a cell
+    picks the same region model (the site key, memo and feature cache all key
+    on the cell too)."""
+    cell = snap(lat, lon)
+    row = int(math.floor((cell.lat + 90.0) / degrees))
+    col = int(math.floor((cell.lon + 180.0) / degrees)) % int(round(360 / degrees))
+    return f"g{row:02d}x{col:02d}"
+
+
+def candidate_keys(lat: float, lon: float):
+    """Most specific first: site, then region."""
+    return [snap(lat, lon).key, region_key(lat, lon)]
+
+
+class ModelStore:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = self.loads = self.evictions = 0
+        self._available = None      # keys with a file on disk, scanned lazily
+        self._entries = OrderedDict()  # key -> CompiledForest
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pkl")
+
+    def available(self) -> set:
+        if self._available is None:
+            self.refresh()
+        return self._available
+
+    def refresh(self):
+        """Rescan MODEL_DIR, e.g. after models were trained by another process."""
+        keys = set()
+        if os.path.isdir(self.directory):
+            keys = {e.name[:-4] for e in os.scandir(self.directory) if e.name.endswith(".pkl")}
+        self._available = keys
+
+    def get(self, key: str):
+        """The compiled model for key, loading it if needed; None if there is none."""
+        with self._lock:
+            forest = self._entries.get(key)
+            if forest is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return forest
+            self.misses += 1
+        if key not in self.available():
+            return None
+        return self._load(key)
+
+    def _load(self, key: str):
+        import joblib
+        from app.forest import IncompatibleModelError, compile_forest
+
+        try:
+            forest = compile_forest(joblib.load(self.path(key)))
+        except FileNotFoundError:
+            self.available().discard(key)
+            return None
+        except IncompatibleModelError as e:
+            # Not retried until refresh(); the region or global model serves meanwhile
+            print(f"Ignoring model {key}: {e}")
+            self.available().discard(key)
+            return None
+        with self._lock:
+            if key in self._entries:  # loaded concurrently
+                return self._entries[key]
+            self._entries[key] = forest
+            self.nbytes += forest.nbytes
+            self.loads += 1
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return forest
+
+    def forest_for(self, lat: float, lon: float):
+        """(key, compiled model) for a location, falling back to the global model.
+
+        Raises FileNotFoundError if there is no specialised model and no global one,
+        IncompatibleModelError if the global one is of an older feature schema.
+        """
+        for key in candidate_keys(lat, lon):
+            forest = self.get(key)
+            if forest is not None:
+                return key, forest
+        from app.ml import load_forest
+
+        return "global", load_forest()
+
+    def warm(self, keys, workers: int = 4) -> int:
+        """Load keys into memory ahead of use (e.g. the sites a dashboard shows). Returns how many were found."""
+        keys = [k for k in dict.fromkeys(keys) if k in self.available()]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(self.get, keys))
+        return sum(f is not None for f in loaded)
+
+    def save(self, key: str, model):
+        """Write a fitted model for key; replaces any cached copy on next use."""
+        import joblib
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.path(key) + ".tmp"
+        joblib.dump(model, tmp)
+        os.replace(tmp, self.path(key))
+        self.available().add(key)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "on_disk": len(self._available) if self._available is not None else None,
+                "resident": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+model_store = ModelStore(MODEL_DIR, int(MODEL_CACHE_MB * 1024 * 1024))
+register_cache("models", model_store.stats)
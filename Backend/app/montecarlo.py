@@ -0,0 +1,114 @@
+"""Period-level exceedance probabilities from simulated trajectories.
+
+1 - prod(1 - p) treats the days of a window as independent, but weather
+anomalies persist: a hot day is usually followed by another. That overstates
+the chance of at least one exceedance. Here each day keeps its predicted
+Normal(mean, scale), and the standardized anomalies follow an AR(1) process
+whose coefficient phi is fitted to the recent history.
+
+A batch of (samples x days) trajectories is one matrix product. Row t of the
+lower-triangular matrix holds phi**(t-s) * sqrt(1 - phi**2) for s >= 1 (phi**t
+for s = 0), so white noise times its transpose gives the AR(1) anomalies
+directly with unit variance every day. Exactly MONTE_CARLO_SAMPLES
+trajectories are drawn from a generator seeded from the request, so identical
+requests give identical payloads whatever the machine load.
+MONTE_CARLO_BUDGET_MS is only a hard cap: a simulation that runs past it is
+abandoned with SimulationBudgetExceeded rather than answered from fewer
+trajectories.
+"""
+import hashlib, time
+import numpy as np
+from app.config import MONTE_CARLO_BUDGET_MS, MONTE_CARLO_SAMPLES
+from app.stats import exceeds
+
+BATCH = 1000
+MAX_PHI = 0.95
+# Fewer consecutive valid history days than this and the days are taken as independent
+MIN_PAIRS = 10
+# Longest runs reported as P(longest run >= k)
+MAX_RUN_REPORTED = 7
+
+
+class SimulationBudgetExceeded(Exception):
+    """Raised when drawing the trajectories takes longer than the time budget."""
+
+
+def fit_ar1(history) -> float:
+    """Lag-1 autocorrelation of the history's anomalies from a linear trend."""
+    y = np.asarray(history, dtype=np.float64)
+    t = np.arange(len(y))
+    ok = ~np.isnan(y)
+    if ok.sum() < MIN_PAIRS + 1:
+        return 0.0
+    # Removes the seasonal drift across a window of a few months
+    slope, intercept = np.polyfit(t[ok], y[ok], 1)
+    r = y - (slope * t + intercept)
+    pairs = ok[1:] & ok[:-1]
+    if pairs.sum() < MIN_PAIRS:
+        return 0.0
+    a, b = r[1:][pairs], r[:-1][pairs]
+    denom = np.sqrt((a * a).sum() * (b * b).sum())
+    if denom == 0:
+        return 0.0
+    return float(np.clip((a * b).sum() / denom, -MAX_PHI, MAX_PHI))
+
+
+def ar1_matrix(phi: float, days: int) -> np.ndarray:
+    """(days, days) lower-triangular L with (noise @ L.T) an AR(1) of unit variance."""
+    lag = np.arange(days)[:, None] - np.arange(days)[None, :]
+    L = np.where(lag >= 0, float(phi) ** np.maximum(lag, 0), 0.0)
+    L[:, 1:] *= np.sqrt(1 - phi * phi)
+    return L
+
+
+def seed_for(*key) -> int:
+    return int.from_bytes(hashlib.blake2b("|".join(map(str, key)).encode(), digest_size=8).digest(), "big")
+
+
+def simulate(mean, scale, threshold: float, operator: str, phi: float, seed: int = None,
+             samples: int = MONTE_CARLO_SAMPLES, budget_ms: float = MONTE_CARLO_BUDGET_MS) -> dict:
+    """Exceedance statistics over the whole period from AR(1) trajectories.
+
+    mean and scale are per day (scale may be a scalar). Always draws
+    samples trajectories; raises SimulationBudgetExceeded once budget_ms has
+    passed before they are all drawn.
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    days = len(mean)
+    scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), (days,))
+    L_T = ar1_matrix(phi, days).T
+    rng = np.random.default_rng(seed)
+    until = time.perf_counter() + budget_ms / 1000
+    drawn = any_days = all_days = 0
+    total_days = total_longest = 0.0
+    longest_at_least = np.zeros(MAX_RUN_REPORTED + 1)
+    while drawn < samples:
+        if drawn and time.perf_counter() >= until:
+            raise SimulationBudgetExceeded(f"{drawn} of {samples} trajectories drawn in {budget_ms:.0f} ms")
+        n = min(BATCH, samples - drawn)
+        values = mean + scale * (rng.standard_normal((n, days)) @ L_T)
+        hits = exceeds(values, threshold, operator, scale)
+        count = hits.sum(axis=1)
+        # Longest run of consecutive exceedance days per trajectory
+        run = np.zeros(n, dtype=np.int64)
+        longest = np.zeros(n, dtype=np.int64)
+        for d in range(days):
+            run = (run + 1) * hits[:, d]
+            np.maximum(longest, run, out=longest)
+        drawn += n
+        any_days += int((count > 0).sum())
+        all_days += int((count == days).sum())
+        total_days += float(count.sum())
+        total_longest += float(longest.sum())
+        longest_at_least += np.bincount(np.minimum(longest, MAX_RUN_REPORTED), minlength=MAX_RUN_REPORTED + 1)[::-1].cumsum()[::-1]
+    return {
+        "samples": drawn,
+        "phi": round(phi, 4),
+        "period_probability": any_days / drawn,
+        "all_days_probability": all_days / drawn,
+        "expected_exceedance_days": total_days / drawn,
+        "expected_longest_run": total_longest / drawn,
+        "longest_run_at_least": {
+            str(k): float(longest_at_least[k] / drawn) for k in range(1, min(days, MAX_RUN_REPORTED) + 1)
+        },
+    }
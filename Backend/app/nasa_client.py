@@ -1,18 +1,112 @@
-import requests, pandas as pd, datetime as dt
-from app.config import NASA_POWER_URL
+import requests, datetime as dt
+from app.config import (
+    NASA_POWER_URL,
+    POWER_BREAKER_WINDOW,
+    POWER_BREAKER_MIN_CALLS,
+    POWER_BREAKER_ERROR_RATE,
+    POWER_BREAKER_BASE_BACKOFF,
+    POWER_BREAKER_MAX_BACKOFF,
+    POWER_HOURLY_CHUNK_DAYS,
+    POWER_HOURLY_WORKERS,
+    QC_MAX_GAP_HOURS,
+)
+from app.resilience import CircuitBreaker
 
-def fetch_power(
+# orjson is optional; it decodes POWER payloads several times faster than json
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+def upstream_failure(exc: Exception) -> bool:
+    """Whether exc means POWER itself is failing: unreachable, timed out or a 5xx.
+
+    4xx answers are our request's fault and say nothing about POWER's health.
+    """
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is not None and exc.response.status_code >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+# Shared by every caller that talks to POWER so an outage is detected once
+power_breaker = CircuitBreaker(
+    "nasa-power",
+    window=POWER_BREAKER_WINDOW,
+    min_calls=POWER_BREAKER_MIN_CALLS,
+    error_rate=POWER_BREAKER_ERROR_RATE,
+    base_backoff=POWER_BREAKER_BASE_BACKOFF,
+    max_backoff=POWER_BREAKER_MAX_BACKOFF,
+    is_failure=upstream_failure,
+)
+
+def _get(url: str, params: dict, timeout: float) -> dict:
+    resp = requests.get(url, params=params, timeout=timeout)
+    resp.raise_for_status()
+    return _loads(resp.content)
+
+def power_get(path: str, params: dict, timeout: float = 30) -> dict:
+    """GET a POWER endpoint through the circuit breaker and return the decoded JSON.
+
+    Raises CircuitOpenError immediately while POWER is considered down.
+    """
+    return power_breaker.call(_get, f"{NASA_POWER_URL}/{path}", params, timeout)
+
+def decode_daily(parameters: dict):
+    """Turn POWER's {"PARAM": {"YYYYMMDD": value}} into (start_date, {param: float32 array}).
+
+    POWER returns contiguous, date-ordered series, so the index is just
+    start + arange(n) and the values are streamed straight into preallocated
+    float32 arrays; no per-date parsing is needed. Column names are lowercased.
+    """
+    import numpy as np
+
+    keys = list(next(iter(parameters.values())))
+    n = len(keys)
+    start = dt.datetime.strptime(keys[0], "%Y%m%d").date()
+    end = dt.datetime.strptime(keys[-1], "%Y%m%d").date()
+
+    if (end - start).days == n - 1:
+        columns = {
+            name.lower(): np.fromiter(values.values(), dtype=np.float32, count=n)
+            for name, values in parameters.items()
+        }
+        return start, columns
+
+    # Unordered or gappy payload: place each date at its offset, NaN elsewhere
+    dates = np.array([f"{k[:4]}-{k[4:6]}-{k[6:]}" for k in keys], dtype="datetime64[D]")
+    first = dates.min()
+    offsets = (dates - first).astype(np.int64)
+    length = int(offsets.max()) + 1
+    columns = {}
+    for name, values in parameters.items():
+        col = np.full(length, np.nan, dtype=np.float32)
+        col[offsets] = np.fromiter((values[k] for k in keys), dtype=np.float32, count=n)
+        columns[name.lower()] = col
+    return first.astype(dt.date), columns
+
+def to_frame(start: dt.date, columns: dict, flags=None):
+    """Build the DataFrame form of a decoded daily series (daily DatetimeIndex)."""
+    import pandas as pd
+
+    n = len(next(iter(columns.values())))
+    df = pd.DataFrame(columns, index=pd.date_range(start, periods=n, freq="D"), copy=False)
+    if flags is not None:
+        df["qc"] = flags
+    return df
+
+def fetch_power_arrays(
     lat: float,
     lon: float,
     start: str,
     end: str,
-    params="TS,WS10M,RH2M,PS",  # Fixed: WS10M instead of MERRA2_SLV_10M_SPEED
+    params="TS,WS10M,RH2M,PS",
     community="RE",
+    timeout: float = 30,
 ):
-    """Return pandas DataFrame with NASA POWER data."""
-    url = f"{NASA_POWER_URL}/daily/point"
-    resp = requests.get(
-        url,
+    """Fetch and QC POWER daily data as arrays: (start_date, columns, qc_flags)."""
+    from app.qc import clean_columns
+
+    j = power_get(
+        "daily/point",
         params={
             "parameters": params,
             "community": community,
@@ -22,11 +116,113 @@ def fetch_power(
             "end": end,
             "format": "JSON",
         },
-        timeout=30,
+        timeout=timeout,
     )
-    resp.raise_for_status()
-    j = resp.json()
-    df = pd.DataFrame(j["properties"]["parameter"])
-    df.index = pd.to_datetime(df.index, format="%Y%m%d")
-    df = df.rename(columns={p: p.lower() for p in df.columns})
-    return df
\ No newline at end of file
+    first, columns = decode_daily(j["properties"]["parameter"])
+    flags = clean_columns(columns)
+    return first, columns, flags
+
+def _hour_key(key: str) -> int:
+    """Hour number (hours since 1970-01-01 00:00) of a POWER 'YYYYMMDDHH' key."""
+    from app.series import day_number
+
+    return day_number(key[:8]) * 24 + int(key[8:10])
+
+def decode_hourly_into(parameters: dict, start_hour: int, columns: dict):
+    """Write POWER's {"PARAM": {"YYYYMMDDHH": value}} into preallocated hourly arrays.
+
+    columns maps lowercase names to float32 arrays whose row 0 is start_hour.
+    A contiguous chunk is streamed straight into its slice, the same way
+    decode_daily() does, so chunks can be decoded as they arrive.
+    """
+    import numpy as np
+
+    keys = next(iter(parameters.values()))
+    n = len(keys)
+    if not n:
+        return
+    first = _hour_key(next(iter(keys)))
+    if _hour_key(next(reversed(keys))) - first == n - 1:
+        i = first - start_hour
+        for name, values in parameters.items():
+            columns[name.lower()][i:i + n] = np.fromiter(values.values(), dtype=np.float32, count=n)
+        return
+    offsets = np.fromiter((_hour_key(k) for k in keys), dtype=np.int64, count=n) - start_hour
+    for name, values in parameters.items():
+        columns[name.lower()][offsets] = np.fromiter((values[k] for k in keys), dtype=np.float32, count=n)
+
+def fetch_power_hourly_arrays(
+    lat: float,
+    lon: float,
+    start: str,
+    end: str,
+    params="T2M,RH2M,WS10M,PS",
+    community="RE",
+    timeout: float = 30,
+    chunk_days: int = POWER_HOURLY_CHUNK_DAYS,
+    workers: int = POWER_HOURLY_WORKERS,
+):
+    """Fetch and QC POWER hourly (UTC) data as arrays: (start_date, columns, qc_flags).
+
+    The range is split into chunk_days requests fetched concurrently; each
+    response is decoded into its slice of arrays preallocated for the whole
+    range (24 rows per day) and dropped, so only the chunks in flight are
+    ever held as JSON. Hours POWER didn't return are NaN.
+    """
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+    from app.qc import clean_columns
+    from app.series import EPOCH, day_number
+
+    first_day, last_day = day_number(start), day_number(end)
+    if last_day < first_day:
+        raise ValueError(f"end {end} is before start {start}")
+    n = (last_day - first_day + 1) * 24
+    columns = {p.lower(): np.full(n, np.nan, dtype=np.float32) for p in params.split(",")}
+    chunks = [(d, min(d + chunk_days - 1, last_day)) for d in range(first_day, last_day + 1, chunk_days)]
+
+    def fetch(chunk):
+        a, b = (EPOCH + dt.timedelta(days=d) for d in chunk)
+        j = power_get(
+            "hourly/point",
+            params={
+                "parameters": params,
+                "community": community,
+                "longitude": lon,
+                "latitude": lat,
+                "start": a.strftime("%Y%m%d"),
+                "end": b.strftime("%Y%m%d"),
+                "time-standard": "UTC",
+                "format": "JSON",
+            },
+            timeout=timeout,
+        )
+        # Chunks cover disjoint slices, so they can be written concurrently
+        decode_hourly_into(j["properties"]["parameter"], first_day * 24, columns)
+
+    if len(chunks) == 1:
+        fetch(chunks[0])
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            for _ in pool.map(fetch, chunks):
+                pass
+    flags = clean_columns(columns, max_gap=QC_MAX_GAP_HOURS)
+    return EPOCH + dt.timedelta(days=first_day), columns, flags
+
+def fetch_power(
+    lat: float,
+    lon: float,
+    start: str,
+    end: str,
+    params="TS,WS10M,RH2M,PS",  # Fixed: WS10M instead of MERRA2_SLV_10M_SPEED
+    community="RE",
+    timeout: float = 30,
+):
+    """Return pandas DataFrame with NASA POWER data.
+
+    Values have been through the QC stage (app.qc): fill values and impossible
+    values are NaN, short gaps are interpolated, and the `qc` column holds the
+    per-row quality flags. Columns are float32.
+    """
+    first, columns, flags = fetch_power_arrays(lat, lon, start, end, params, community, timeout)
+    return to_frame(first, columns, flags)
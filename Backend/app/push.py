@@ -0,0 +1,88 @@
+"""Fan-out of current conditions to server-sent-event subscribers.
+
+One Channel per POWER grid cell polls the /current payload on a fixed
+interval, no matter how many tabs are watching it, and pushes to every
+subscriber's queue only when the payload's ETag changes. Load therefore scales
+with the number of distinct cells being watched, not with open tabs. The
+channel's task stops when its last subscriber leaves.
+"""
+import asyncio, json
+from starlette.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from app.config import PUSH_INTERVAL_SECONDS, PUSH_HEARTBEAT_SECONDS
+from app.http_cache import compute_etag
+
+
+class Channel:
+    def __init__(self, cell, compute):
+        self.cell = cell
+        self.compute = compute       # blocking fn() -> payload dict
+        self.subscribers = set()
+        self.etag = None
+        self.last_event = None
+        self.task = None
+
+    async def run(self):
+        while True:
+            try:
+                payload = await run_in_threadpool(self.compute)
+                etag = compute_etag(payload)
+                if etag != self.etag:
+                    self.etag = etag
+                    self.last_event = format_event("current", payload, etag)
+                    for queue in list(self.subscribers):
+                        _offer(queue, self.last_event)
+            except Exception as e:
+                print(f"Push channel {self.cell} update failed: {e}")
+            await asyncio.sleep(PUSH_INTERVAL_SECONDS)
+
+
+_channels = {}
+
+
+def format_event(event: str, payload: dict, event_id: str = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(jsonable_encoder(payload), separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def _offer(queue: asyncio.Queue, event: str):
+    # Subscribers only need the latest state; a slow one drops what it missed
+    while queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+async def subscribe(cell, compute, last_event_id: str = None):
+    """Async generator of SSE-formatted strings for cell, ending when the client goes away."""
+    channel = _channels.get(cell)
+    if channel is None:
+        channel = _channels[cell] = Channel(cell, compute)
+    queue = asyncio.Queue(maxsize=1)
+    channel.subscribers.add(queue)
+    if channel.task is None:
+        channel.task = asyncio.create_task(channel.run())
+    elif channel.last_event and channel.etag != last_event_id:
+        # Late joiners get the current state straight away
+        _offer(queue, channel.last_event)
+    try:
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), timeout=PUSH_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies and load balancers from closing an idle stream
+                yield ": keepalive\n\n"
+    finally:
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            channel.task.cancel()
+            _channels.pop(cell, None)
+
+
+def stats() -> dict:
+    return {
+        "channels": len(_channels),
+        "subscribers": sum(len(c.subscribers) for c in _channels.values()),
+    }
@@ -0,0 +1,65 @@
+import numpy as np
+from app.config import QC_MAX_GAP_DAYS
+
+# NASA POWER marks missing values with -999 (sometimes -999.0 or -99)
+FILL_THRESHOLD = -900.0
+
+# Per-row quality bits, OR-ed across parameters
+QC_FILL = 1          # a POWER fill value was masked
+QC_RANGE = 2         # a value outside its physical range was masked
+QC_INTERPOLATED = 4  # a masked value was filled by interpolation
+QC_MISSING = 8       # a value is still NaN after gap filling
+
+# Plausible physical ranges for POWER parameters (lowercase column names)
+VALID_RANGES = {
+    "ts": (-90.0, 70.0),     # °C
+    "t2m": (-90.0, 70.0),    # °C
+    "rh2m": (0.0, 100.0),    # %
+    "ws10m": (0.0, 75.0),    # m/s
+    "ps": (50.0, 110.0),     # kPa
+}
+
+def _fill_short_gaps(values: np.ndarray, max_gap: int) -> np.ndarray:
+    """Return a mask of NaNs that were linearly interpolated (interior runs <= max_gap only)."""
+    bad = np.isnan(values)
+    filled = np.zeros(len(values), dtype=bool)
+    good_idx = np.flatnonzero(~bad)
+    if max_gap <= 0 or len(good_idx) < 2 or not bad.any():
+        return filled
+
+    # Start/end of every NaN run
+    edges = np.diff(np.concatenate(([0], bad.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    lengths = ends - starts
+    # Only gaps with a real value on both sides are interpolated, never the edges
+    eligible = (lengths <= max_gap) & (starts > 0) & (ends < len(values))
+
+    run_mask = np.repeat(eligible, lengths)
+    bad_idx = np.flatnonzero(bad)[run_mask]
+    values[bad_idx] = np.interp(bad_idx, good_idx, values[good_idx])
+    filled[bad_idx] = True
+    return filled
+
+def clean_columns(columns: dict, max_gap: int = QC_MAX_GAP_DAYS) -> np.ndarray:
+    """Clean POWER columns in place and return per-row QC flags (uint8).
+
+    Fill values and out-of-range values become NaN, interior gaps of up to
+    max_gap rows are interpolated, and every change is recorded in the flags.
+    """
+    n = len(next(iter(columns.values()))) if columns else 0
+    flags = np.zeros(n, dtype=np.uint8)
+    for name, values in columns.items():
+        fill = values <= FILL_THRESHOLD
+        values[fill] = np.nan
+        flags[fill] |= QC_FILL
+
+        lo, hi = VALID_RANGES.get(name, (-np.inf, np.inf))
+        with np.errstate(invalid="ignore"):
+            out_of_range = (values < lo) | (values > hi)
+        values[out_of_range] = np.nan
+        flags[out_of_range] |= QC_RANGE
+
+        flags[_fill_short_gaps(values, max_gap)] |= QC_INTERPOLATED
+        flags[np.isnan(values)] |= QC_MISSING
+    return flags
@@ -0,0 +1,236 @@
+import random, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because the breaker is open."""
+
+
+class CircuitBreaker:
+    """Rolling error-rate circuit breaker with jittered exponential backoff.
+
+    closed    -> calls go through, outcomes are tracked over `window` seconds
+    open      -> calls fail fast with CircuitOpenError until the backoff expires
+    half_open -> a single probe call is let through to test the upstream; only
+                 its outcome closes or reopens the breaker
+
+    is_failure(exc) decides which exceptions count against the upstream (by
+    default all of them); any other exception means the upstream answered and
+    counts as a success.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 60.0,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        is_failure=None,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.is_failure = is_failure or (lambda exc: True)
+        self.state = "closed"
+        self._calls = deque()  # (timestamp, ok)
+        self._open_until = 0.0
+        self._trips = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def _backoff(self) -> float:
+        """Exponential backoff on consecutive trips, jittered over [ceiling / 2, ceiling]."""
+        ceiling = min(self.max_backoff, self.base_backoff * (2 ** (self._trips - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def _trip(self, now: float):
+        self._trips += 1
+        self.state = "open"
+        self._open_until = now + self._backoff()
+        self._probe_in_flight = False
+        print(f"Circuit '{self.name}' opened for {self._open_until - now:.1f}s (trip #{self._trips})")
+
+    def admit(self) -> bool:
+        """Let a call through or raise CircuitOpenError. Returns True if the call is the half-open probe."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now < self._open_until:
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open")
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open, probe in flight")
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self, probe: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                print(f"Circuit '{self.name}' closed after successful probe")
+                self.state = "closed"
+                self._trips = 0
+                self._probe_in_flight = False
+                self._calls.clear()
+            elif self.state != "closed":
+                return  # a call admitted before the trip; only the probe decides now
+            self._calls.append((now, True))
+            self._prune(now)
+
+    def record_failure(self, probe: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._trip(now)
+                return
+            if self.state != "closed":
+                return
+            self._calls.append((now, False))
+            self._prune(now)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.error_rate:
+                self._trip(now)
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker, raising CircuitOpenError when open."""
+        probe = self.admit()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure(probe)
+            else:
+                self.record_success(probe)
+            raise
+        except BaseException:
+            if probe:
+                with self._lock:
+                    self._probe_in_flight = False
+            raise
+        self.record_success(probe)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            failures = sum(1 for _, ok in self._calls if not ok)
+            return {
+                "name": self.name,
+                "state": self.state,
+                "calls_in_window": len(self._calls),
+                "error_rate": failures / len(self._calls) if self._calls else 0.0,
+                "trips": self._trips,
+                "retry_in_seconds": max(0.0, self._open_until - now) if self.state == "open" else 0.0,
+            }
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: `rate` tokens per second, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class StaleWhileRevalidateCache:
+    """Keyed cache that serves the last good value and refreshes it in the background.
+
+    Entries younger than `fresh_for` seconds are served as-is. Older entries (up to
+    `max_stale`) are still served immediately while a single background refresh per
+    key runs. A loader returning None counts as a failed refresh and keeps the old value.
+    """
+
+    def __init__(self, fresh_for: float, max_stale: float, max_entries: int = 1024, refresh_workers: int = 2):
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (value, stored_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="swr-refresh")
+
+    def put(self, key, value):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            self._entries[key] = (value, time.monotonic())
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        except Exception as e:
+            print(f"Background refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def peek(self, key):
+        """Return (value, age_seconds) without loading, or (None, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.max_stale:
+            return None, None
+        return value, age
+
+    def cached(self, key, loader):
+        """Return the cached value (refreshing it in the background if stale), or None."""
+        value, age = self.peek(key)
+        if value is not None and age > self.fresh_for:
+            with self._lock:
+                start = key not in self._refreshing
+                if start:
+                    self._refreshing.add(key)
+            if start:
+                self._pool.submit(self._refresh, key, loader)
+        return value
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "refreshing": len(self._refreshing)}
+
+    def get(self, key, loader):
+        """Return the cached value, loading synchronously only on a cold miss."""
+        value = self.cached(key, loader)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,25 @@
+"""Reproducible random streams for the synthetic weather model.
+
+Every (POWER grid cell, UTC hour) pair gets its own random.Random, seeded
+from a BLAKE2b hash of the pair. The same location and hour therefore always
+draw the same numbers. Any window of hours or days can be generated on its
+own, in any order or in parallel, and identical requests give identical
+payloads that ETags and HTTP caches can serve. With SYNTHETIC_DETERMINISTIC=0
+every call gets a freshly seeded stream instead.
+"""
+import hashlib, random
+from datetime import datetime
+from app.config import SYNTHETIC_DETERMINISTIC
+from app.grid import snap
+
+
+def floor_hour(when: datetime) -> datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def rng_for(lat: float, lon: float, when: datetime) -> random.Random:
+    """The random stream for (lat, lon)'s grid cell in the UTC hour containing when."""
+    if not SYNTHETIC_DETERMINISTIC:
+        return random.Random()
+    key = f"{snap(lat, lon).key}|{when:%Y%m%d%H}".encode()
+    return random.Random(int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big"))
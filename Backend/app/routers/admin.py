@@ -0,0 +1,75 @@
+import gc, hmac, os
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from app.config import ADMIN_TOKEN
+from app import memory
+
+def require_admin(x_admin_token: str = Header(None)):
+    # Without ADMIN_TOKEN configured the admin surface doesn't exist at all
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+GROUP_BY = "^(lineno|filename|traceback)$"
+
+@router.get("/memory")
+def memory_overview():
+    """RSS, per-cache sizes, GC state and tracing status of this worker process."""
+    return {
+        "pid": os.getpid(),
+        **memory.rss_bytes(),
+        "caches": memory.cache_sizes(),
+        "gc": {"counts": gc.get_count(), "frozen": gc.get_freeze_count()},
+        **memory.tracing_status(),
+    }
+
+@router.post("/memory/tracing/start")
+def start_tracing(frames: int = Query(1, ge=1, le=50)):
+    """Start allocation tracing; more frames give tracebacks but cost more."""
+    started = memory.start_tracing(frames)
+    return {"pid": os.getpid(), "started": started, **memory.tracing_status()}
+
+@router.post("/memory/tracing/stop")
+def stop_tracing():
+    memory.stop_tracing()
+    return {"pid": os.getpid(), **memory.tracing_status()}
+
+@router.post("/memory/snapshots")
+def take_snapshot(label: str = Query(..., min_length=1, max_length=64)):
+    """Store a named snapshot to diff against later."""
+    try:
+        memory.take_snapshot(label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"pid": os.getpid(), "label": label, "top": memory.top(10, label=label)}
+
+@router.get("/memory/top")
+def top_allocations(
+    limit: int = Query(20, ge=1, le=500),
+    group_by: str = Query("lineno", regex=GROUP_BY),
+    snapshot: str = Query(None, description="Stored snapshot label; default is a fresh snapshot"),
+):
+    """Largest allocation sites."""
+    try:
+        return {"pid": os.getpid(), "top": memory.top(limit, group_by, snapshot)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/memory/diff")
+def diff_allocations(
+    base: str,
+    compare: str = Query(None, description="Snapshot label; default is a fresh snapshot"),
+    limit: int = Query(20, ge=1, le=500),
+    group_by: str = Query("lineno", regex=GROUP_BY),
+):
+    """Allocation sites that grew (or shrank) the most between two snapshots."""
+    try:
+        return {"pid": os.getpid(), "diff": memory.diff(base, compare, limit, group_by)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,38 +1,65 @@
-from fastapi import APIRouter, Query, HTTPException
+import asyncio, time
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import JSONResponse
 from datetime import datetime, timedelta
-import pandas as pd, numpy as np
-from app.nasa_client import fetch_power
-from app.ml import predict
+from app import admission
+from app.config import FALLBACK_MAX_AGE, JOB_DEADLINE_SECONDS
+from app.grid import snap
+from app.http_cache import cached_json, seconds_until_utc_midnight
+from app.jobs import analysis_jobs, QueueFullError
+from app.memo import analysis_key, analysis_memo
+from app.sources import Deadline, fetch_history, history_cache
+
+# pandas/numpy/sklearn (via app.ml) are imported inside the handlers so the
+# router can be mounted without paying for them at startup; app.arena.warm_up()
+# imports them in the background right after boot
 
 router = APIRouter(prefix="/api/ml", tags=["ml"])
 
 @router.get("/predict")
-def ml_predict(lat: float, lon: float, days: int = Query(14, ge=1, le=14)):
+@admission.limit("predict", "upstream")
+def ml_predict(request: Request, lat: float, lon: float, days: int = Query(14, ge=1, le=14)):
+    import pandas as pd
+    from app.ml import forecast
+
     end = datetime.utcnow().date()
     start = end - timedelta(days=90)
-    hist = fetch_power(lat, lon, start.strftime("%Y%m%d"), end.strftime("%Y%m%d"))
+    hist, provenance = fetch_history(
+        lat, lon, start.strftime("%Y%m%d"), end.strftime("%Y%m%d"), Deadline.for_endpoint("predict")
+    )
     future_dates = pd.date_range(end + timedelta(days=1), periods=days, freq="D")
-    future = hist.tail(days).copy()
-    future.index = future_dates
-    preds = predict(future)
-    # crude confidence interval
-    std = hist["ts"].std()
-    return {
+    # Every parameter from one pass over the model
+    predicted = forecast(hist, future_dates, lat, lon)
+    preds, lower, upper, _ = predicted["ts"]
+    if lower is None:
+        # No trained forest to take a spread from: crude band from the history
+        std = hist["ts"].std()
+        lower, upper = preds - 1.96 * std, preds + 1.96 * std
+    others = {
+        name: predicted[column][0] if column in predicted else [None] * days
+        for name, column in (("humidity", "rh2m"), ("wind_speed", "ws10m"), ("pressure", "ps"))
+    }
+    payload = {
         "lat": lat,
         "lon": lon,
         "predictions": [
             {
                 "date": d.strftime("%Y-%m-%d"),
-                "temp": float(t),
-                "lower": float(t - 1.96 * std),
-                "upper": float(t + 1.96 * std),
+                "temp": float(preds[i]),
+                "lower": float(lower[i]),
+                "upper": float(upper[i]),
+                **{name: None if values[i] is None else float(values[i]) for name, values in others.items()},
             }
-            for d, t in zip(future_dates, preds)
+            for i, d in enumerate(future_dates)
         ],
+        "provenance": provenance,
     }
+    return cached_json(request, payload, max_age=_max_age(provenance))
 
 @router.get("/probability")
+@admission.limit("probability", "upstream")
 def probability(
+    request: Request,
     lat: float,
     lon: float,
     threshold: float,
@@ -43,7 +70,35 @@ def probability(
     days: int = Query(7, ge=1, le=30),  # Extended to 30 days
 ):
     """Calculate probability of weather threshold being exceeded for specified date range."""
-    from scipy.stats import norm
+    payload = compute_probability(lat, lon, threshold, parameter, operator, start_date, end_date, days)
+    return cached_json(request, payload, max_age=_max_age(payload["provenance"]))
+
+def _max_age(provenance: dict) -> int:
+    # POWER daily data (and so anything derived from it) only changes once a
+    # day; synthetic fallbacks are kept short so clients retry for real data
+    return FALLBACK_MAX_AGE if provenance["degraded"] else seconds_until_utc_midnight()
+
+def compute_probability(
+    lat: float,
+    lon: float,
+    threshold: float,
+    parameter: str = "temperature",
+    operator: str = ">",
+    start_date: str = None,
+    end_date: str = None,
+    days: int = 7,
+    deadline: Deadline = None,
+    history=None,
+) -> dict:
+    """Probability payload shared by /probability and /analyze.
+
+    history is an optional (DataFrame, provenance) pair already fetched by the
+    caller; it must cover at least the last 90 days.
+    """
+    import pandas as pd, numpy as np
+    from app.ml import predict_with_spread
+    from app.montecarlo import SimulationBudgetExceeded, fit_ar1, seed_for, simulate
+    from app.stats import threshold_probability
     
     # Determine prediction date range
     if start_date and end_date:
@@ -63,11 +118,14 @@ def probability(
     # Get historical data for training (last 90 days)
     hist_end = datetime.utcnow().date()
     hist_start = hist_end - timedelta(days=90)
-    hist = fetch_power(lat, lon, hist_start.strftime("%Y%m%d"), hist_end.strftime("%Y%m%d"))
-    
-    # Prepare future data for predictions
-    future = hist.tail(pred_days).copy()
-    future.index = future_dates
+    if history is not None:
+        hist, provenance = history
+        hist = hist.loc[hist.index >= pd.Timestamp(hist_start)]
+    else:
+        hist, provenance = fetch_history(
+            lat, lon, hist_start.strftime("%Y%m%d"), hist_end.strftime("%Y%m%d"),
+            deadline or Deadline.for_endpoint("probability"),
+        )
     
     # Parameter mapping from frontend to NASA POWER parameters
     param_mapping = {
@@ -85,51 +143,32 @@ def probability(
         nasa_param = "ts"
         parameter = "temperature"
     
-    # Get predictions for the specified parameter
-    if nasa_param == "ts":
-        # Use existing ML model for temperature
-        preds = predict(future)
-    else:
-        # For other parameters, use simple persistence model with seasonal adjustment
-        recent_values = hist[nasa_param].tail(14).values
-        seasonal_factor = np.sin(future_dates.dayofyear * 2 * np.pi / 365)
-        
-        if nasa_param == "rh2m":  # Humidity
-            base_values = np.mean(recent_values)
-            preds = base_values + seasonal_factor * 10  # ±10% seasonal variation
-        elif nasa_param == "ws10m":  # Wind Speed
-            base_values = np.mean(recent_values)
-            preds = base_values + seasonal_factor * 2   # ±2 m/s seasonal variation
-        elif nasa_param == "ps":  # Pressure
-            base_values = np.mean(recent_values)
-            preds = base_values + seasonal_factor * 5   # ±5 kPa seasonal variation
-        else:
-            preds = np.full(len(future_dates), np.mean(recent_values))
+    # The model predicts every parameter in one pass; the spread of its trees
+    # gives a per-day uncertainty
+    preds, _, _, scale = predict_with_spread(hist, future_dates, lat, lon, target=nasa_param)
     
     # Calculate standard deviation for uncertainty
-    std = hist[nasa_param].std()
+    std = scale if scale is not None else hist[nasa_param].std()
     
     # Apply threshold probability calculation based on operator
-    if operator == ">":
-        probs = 1 - norm.cdf(threshold, loc=preds, scale=std)
-    elif operator == ">=":
-        probs = 1 - norm.cdf(threshold - 0.001, loc=preds, scale=std)  # Small epsilon for >=
-    elif operator == "<":
-        probs = norm.cdf(threshold, loc=preds, scale=std)
-    elif operator == "<=":
-        probs = norm.cdf(threshold + 0.001, loc=preds, scale=std)     # Small epsilon for <=
-    elif operator == "=":
-        # For equality, use a small range around the threshold
-        epsilon = std * 0.1  # 10% of standard deviation
-        probs = norm.cdf(threshold + epsilon, loc=preds, scale=std) - norm.cdf(threshold - epsilon, loc=preds, scale=std)
-    else:
-        probs = 1 - norm.cdf(threshold, loc=preds, scale=std)  # Default to >
+    probs = threshold_probability(threshold, operator, preds, std)
     
-    # Ensure probabilities are between 0 and 1
-    probs = np.clip(probs, 0, 1)
-    
-    # Calculate overall probability for the entire period
-    overall_prob = 1 - np.prod(1 - probs)  # Probability that threshold is exceeded at least once
+    independent_prob = float(1 - np.prod(1 - probs))
+    # Probability that the threshold is exceeded at least once, from
+    # trajectories whose day-to-day persistence matches the recent history
+    try:
+        simulation = simulate(
+            preds, std, threshold, operator,
+            phi=fit_ar1(hist[nasa_param].values),
+            seed=seed_for(snap(lat, lon).key, nasa_param, operator, threshold, pred_start, pred_end),
+        )
+        overall_prob = simulation["period_probability"]
+    except SimulationBudgetExceeded as e:
+        print(f"Monte Carlo simulation abandoned: {e}")
+        simulation = {"error": f"time budget exceeded ({e})"}
+        overall_prob = independent_prob
+        # Short HTTP/memo lifetime, like any other fallback answer
+        provenance = dict(provenance, degraded=True)
     
     return {
         "lat": lat,
@@ -149,10 +188,15 @@ def probability(
             for date, prob, pred in zip(future_dates, probs, preds)
         ],
         "overall_probability": float(overall_prob),
-        "summary": f"{overall_prob*100:.1f}% chance that {parameter} will be {operator} {threshold} during this period"
+        # The same probability if the days were independent, for comparison
+        "independent_days_probability": independent_prob,
+        "simulation": simulation,
+        "summary": f"{overall_prob*100:.1f}% chance that {parameter} will be {operator} {threshold} during this period",
+        "provenance": provenance,
     }
 
 @router.post("/analyze")
+@admission.limit("analyze", "upstream")
 def analyze_weather_risk(
     lat: float,
     lon: float,
@@ -162,124 +206,245 @@ def analyze_weather_risk(
     operator: str = Query(">", regex="^(>|<|>=|<=|=)$"),
     start_date: str = Query(..., regex=r"\d{4}-\d{2}-\d{2}"),
     end_date: str = Query(..., regex=r"\d{4}-\d{2}-\d{2}"),
+    mode: str = Query("sync", regex="^(sync|job)$"),
 ):
     """
     Comprehensive weather risk analysis endpoint for the new workflow.
     This endpoint provides detailed analysis results for the user's selected criteria.
+
+    mode=job queues the analysis on the background worker pool and answers
+    202 with the analysis_id; poll GET /api/ml/analyze/{analysis_id} for it.
     """
+    # Validate date range
+    start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="End date must be after start date")
+
+    if (end_dt - start_dt).days > 30:
+        raise HTTPException(status_code=400, detail="Date range cannot exceed 30 days")
+
+    args = (lat, lon, location_name, threshold, parameter, operator, start_date, end_date)
+    if mode == "job":
+        return _submit_analysis(*args)
+    cached = _memo_lookup(*args)
+    if cached is not None:
+        return cached
     try:
-        # Validate date range
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
-        
-        if start_dt >= end_dt:
-            raise HTTPException(status_code=400, detail="End date must be after start date")
-        
-        if (end_dt - start_dt).days > 30:
-            raise HTTPException(status_code=400, detail="Date range cannot exceed 30 days")
-        
-        # Get probability analysis
-        prob_result = probability(
-            lat=lat,
-            lon=lon,
-            threshold=threshold,
-            parameter=parameter,
-            operator=operator,
-            start_date=start_date,
-            end_date=end_date
+        return _analyze_and_store(*args)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.get("/analyze/{analysis_id}")
+async def analysis_status(analysis_id: str, wait: float = Query(0, ge=0, le=25)):
+    """Status of a queued analysis; with wait=N, hold the request up to N seconds for it to finish."""
+    job = analysis_jobs.get(analysis_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis_id")
+    # Poll instead of job.wait() so a long-poll doesn't tie up a threadpool thread
+    until = time.monotonic() + wait
+    while not job.finished and time.monotonic() < until:
+        await asyncio.sleep(0.1)
+    return {"analysis_id": analysis_id, **job.to_dict()}
+
+# Operators spelled out so analysis ids are safe in a URL path
+OPERATOR_NAMES = {">": "gt", ">=": "ge", "<": "lt", "<=": "le", "=": "eq"}
+
+def analysis_id(lat: float, lon: float, parameter: str, operator: str, threshold: float,
+                start_date: str, end_date: str) -> str:
+    """Public id of an analysis; every argument that changes the result is part of it."""
+    return f"{lat}_{lon}_{parameter}_{OPERATOR_NAMES[operator]}_{threshold}_{start_date}_{end_date}"
+
+def _history_range():
+    """The 365-day window /analyze looks at, as POWER date strings."""
+    hist_end = datetime.utcnow().date()
+    hist_start = hist_end - timedelta(days=365)
+    return hist_start.strftime("%Y%m%d"), hist_end.strftime("%Y%m%d")
+
+@router.get("/stats")
+def ml_stats():
+    """Hit rates and occupancy of the analysis memo, job queue and model store."""
+    from app.model_store import model_store
+
+    return {
+        "analysis_memo": analysis_memo.stats(),
+        "analysis_jobs": analysis_jobs.stats(),
+        "models": model_store.stats(),
+    }
+
+def _memo_lookup(lat, lon, location_name, threshold, parameter, operator, start_date, end_date):
+    """Memoized result for these criteria, relabelled for this request's location."""
+    result = analysis_memo.get(analysis_key(lat, lon, parameter, operator, threshold, start_date, end_date))
+    if result is None:
+        return None
+    return {
+        **result,
+        "analysis_id": analysis_id(lat, lon, parameter, operator, threshold, start_date, end_date),
+        "location": {"name": location_name, "latitude": lat, "longitude": lon},
+    }
+
+def _analyze_and_store(lat, lon, location_name, threshold, parameter, operator, start_date, end_date, deadline=None):
+    result = run_analysis(lat, lon, location_name, threshold, parameter, operator, start_date, end_date, deadline)
+    # Same lifetime as the HTTP cache: until POWER's next daily update, or a
+    # minute for synthetic results so real data replaces them quickly
+    analysis_memo.put(
+        analysis_key(lat, lon, parameter, operator, threshold, start_date, end_date),
+        result,
+        ttl=_max_age(result["provenance"]),
+    )
+    return result
+
+def _submit_analysis(lat, lon, location_name, threshold, parameter, operator, start_date, end_date):
+    args = (lat, lon, location_name, threshold, parameter, operator, start_date, end_date)
+    public_id = analysis_id(lat, lon, parameter, operator, threshold, start_date, end_date)
+    cached = _memo_lookup(*args)
+    if cached is not None:
+        return {"analysis_id": public_id, "status": "done", "result": cached}
+    # Analyses whose history is already cached take milliseconds; run them
+    # ahead of ones that still have to go to POWER
+    priority = 0 if history_cache.get(snap(lat, lon), *_history_range()) is not None else 1
+    try:
+        # The id covers everything the result depends on, so it is the job's
+        # key; a submission differing only in location_name joins that job
+        job, _ = analysis_jobs.submit(
+            public_id,
+            lambda: _analyze_and_store(*args, deadline=Deadline(JOB_DEADLINE_SECONDS)),
+            priority=priority,
         )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"Analysis queue is full: {e}", headers={"Retry-After": "10"})
+    return JSONResponse(
+        status_code=202,
+        content={
+            "analysis_id": public_id,
+            "status": job.status,
+            "status_url": f"/api/ml/analyze/{public_id}",
+        },
+    )
+
+def run_analysis(
+    lat: float,
+    lon: float,
+    location_name: str,
+    threshold: float,
+    parameter: str,
+    operator: str,
+    start_date: str,
+    end_date: str,
+    deadline: Deadline = None,
+) -> dict:
+    """Full /analyze payload; runs in the request (mode=sync) or on a job worker."""
+    start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    # Get historical context (last 365 days); the probability model's
+    # 90-day window is a slice of it, so POWER is only asked once
+    hist_start, hist_end = _history_range()
+    hist, hist_provenance = fetch_history(
+        lat, lon, hist_start, hist_end,
+        deadline or Deadline.for_endpoint("analyze"),
+    )
+    
+    # Get probability analysis
+    prob_result = compute_probability(
+        lat=lat,
+        lon=lon,
+        threshold=threshold,
+        parameter=parameter,
+        operator=operator,
+        start_date=start_date,
+        end_date=end_date,
+        history=(hist, hist_provenance),
+    )
+    
+    # Parameter mapping
+    param_mapping = {
+        "temperature": "ts",
+        "humidity": "rh2m", 
+        "windSpeed": "ws10m",
+        "pressure": "ps"
+    }
+    nasa_param = param_mapping.get(parameter, "ts")
+    
+    # Calculate historical statistics
+    if nasa_param in hist.columns:
+        hist_values = hist[nasa_param].dropna()
         
-        # Get historical context (last 365 days)
-        hist_end = datetime.utcnow().date()
-        hist_start = hist_end - timedelta(days=365)
-        hist = fetch_power(lat, lon, hist_start.strftime("%Y%m%d"), hist_end.strftime("%Y%m%d"))
-        
-        # Parameter mapping
-        param_mapping = {
-            "temperature": "ts",
-            "humidity": "rh2m", 
-            "windSpeed": "ws10m",
-            "pressure": "ps"
-        }
-        nasa_param = param_mapping.get(parameter, "ts")
-        
-        # Calculate historical statistics
-        if nasa_param in hist.columns:
-            hist_values = hist[nasa_param].dropna()
-            
-            # Apply the same threshold check to historical data
-            if operator == ">":
-                historical_exceedances = (hist_values > threshold).sum()
-            elif operator == ">=":
-                historical_exceedances = (hist_values >= threshold).sum()
-            elif operator == "<":
-                historical_exceedances = (hist_values < threshold).sum()
-            elif operator == "<=":
-                historical_exceedances = (hist_values <= threshold).sum()
-            elif operator == "=":
-                epsilon = hist_values.std() * 0.1
-                historical_exceedances = ((hist_values >= threshold - epsilon) & 
-                                        (hist_values <= threshold + epsilon)).sum()
-            else:
-                historical_exceedances = (hist_values > threshold).sum()
-            
-            historical_rate = historical_exceedances / len(hist_values) * 100
-            
-            hist_stats = {
-                "mean": float(hist_values.mean()),
-                "std": float(hist_values.std()),
-                "min": float(hist_values.min()),
-                "max": float(hist_values.max()),
-                "historical_exceedance_rate": float(historical_rate),
-                "total_days": len(hist_values),
-                "exceedance_days": int(historical_exceedances)
-            }
+        # Apply the same threshold check to historical data
+        if operator == ">":
+            historical_exceedances = (hist_values > threshold).sum()
+        elif operator == ">=":
+            historical_exceedances = (hist_values >= threshold).sum()
+        elif operator == "<":
+            historical_exceedances = (hist_values < threshold).sum()
+        elif operator == "<=":
+            historical_exceedances = (hist_values <= threshold).sum()
+        elif operator == "=":
+            epsilon = hist_values.std() * 0.1
+            historical_exceedances = ((hist_values >= threshold - epsilon) & 
+                                    (hist_values <= threshold + epsilon)).sum()
         else:
-            hist_stats = {
-                "mean": None,
-                "std": None,
-                "min": None,
-                "max": None,
-                "historical_exceedance_rate": None,
-                "total_days": 0,
-                "exceedance_days": 0
-            }
+            historical_exceedances = (hist_values > threshold).sum()
         
-        # Calculate risk assessment
-        risk_level = "Low"
-        if prob_result["overall_probability"] > 0.7:
-            risk_level = "High"
-        elif prob_result["overall_probability"] > 0.4:
-            risk_level = "Medium"
+        historical_rate = historical_exceedances / len(hist_values) * 100
         
-        # Create comprehensive response
-        return {
-            "analysis_id": f"{lat}_{lon}_{parameter}_{start_date}_{end_date}",
-            "location": {
-                "name": location_name,
-                "latitude": lat,
-                "longitude": lon
-            },
-            "criteria": {
-                "parameter": parameter,
-                "operator": operator,
-                "threshold": threshold,
-                "date_range": {
-                    "start": start_date,
-                    "end": end_date,
-                    "days": (end_dt - start_dt).days + 1
-                }
-            },
-            "results": {
-                "overall_probability": prob_result["overall_probability"],
-                "risk_level": risk_level,
-                "summary": prob_result["summary"],
-                "daily_probabilities": prob_result["daily_probabilities"]
-            },
-            "historical_context": hist_stats,
-            "generated_at": datetime.utcnow().isoformat(),
-            "data_source": "NASA POWER API"
+        hist_stats = {
+            "mean": float(hist_values.mean()),
+            "std": float(hist_values.std()),
+            "min": float(hist_values.min()),
+            "max": float(hist_values.max()),
+            "historical_exceedance_rate": float(historical_rate),
+            "total_days": len(hist_values),
+            "exceedance_days": int(historical_exceedances)
         }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
\ No newline at end of file
+    else:
+        hist_stats = {
+            "mean": None,
+            "std": None,
+            "min": None,
+            "max": None,
+            "historical_exceedance_rate": None,
+            "total_days": 0,
+            "exceedance_days": 0
+        }
+    
+    # Calculate risk assessment
+    risk_level = "Low"
+    if prob_result["overall_probability"] > 0.7:
+        risk_level = "High"
+    elif prob_result["overall_probability"] > 0.4:
+        risk_level = "Medium"
+    
+    # Create comprehensive response
+    return {
+        "analysis_id": analysis_id(lat, lon, parameter, operator, threshold, start_date, end_date),
+        "location": {
+            "name": location_name,
+            "latitude": lat,
+            "longitude": lon
+        },
+        "criteria": {
+            "parameter": parameter,
+            "operator": operator,
+            "threshold": threshold,
+            "date_range": {
+                "start": start_date,
+                "end": end_date,
+                "days": (end_dt - start_dt).days + 1
+            }
+        },
+        "results": {
+            "overall_probability": prob_result["overall_probability"],
+            "risk_level": risk_level,
+            "summary": prob_result["summary"],
+            "daily_probabilities": prob_result["daily_probabilities"],
+            "simulation": prob_result["simulation"],
+        },
+        "historical_context": hist_stats,
+        "generated_at": datetime.utcnow().isoformat(),
+        "data_source": "Weather Model (NASA API Unavailable)" if hist_provenance["degraded"] else "NASA POWER API",
+        # Degraded too when the probabilities fell back to independent days,
+        # so the memo and HTTP cache keep the result only briefly
+        "provenance": dict(hist_provenance, degraded=hist_provenance["degraded"] or prob_result["provenance"]["degraded"]),
+    }
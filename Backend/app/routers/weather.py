@@ -1,11 +1,32 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Path, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta
-import random
 import math
-import requests
+from app.config import (
+    CURRENT_FRESH_SECONDS, CURRENT_MAX_STALE_SECONDS, FALLBACK_MAX_AGE, POWER_TIMEOUT_SECONDS, SYNTHETIC_MAX_AGE,
+    SYNTHETIC_DETERMINISTIC,
+)
+from app.sources import Deadline, Source, first_available, hourly_cache, single_flight
+from app.grid import snap
+from app import admission, push
+from app.http_cache import cached_json, etag_matches, seconds_until_next_hour, seconds_until_utc_midnight
+from app.memory import register_cache
+from app.nasa_client import power_get, decode_daily, fetch_power_hourly_arrays
+from app.resilience import CircuitOpenError, StaleWhileRevalidateCache
+from app.rng import floor_hour, rng_for
 
 router = APIRouter(prefix="/api/weather", tags=["weather"])
 
+HISTORICAL_MAX_AGE = 86400
+
+# Last known good NASA observation per grid cell, refreshed in the background
+current_cache = StaleWhileRevalidateCache(
+    fresh_for=CURRENT_FRESH_SECONDS,
+    max_stale=CURRENT_MAX_STALE_SECONDS,
+)
+register_cache("current", current_cache.stats)
+register_cache("push_channels", push.stats)
+
 def get_weather_description(temp: float, humidity: float) -> str:
     """Generate realistic weather descriptions based on temperature and humidity"""
     if temp > 30:
@@ -37,14 +58,13 @@ def get_weather_description(temp: float, humidity: float) -> str:
         else:
             return "Cold and clear"
 
-def fetch_nasa_power_direct(lat: float, lon: float) -> dict:
+def fetch_nasa_power_direct(lat: float, lon: float, timeout: float = POWER_TIMEOUT_SECONDS) -> dict:
     """Try to fetch data directly from NASA POWER API"""
     try:
         # Use recent dates (NASA POWER has a few days delay)
         end_date = (datetime.utcnow() - timedelta(days=3)).strftime("%Y%m%d")
         start_date = (datetime.utcnow() - timedelta(days=5)).strftime("%Y%m%d")
         
-        url = "https://power.larc.nasa.gov/api/temporal/daily/point"
         params = {
             "parameters": "T2M,RH2M,WS10M,PS",
             "community": "RE",
@@ -55,50 +75,55 @@ def fetch_nasa_power_direct(lat: float, lon: float) -> dict:
             "format": "JSON"
         }
         
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        data = power_get("daily/point", params, timeout=timeout)
         parameters = data["properties"]["parameter"]
         
-        # Get the latest data and check for valid values
-        dates = list(parameters["T2M"].keys())
-        
-        # Find a date with valid data (not -999.00)
-        valid_data = None
-        for date_key in reversed(sorted(dates)):  # Start with most recent
-            temp = parameters["T2M"][date_key]
-            humidity = parameters["RH2M"][date_key]
-            wind = parameters["WS10M"][date_key] 
-            pressure = parameters["PS"][date_key]
-            
-            # Check if data is valid (NASA uses -999.00 for missing data)
-            if (temp > -900 and humidity > -900 and wind > -900 and pressure > -900):
-                valid_data = {
-                    "temperature": temp,
-                    "humidity": humidity,
-                    "wind_speed": wind,
-                    "pressure": pressure,
-                    "visibility": round(random.uniform(5, 15), 1),
-                    "cloud_cover": round(random.uniform(0, 100)),
-                    "description": get_weather_description(temp, humidity)
-                }
-                break
+        # Run the shared QC stage once, then take the most recent complete row
+        import numpy as np
+        from app.qc import clean_columns, QC_MISSING
+
+        start, columns = decode_daily(parameters)
+        flags = clean_columns(columns)
+        complete = np.flatnonzero((flags & QC_MISSING) == 0)
         
-        if valid_data:
-            return valid_data
-        else:
+        if len(complete) == 0:
             # All NASA data is invalid, return None to trigger fallback
             print(f"All NASA data is invalid (-999 values) for coordinates {lat}, {lon}")
             return None
+        
+        i = complete[-1]
+        # Values are float32; round back to POWER's published precision
+        temp = round(float(columns["t2m"][i]), 2)
+        humidity = round(float(columns["rh2m"][i]), 2)
+        # POWER has no visibility or cloud cover; seeding by the observation's
+        # day keeps them stable across refreshes of the same observation
+        rng = rng_for(lat, lon, datetime.combine(start + timedelta(days=int(i)), datetime.min.time()))
+        return {
+            "temperature": temp,
+            "humidity": humidity,
+            "wind_speed": round(float(columns["ws10m"][i]), 2),
+            "pressure": round(float(columns["ps"][i]), 2),
+            "visibility": round(rng.uniform(5, 15), 1),
+            "cloud_cover": round(rng.uniform(0, 100)),
+            "description": get_weather_description(temp, humidity)
+        }
+    except CircuitOpenError:
+        # POWER is known to be down, fail fast instead of waiting on the timeout
+        return None
     except Exception as e:
         print(f"NASA API fetch failed: {e}")
         return None
 
-def generate_realistic_weather(lat: float, lon: float, base_timestamp: datetime = None):
-    """Generate realistic weather data based on location and time"""
+def generate_realistic_weather(lat: float, lon: float, base_timestamp: datetime = None, rng=None):
+    """Generate realistic weather data based on location and time.
+
+    The noise comes from rng, by default the stream for the location's grid
+    cell and hour (see app.rng), so the same inputs give the same weather.
+    """
     if not base_timestamp:
         base_timestamp = datetime.utcnow()
+    if rng is None:
+        rng = rng_for(lat, lon, base_timestamp)
     
     # Time-based variations
     hour = base_timestamp.hour
@@ -116,67 +141,225 @@ def generate_realistic_weather(lat: float, lon: float, base_timestamp: datetime
     daily_temp = 8 * math.sin((hour - 6) * 2 * math.pi / 24)
     
     # Add some realistic random variation
-    random_var = random.uniform(-3, 3)
+    random_var = rng.uniform(-3, 3)
     
     # Final temperature
     temperature = base_temp + seasonal_temp + daily_temp + random_var
     
     # Generate correlated weather parameters
     # Higher temps tend to have lower humidity and higher pressure
-    humidity = max(20, min(95, 70 - (temperature - 20) * 0.8 + random.uniform(-15, 15)))
-    pressure = max(98, min(105, 101.3 + (temperature - 20) * 0.1 + random.uniform(-1.5, 1.5)))
+    humidity = max(20, min(95, 70 - (temperature - 20) * 0.8 + rng.uniform(-15, 15)))
+    pressure = max(98, min(105, 101.3 + (temperature - 20) * 0.1 + rng.uniform(-1.5, 1.5)))
     
     # Wind speed based on pressure differences and random variation
-    wind = max(0, min(25, 5 + random.uniform(-3, 8) + abs(101.3 - pressure) * 2))
+    wind = max(0, min(25, 5 + rng.uniform(-3, 8) + abs(101.3 - pressure) * 2))
     
     return {
         "temperature": round(temperature, 2),
         "humidity": round(humidity, 1), 
         "wind_speed": round(wind, 1),
         "pressure": round(pressure, 2),
-        "visibility": round(random.uniform(5, 15), 1),
-        "cloud_cover": round(random.uniform(0, 100)),
+        "visibility": round(rng.uniform(5, 15), 1),
+        "cloud_cover": round(rng.uniform(0, 100)),
         "description": get_weather_description(temperature, humidity)
     }
 
 @router.get("/current")
-def current(lat: float, lon: float, _t: str = Query(None, description="Cache buster timestamp")):
+@admission.limit("current", "upstream")
+def current(
+    request: Request,
+    lat: float,
+    lon: float,
+    _t: str = Query(None, description="Ignored; responses carry ETag/Cache-Control instead"),
+):
+    payload = current_payload(lat, lon)
+    if payload["provenance"]["degraded"]:
+        # Short max-age so clients come back for real data once POWER recovers
+        return cached_json(request, payload, max_age=FALLBACK_MAX_AGE)
+    return cached_json(
+        request, payload,
+        max_age=CURRENT_FRESH_SECONDS,
+        stale_while_revalidate=CURRENT_MAX_STALE_SECONDS,
+    )
+
+@router.get("/stream")
+async def stream(request: Request, lat: float, lon: float):
+    """Server-sent events with the /current payload for (lat, lon)'s grid cell, pushed when it changes."""
+    cell = snap(lat, lon)
+    events = push.subscribe(
+        cell,
+        lambda: current_payload(cell.lat, cell.lon),
+        last_event_id=request.headers.get("last-event-id"),
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def current_payload(lat: float, lon: float) -> dict:
+    """Body of /current, shared with the push stream."""
     current_time = datetime.utcnow()
-    
-    # Try to fetch NASA POWER data directly
-    try:
-        nasa_data = fetch_nasa_power_direct(lat, lon)
-        if nasa_data:
-            return {
-                "lat": lat, 
-                "lon": lon, 
-                "current": nasa_data,
-                "timestamp": current_time.isoformat(),
-                "data_source": "NASA POWER API"
-            }
-    except Exception as e:
-        print(f"NASA API error: {e}")
-    
-    # Fallback to realistic mock data
-    realistic_data = generate_realistic_weather(lat, lon, current_time)
-    
+    deadline = Deadline.for_endpoint("current")
+    # Nearby clicks land in the same POWER grid cell and share one cache entry
+    cell = snap(lat, lon)
+    refresh = lambda: fetch_nasa_power_direct(cell.lat, cell.lon)
+
+    def fetch():
+        data = fetch_nasa_power_direct(cell.lat, cell.lon)
+        if data:
+            current_cache.put(cell, data)
+        return data
+
+    # Not cut off at the deadline: a late answer still fills current_cache
+    live = lambda dl: single_flight(("current", cell), fetch)
+
+    # Last good NASA observation first (a stale one is refreshed in the
+    # background), then the live API, then the synthetic model at the deadline
+    weather, provenance = first_available(
+        [
+            Source("cache", lambda dl: current_cache.cached(cell, refresh)),
+            Source("nasa_power", live),
+        ],
+        [Source("synthetic", lambda dl: generate_realistic_weather(lat, lon, current_time))],
+        deadline,
+    )
     return {
         "lat": lat, 
         "lon": lon, 
-        "current": realistic_data,
+        "current": weather,
         "timestamp": current_time.isoformat(),
-        "data_source": "Weather Model (NASA API Unavailable)"
+        "data_source": "Weather Model (NASA API Unavailable)" if provenance["degraded"] else "NASA POWER API",
+        "provenance": provenance,
+    }
+
+@router.get("/at-time")
+@admission.limit("at_time", "upstream")
+def at_time(
+    request: Request,
+    lat: float,
+    lon: float,
+    datetime_str: str = Query(..., description="ISO 8601 time; UTC unless it carries an offset"),
+):
+    """Weather at a point in time: POWER's hourly data interpolated to the minute,
+    or the synthetic model where POWER has no data (e.g. the future)."""
+    from app.series import HourlySeries, hour_number
+
+    try:
+        when = _parse_utc(datetime_str)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime: {datetime_str}")
+    cell = snap(lat, lon)
+    # The day either side too, so any time of day has both neighbouring hours
+    start = (when - timedelta(days=1)).strftime("%Y%m%d")
+    end = (when + timedelta(days=1)).strftime("%Y%m%d")
+
+    def observed(series):
+        if series is None:
+            return None
+        values = {name: float(v[0]) for name, v in series.at([hour_number(when)]).items()}
+        if any(math.isnan(v) for v in values.values()):
+            return None
+        return {
+            "temperature": round(values["t2m"], 2),
+            "humidity": round(values["rh2m"], 2),
+            "wind_speed": round(values["ws10m"], 2),
+            "pressure": round(values["ps"], 2),
+            "description": get_weather_description(values["t2m"], values["rh2m"]),
+        }
+
+    def fetch():
+        arrays = fetch_power_hourly_arrays(cell.lat, cell.lon, start, end, timeout=POWER_TIMEOUT_SECONDS)
+        series = HourlySeries.from_arrays(*arrays)
+        hourly_cache.put(cell, series)
+        return series
+
+    def live(dl):
+        return observed(single_flight(("hourly", cell, start, end), fetch))
+
+    sources = []
+    if when < datetime.utcnow():
+        sources = [
+            Source("cache", lambda dl: observed(hourly_cache.get(cell, start, end))),
+            Source("nasa_power", live),
+        ]
+    weather, provenance = first_available(
+        sources,
+        [Source("synthetic", lambda dl: generate_realistic_weather(lat, lon, when))],
+        Deadline.for_endpoint("current"),
+    )
+    payload = {
+        "lat": lat,
+        "lon": lon,
+        "datetime": when.isoformat(),
+        "weather": weather,
+        "data_source": "Weather Model (NASA data unavailable)" if provenance["degraded"] else "NASA POWER API (hourly)",
+        "provenance": provenance,
+    }
+    if provenance["degraded"]:
+        return cached_json(request, payload, max_age=FALLBACK_MAX_AGE)
+    return cached_json(request, payload, max_age=seconds_until_utc_midnight())
+
+@router.get("/tiles/{z}/{x}/{y}.{fmt}")
+@admission.limit("tiles", "cpu")
+def weather_tile(
+    request: Request,
+    z: int,
+    x: int,
+    y: int,
+    fmt: str = Path(..., regex="^(png|bin)$"),
+    parameter: str = Query("temperature", regex="^(temperature|humidity|windSpeed|pressure)$"),
+    date: str = Query(None, regex=r"^\d{4}-\d{2}-\d{2}$", description="Default: today (UTC)"),
+    threshold: float = Query(None, description="Render P(value <operator> threshold) instead of values"),
+    operator: str = Query(">", regex="^(>|<|>=|<=|=)$"),
+):
+    """Web-mercator z/x/y tile of a parameter (or threshold probability) on every
+    grid cell it covers: a colour-mapped PNG, or 256x256 little-endian float32 (.bin).
+    X-Tile-Source says whether the values came from the archive's climatology
+    grids, the synthetic seasonal model, or both ("mixed")."""
+    from app import tiles
+
+    if not tiles.valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail="No such tile")
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date() if date else datetime.utcnow().date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {date}")
+    body, etag, source = tiles.tile(parameter, z, x, y, fmt, day, threshold, operator)
+    vmin, vmax = tiles.value_range(parameter, threshold is not None)
+    # Today's tiles roll over at midnight; a tile for an explicit date never changes
+    max_age = HISTORICAL_MAX_AGE if date else seconds_until_utc_midnight()
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+        "X-Value-Min": str(vmin),
+        "X-Value-Max": str(vmax),
+        "X-Tile-Source": source,
     }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    media_type = "image/png" if fmt == "png" else "application/octet-stream"
+    return Response(body, media_type=media_type, headers=headers)
+
+def _parse_utc(value: str) -> datetime:
+    """Naive UTC datetime from an ISO 8601 string (a trailing Z is accepted)."""
+    when = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if when.tzinfo is not None:
+        when = (when - when.utcoffset()).replace(tzinfo=None)
+    return when
 
 @router.get("/forecast")
-def forecast(lat: float, lon: float, days: int = Query(14, ge=1, le=14)):
+def forecast(request: Request, lat: float, lon: float, days: int = Query(14, ge=1, le=14)):
     """Enhanced forecast with better date handling."""
     current_time = datetime.utcnow()
+    # Whole hours, so every request within the hour draws the same streams
+    base_time = floor_hour(current_time)
     
     forecast_data = []
     for i in range(1, days + 1):
-        future_date = current_time + timedelta(days=i)
-        weather = generate_realistic_weather(lat, lon, future_date)
+        future_date = base_time + timedelta(days=i)
+        rng = rng_for(lat, lon, future_date)
+        weather = generate_realistic_weather(lat, lon, future_date, rng)
         
         forecast_data.append({
             "date": future_date.strftime("%Y-%m-%d"),
@@ -185,10 +368,10 @@ def forecast(lat: float, lon: float, days: int = Query(14, ge=1, le=14)):
             "wind_speed": weather["wind_speed"],
             "pressure": weather["pressure"],
             "description": weather["description"],
-            "confidence_level": round(random.uniform(0.8, 0.95), 2),
-            "precipitation_chance": round(random.uniform(0, 50), 1),
-            "temperature_max": round(weather["temperature"] + random.uniform(2, 8), 1),
-            "temperature_min": round(weather["temperature"] - random.uniform(3, 7), 1)
+            "confidence_level": round(rng.uniform(0.8, 0.95), 2),
+            "precipitation_chance": round(rng.uniform(0, 50), 1),
+            "temperature_max": round(weather["temperature"] + rng.uniform(2, 8), 1),
+            "temperature_min": round(weather["temperature"] - rng.uniform(3, 7), 1)
         })
     
     response_data = {
@@ -204,17 +387,19 @@ def forecast(lat: float, lon: float, days: int = Query(14, ge=1, le=14)):
         print(f"First item keys: {list(forecast_data[0].keys())}")
         print(f"First item sample: {forecast_data[0]}")
     
-    return response_data
+    return cached_json(request, response_data, max_age=_synthetic_max_age())
 
 @router.get("/forecast/hourly")
-def forecast_hourly(lat: float, lon: float, hours: int = Query(48, ge=1, le=168)):
+def forecast_hourly(request: Request, lat: float, lon: float, hours: int = Query(48, ge=1, le=168)):
     """Generate hourly weather forecast for up to 7 days (168 hours)"""
     current_time = datetime.utcnow()
+    base_time = floor_hour(current_time)
     
     hourly_forecast = []
     for i in range(hours):
-        future_time = current_time + timedelta(hours=i)
-        weather = generate_realistic_weather(lat, lon, future_time)
+        future_time = base_time + timedelta(hours=i)
+        rng = rng_for(lat, lon, future_time)
+        weather = generate_realistic_weather(lat, lon, future_time, rng)
         
         # Add some hourly variation
         hourly_temp_variation = 3 * math.sin(future_time.hour * 2 * math.pi / 24)
@@ -229,11 +414,11 @@ def forecast_hourly(lat: float, lon: float, hours: int = Query(48, ge=1, le=168)
             "wind_speed": weather["wind_speed"],
             "pressure": weather["pressure"],
             "description": weather["description"],
-            "feels_like": round(adjusted_temp + random.uniform(-2, 2), 1),
-            "confidence_level": round(random.uniform(0.75, 0.95), 2),
-            "precipitation_chance": round(random.uniform(0, 40), 1),
-            "uv_index": random.randint(1, 10),
-            "wind_direction": random.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"])
+            "feels_like": round(adjusted_temp + rng.uniform(-2, 2), 1),
+            "confidence_level": round(rng.uniform(0.75, 0.95), 2),
+            "precipitation_chance": round(rng.uniform(0, 40), 1),
+            "uv_index": rng.randint(1, 10),
+            "wind_direction": rng.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"])
         })
     
     response_data = {
@@ -250,10 +435,11 @@ def forecast_hourly(lat: float, lon: float, hours: int = Query(48, ge=1, le=168)
         print(f"First item keys: {list(hourly_forecast[0].keys())}")
         print(f"First item sample: {hourly_forecast[0]}")
     
-    return response_data
+    return cached_json(request, response_data, max_age=_synthetic_max_age())
 
 @router.get("/historical")
 def historical(
+    request: Request,
     lat: float,
     lon: float,
     start: str = Query(..., regex=r"\d{4}-\d{2}-\d{2}"),
@@ -278,9 +464,15 @@ def historical(
         })
         current_date += timedelta(days=1)
     
-    return {
+    payload = {
         "lat": lat,
         "lon": lon,
         "data": historical_data,
         "period": f"{start} to {end}"
-    }
\ No newline at end of file
+    }
+    # Past days are seeded by their date alone, so the payload never changes
+    return cached_json(request, payload, max_age=HISTORICAL_MAX_AGE if SYNTHETIC_DETERMINISTIC else SYNTHETIC_MAX_AGE)
+
+def _synthetic_max_age() -> int:
+    """Forecasts are redrawn each UTC hour when seeded, so they can be cached until then."""
+    return seconds_until_next_hour() if SYNTHETIC_DETERMINISTIC else SYNTHETIC_MAX_AGE
\ No newline at end of file
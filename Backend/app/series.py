@@ -0,0 +1,185 @@
+import datetime as dt
+import numpy as np
+
+EPOCH = dt.date(1970, 1, 1)
+
+def day_number(date) -> int:
+    """Days since 1970-01-01 for a date, datetime, pandas Timestamp or 'YYYYMMDD' string."""
+    if isinstance(date, str):
+        date = dt.datetime.strptime(date.replace("-", ""), "%Y%m%d").date()
+    elif isinstance(date, dt.datetime):
+        date = date.date()
+    elif hasattr(date, "date"):  # pandas Timestamp
+        date = date.date()
+    return (date - EPOCH).days
+
+def hour_number(when: dt.datetime) -> float:
+    """Hours (fractional) since 1970-01-01 00:00 for a naive UTC datetime."""
+    return day_number(when) * 24 + when.hour + when.minute / 60 + when.second / 3600
+
+
+class LocationSeries:
+    """Compact daily series for one location.
+
+    Instead of a DataFrame (datetime64 index, float64 blocks, per-object
+    overhead) this keeps a start day number, one (n_columns, n_days) float32
+    block and a uint8 QC bitmask (see app.qc). Dates are implicit: row i is
+    start + i days. window() and column access return views, never copies.
+    """
+
+    __slots__ = ("start", "names", "values", "qc")
+
+    def __init__(self, start: int, names, values: np.ndarray, qc: np.ndarray = None):
+        self.start = int(start)
+        self.names = tuple(names)
+        self.values = values
+        self.qc = qc if qc is not None else np.zeros(values.shape[1], dtype=np.uint8)
+
+    @classmethod
+    def from_arrays(cls, start_date, columns: dict, qc=None) -> "LocationSeries":
+        """Build from decode_daily()/fetch_power_arrays() output."""
+        names = tuple(columns)
+        n = len(columns[names[0]]) if names else 0
+        values = np.empty((len(names), n), dtype=np.float32)
+        for i, name in enumerate(names):
+            values[i] = columns[name]
+        qc = np.asarray(qc, dtype=np.uint8) if qc is not None else None
+        return cls(day_number(start_date), names, values, qc)
+
+    @classmethod
+    def from_frame(cls, df) -> "LocationSeries":
+        """Build from the DataFrame form (daily DatetimeIndex, optional qc column)."""
+        import pandas as pd
+
+        if len(df) and len(df) != (df.index[-1] - df.index[0]).days + 1:
+            df = df.reindex(pd.date_range(df.index[0], df.index[-1], freq="D"))
+        names = [c for c in df.columns if c != "qc"]
+        values = np.ascontiguousarray(df[names].to_numpy(dtype=np.float32).T)
+        qc = df["qc"].fillna(0).to_numpy(dtype=np.uint8) if "qc" in df.columns else None
+        return cls(day_number(df.index[0]) if len(df) else 0, names, values, qc)
+
+    def __len__(self) -> int:
+        return self.values.shape[1]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.values[self.names.index(name)]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    @property
+    def end(self) -> int:
+        """Day number of the last row (inclusive)."""
+        return self.start + len(self) - 1
+
+    def covers(self, start, end) -> bool:
+        """Whether every day from start to end (inclusive) is in the series."""
+        return self.start <= day_number(start) and self.end >= day_number(end)
+
+    @property
+    def start_date(self) -> dt.date:
+        return EPOCH + dt.timedelta(days=self.start)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.qc.nbytes
+
+    def dates(self) -> np.ndarray:
+        return np.arange(self.start, self.start + len(self)).astype("datetime64[D]")
+
+    def window(self, start=None, end=None) -> "LocationSeries":
+        """Zero-copy view of the rows between two dates (inclusive), clipped to the data."""
+        i = 0 if start is None else max(0, day_number(start) - self.start)
+        j = len(self) if end is None else min(len(self), day_number(end) - self.start + 1)
+        j = max(i, j)
+        return LocationSeries(self.start + i, self.names, self.values[:, i:j], self.qc[i:j])
+
+    def tail(self, n: int) -> "LocationSeries":
+        i = max(0, len(self) - n)
+        return LocationSeries(self.start + i, self.names, self.values[:, i:], self.qc[i:])
+
+    def to_frame(self, with_qc: bool = True):
+        """DataFrame form returned by app.sources.fetch_history (daily DatetimeIndex, lowercase columns)."""
+        import pandas as pd
+
+        index = pd.date_range(self.start_date, periods=len(self), freq="D")
+        df = pd.DataFrame(self.values.T, index=index, columns=list(self.names), copy=False)
+        if with_qc:
+            df["qc"] = self.qc
+        return df
+
+
+class HourlySeries:
+    """Compact hourly series for one location: LocationSeries' layout at 24 rows a day.
+
+    Row i is hour start + i, counting hours since 1970-01-01 00:00 UTC, so
+    a year of four parameters is about 140 KB of float32.
+    """
+
+    __slots__ = ("start", "names", "values", "qc")
+
+    def __init__(self, start: int, names, values: np.ndarray, qc: np.ndarray = None):
+        self.start = int(start)
+        self.names = tuple(names)
+        self.values = values
+        self.qc = qc if qc is not None else np.zeros(values.shape[1], dtype=np.uint8)
+
+    @classmethod
+    def from_arrays(cls, start_date, columns: dict, qc=None) -> "HourlySeries":
+        """Build from fetch_power_hourly_arrays() output (the first row is 00:00 of start_date)."""
+        names = tuple(columns)
+        n = len(columns[names[0]]) if names else 0
+        values = np.empty((len(names), n), dtype=np.float32)
+        for i, name in enumerate(names):
+            values[i] = columns[name]
+        qc = np.asarray(qc, dtype=np.uint8) if qc is not None else None
+        return cls(day_number(start_date) * 24, names, values, qc)
+
+    def __len__(self) -> int:
+        return self.values.shape[1]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.values[self.names.index(name)]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    @property
+    def end(self) -> int:
+        """Hour number of the last row (inclusive)."""
+        return self.start + len(self) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.qc.nbytes
+
+    def covers(self, start, end) -> bool:
+        """Whether every hour of the days from start to end (inclusive) is in the series."""
+        return self.start <= day_number(start) * 24 and self.end >= day_number(end) * 24 + 23
+
+    def window(self, start=None, end=None) -> "HourlySeries":
+        """Zero-copy view of the hours of the days between two dates (inclusive)."""
+        i = 0 if start is None else max(0, day_number(start) * 24 - self.start)
+        j = len(self) if end is None else min(len(self), day_number(end) * 24 + 24 - self.start)
+        j = max(i, j)
+        return HourlySeries(self.start + i, self.names, self.values[:, i:j], self.qc[i:j])
+
+    def at(self, hours) -> dict:
+        """Every column linearly interpolated at (fractional) hour numbers.
+
+        Only the two neighbouring rows of each point are read, so the cost
+        depends on the number of points, not the length of the series. Points
+        outside the series or next to a missing value are NaN.
+        """
+        pos = np.asarray(hours, dtype=np.float64) - self.start
+        n = len(self)
+        if n == 0:
+            return {name: np.full(pos.shape, np.nan, dtype=np.float32) for name in self.names}
+        i = np.clip(np.floor(pos).astype(np.int64), 0, n - 1)
+        j = np.minimum(i + 1, n - 1)
+        frac = (pos - i).astype(np.float32)
+        lo, hi = self.values[:, i], self.values[:, j]
+        # On a whole hour only that row counts, even if the next one is missing
+        out = np.where(frac == 0, lo, lo + (hi - lo) * frac)
+        out[:, (pos < 0) | (pos > n - 1)] = np.nan
+        return dict(zip(self.names, out))
@@ -0,0 +1,255 @@
+"""Deadline-bounded data-source chain.
+
+Each endpoint gets a latency SLO. The request's deadline is derived from it and
+bounds how long the caller waits. Sources are tried in preference order (e.g.
+cache -> live API); a source that fails hands over immediately, and one that
+is slow is hedged by starting the next source in parallel. Whatever real
+answer arrives first wins. If nothing has answered by the deadline the
+fallbacks (e.g. a neighbouring cell, then the synthetic model) are tried in
+order and the answer is flagged as degraded.
+
+The deadline does not cut the upstream calls short: they run with their own
+POWER_TIMEOUT_SECONDS, so a slow POWER answer that misses one request's
+deadline still lands in the caches and serves the next request. Concurrent
+fetches of the same data share one upstream call (single_flight()).
+"""
+import threading, time
+from datetime import timedelta
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.config import (
+    ARCHIVE_HEDGE_MS, POWER_TIMEOUT_SECONDS, SOURCE_WORKERS, SOURCE_BUDGET_FRACTION, HISTORY_CACHE_MB, HOURLY_CACHE_MB, LATENCY_SLO_MS, NEIGHBOR_FALLBACK_KM,
+)
+from app.grid import CellIndex, snap
+from app.memory import register_cache
+
+_pool = ThreadPoolExecutor(max_workers=SOURCE_WORKERS, thread_name_prefix="source")
+_inflight = {}  # key -> Future of the call in progress
+_inflight_lock = threading.Lock()
+
+
+class Deadline:
+    """Absolute point in time a request must answer by."""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.started = time.monotonic()
+        self.expires = self.started + seconds
+
+    @classmethod
+    def for_endpoint(cls, endpoint: str) -> "Deadline":
+        """Deadline for data fetching, leaving the rest of the SLO for computation."""
+        return cls(LATENCY_SLO_MS[endpoint] / 1000 * SOURCE_BUDGET_FRACTION)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started) * 1000
+
+
+class Source:
+    """A named way to get an answer. fn(deadline) returns a value, or None for a miss."""
+
+    def __init__(self, name: str, fn, hedge_after: float = None):
+        self.name = name
+        self.fn = fn
+        # Seconds to wait on this source before also starting the next one
+        self.hedge_after = hedge_after
+
+
+def first_available(sources, fallbacks, deadline: Deadline):
+    """Return (value, provenance) from the first source that answers in time.
+
+    fallbacks is a list of cheap local Sources run in order once the deadline
+    passes or every source missed; the last one must always answer.
+    """
+    attempted, misses = [], []
+    futures = {}
+    next_index = 0
+    hedge_at = None
+
+    def launch():
+        nonlocal next_index, hedge_at
+        src = sources[next_index]
+        next_index += 1
+        attempted.append(src.name)
+        futures[_pool.submit(src.fn, deadline)] = src
+        hedge_at = time.monotonic() + src.hedge_after if src.hedge_after is not None else None
+
+    if sources:
+        launch()
+    while futures and not deadline.expired():
+        timeout = deadline.remaining()
+        if hedge_at is not None:
+            timeout = min(timeout, max(0.0, hedge_at - time.monotonic()))
+        done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            src = futures.pop(future)
+            try:
+                value = future.result()
+            except Exception as e:
+                print(f"Source '{src.name}' failed: {e}")
+                value = None
+            if value is not None:
+                return value, _provenance(src.name, deadline, attempted, misses, degraded=False)
+            misses.append(src.name)
+        hedge_due = hedge_at is not None and time.monotonic() >= hedge_at
+        if hedge_due:
+            hedge_at = None
+        if next_index < len(sources) and (not futures or hedge_due):
+            launch()
+
+    # Anything still running finishes in the background and fills the caches
+    for fallback in fallbacks:
+        attempted.append(fallback.name)
+        value = fallback.fn(deadline)
+        if value is not None:
+            break
+        misses.append(fallback.name)
+    return value, _provenance(fallback.name, deadline, attempted, misses, degraded=True)
+
+
+def single_flight(key, fn):
+    """Return fn(), sharing one call among concurrent callers with the same key."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        return future.result()
+    try:
+        result = fn()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _provenance(source: str, deadline: Deadline, attempted, misses, degraded: bool) -> dict:
+    return {
+        "source": source,
+        "degraded": degraded,
+        "attempted": list(attempted),
+        "misses": list(misses),
+        "latency_ms": round(deadline.elapsed_ms(), 1),
+        "budget_ms": round(deadline.budget * 1000, 1),
+    }
+
+
+class HistoryCache:
+    """LRU of POWER histories per grid cell as compact LocationSeries (or
+    HourlySeries), bounded by bytes.
+
+    One series is kept per cell; any requested window inside it is served
+    as a zero-copy view, so the 90-day and 365-day windows share storage.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.cells = CellIndex()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, start, end):
+        """Return the [start, end] window for key if it is fully cached, else None."""
+        with self._lock:
+            series = self._entries.get(key)
+            if series is None or not series.covers(start, end):
+                return None
+            self._entries.move_to_end(key)
+        return series.window(start, end)
+
+    def put(self, key, series):
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                # The newest days matter most: never give them up for older ones
+                if series.end < old.end or (series.end == old.end and series.start > old.start):
+                    return
+                self.nbytes -= old.nbytes
+            self._entries[key] = series
+            self._entries.move_to_end(key)
+            self.cells.add(key)
+            self.nbytes += series.nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                cell, evicted = self._entries.popitem(last=False)
+                self.cells.discard(cell)
+                self.nbytes -= evicted.nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+history_cache = HistoryCache(int(HISTORY_CACHE_MB * 1024 * 1024))
+register_cache("history", history_cache.stats)
+hourly_cache = HistoryCache(int(HOURLY_CACHE_MB * 1024 * 1024))
+register_cache("hourly", hourly_cache.stats)
+
+
+def fetch_history(lat: float, lon: float, start: str, end: str, deadline: Deadline):
+    """fetch_power() behind the source chain. Returns (DataFrame, provenance)."""
+    from app import archive
+    from app.nasa_client import fetch_power_arrays
+    from app.series import LocationSeries, day_number
+    from app.synthetic import synthetic_history
+
+    cell = snap(lat, lon)
+
+    def fetch():
+        # Ask for the cell centre so the cached series is exactly the cell's data
+        arrays = fetch_power_arrays(cell.lat, cell.lon, start, end, timeout=POWER_TIMEOUT_SECONDS)
+        series = LocationSeries.from_arrays(*arrays)
+        history_cache.put(cell, series)
+        return series
+
+    def live(dl):
+        return single_flight(("daily", cell, start, end), fetch)
+
+    def archived(dl):
+        series = archive.read_window(cell, start, end)
+        if series is None:
+            return None
+        if series.end < day_number(end):
+            # Only the days since the last backfill come from POWER
+            tail_start = (series.start_date + timedelta(days=len(series))).strftime("%Y%m%d")
+            tail = single_flight(("daily", cell, tail_start, end), lambda: LocationSeries.from_arrays(
+                *fetch_power_arrays(cell.lat, cell.lon, tail_start, end, timeout=POWER_TIMEOUT_SECONDS)))
+            series = archive.merge(series, tail)
+        history_cache.put(cell, series)
+        return series
+
+    def neighbor(dl):
+        for near in history_cache.cells.within(lat, lon, NEIGHBOR_FALLBACK_KM):
+            window = history_cache.get(near, start, end)
+            if window is not None:
+                return window
+        return None
+
+    value, provenance = first_available(
+        [
+            Source("cache", lambda dl: history_cache.get(cell, start, end)),
+            Source("archive", archived, hedge_after=ARCHIVE_HEDGE_MS / 1000),
+            Source("nasa_power", live),
+        ],
+        [
+            Source("neighbor_cell", neighbor),
+            Source("synthetic", lambda dl: synthetic_history(lat, lon, start, end)),
+        ],
+        deadline,
+    )
+    if isinstance(value, LocationSeries):
+        value = value.to_frame()
+    return value, provenance
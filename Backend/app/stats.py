@@ -0,0 +1,50 @@
+import numpy as np
+
+# Abramowitz & Stegun 7.1.26 rational approximation of erf (|error| < 1.5e-7),
+# which is plenty for threshold probabilities and avoids importing scipy
+_P = 0.3275911
+_A = (0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429)
+
+def erf(x):
+    """Vectorized error function."""
+    x = np.asarray(x, dtype=float)
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1.0 / (1.0 + _P * x)
+    poly = t * (_A[0] + t * (_A[1] + t * (_A[2] + t * (_A[3] + t * _A[4]))))
+    return sign * (1.0 - poly * np.exp(-x * x))
+
+def normal_cdf(x, loc=0.0, scale=1.0):
+    """Vectorized normal CDF, a drop-in for scipy.stats.norm.cdf(x, loc, scale)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (np.asarray(x, dtype=float) - loc) / (np.asarray(scale, dtype=float) * np.sqrt(2.0))
+    return 0.5 * (1.0 + erf(z))
+
+def threshold_probability(threshold: float, operator: str, loc, scale):
+    """P(value <operator> threshold) for value ~ Normal(loc, scale), clipped to [0, 1]."""
+    if operator == ">=":
+        probs = 1 - normal_cdf(threshold - 0.001, loc=loc, scale=scale)  # Small epsilon for >=
+    elif operator == "<":
+        probs = normal_cdf(threshold, loc=loc, scale=scale)
+    elif operator == "<=":
+        probs = normal_cdf(threshold + 0.001, loc=loc, scale=scale)      # Small epsilon for <=
+    elif operator == "=":
+        # For equality, use a small range around the threshold
+        epsilon = scale * 0.1  # 10% of standard deviation
+        probs = normal_cdf(threshold + epsilon, loc=loc, scale=scale) - normal_cdf(threshold - epsilon, loc=loc, scale=scale)
+    else:
+        probs = 1 - normal_cdf(threshold, loc=loc, scale=scale)  # ">" and default
+    return np.clip(probs, 0, 1)
+
+def exceeds(values, threshold: float, operator: str, scale):
+    """values <operator> threshold, elementwise; the sample counterpart of threshold_probability."""
+    values = np.asarray(values)
+    if operator == ">=":
+        return values >= threshold - 0.001
+    if operator == "<":
+        return values < threshold
+    if operator == "<=":
+        return values <= threshold + 0.001
+    if operator == "=":
+        return np.abs(values - threshold) <= np.asarray(scale) * 0.1
+    return values > threshold
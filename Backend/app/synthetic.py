@@ -0,0 +1,27 @@
+import numpy as np, pandas as pd
+
+def synthetic_history(lat: float, lon: float, start: str, end: str) -> pd.DataFrame:
+    """Climatological stand-in for fetch_power() when POWER can't answer in time.
+
+    Same shape as fetch_power (daily index, lowercase POWER columns) and the same
+    latitude/season model as the weather router's synthetic generator, without
+    the random noise so the result is stable.
+    """
+    index = pd.date_range(pd.to_datetime(start, format="%Y%m%d"), pd.to_datetime(end, format="%Y%m%d"), freq="D")
+    columns = climatology(lat, index.dayofyear.to_numpy())
+
+    df = pd.DataFrame({name: columns[name] for name in ("ts", "ws10m", "rh2m", "ps")}, index=index)
+    df["qc"] = np.zeros(len(index), dtype=np.uint8)
+    return df
+
+def climatology(lat, doy) -> dict:
+    """The model's seasonal value of each POWER column; lat and doy broadcast as arrays."""
+    lat = np.asarray(lat, dtype=np.float64)
+    base_temp = 15 + (25 * (1 - np.abs(lat) / 90))
+    seasonal = 10 * np.sin((np.asarray(doy) - 80) * 2 * np.pi / 365)
+    seasonal = np.where(lat < 0, -seasonal, seasonal)  # Southern hemisphere - flip seasons
+    ts = base_temp + seasonal
+    rh2m = np.clip(70 - (ts - 20) * 0.8, 20, 95)
+    ps = np.clip(101.3 + (ts - 20) * 0.1, 98, 105)
+    ws10m = np.clip(5 + np.abs(101.3 - ps) * 2, 0, 25)
+    return {"ts": ts, "rh2m": rh2m, "ws10m": ws10m, "ps": ps}
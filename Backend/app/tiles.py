@@ -0,0 +1,211 @@
+"""Web-mercator map tiles of a weather parameter or threshold probability.
+
+Every pixel of a z/x/y tile is mapped to the POWER grid cell it falls in
+(app.grid.snap_many). Values are computed once per distinct cell and
+scattered back, all vectorized. The per-cell value for a date is a
+climatological mean: a monthly (12, N_ROWS, N_COLS) grid if CLIMATOLOGY_DIR
+has one for the parameter (ts.npy, rh2m.npy, ...; an optional <name>_std.npy
+gives the spread; python -m app.climatology builds them from the archive),
+otherwise, and for cells the grid has no value for, the seasonal model the
+synthetic fallback uses. Each tile reports which of the two it came from.
+Probabilities treat the value as Normal(mean, spread).
+
+Tiles are encoded as an RGBA PNG (colour ramp over a fixed range per
+parameter, transparent where there is no value) or as raw little-endian
+float32, and the encoded bytes are kept in an LRU bounded by TILE_CACHE_MB.
+"""
+import hashlib, struct, threading, zlib
+from collections import OrderedDict
+from app.config import TILE_CACHE_MB
+from app.memory import register_cache
+
+TILE_SIZE = 256
+MAX_ZOOM = 12
+
+# Frontend name -> (POWER column, PNG colour range, climatological spread)
+PARAMETERS = {
+    "temperature": ("ts", (-30.0, 45.0), 5.0),   # °C
+    "humidity": ("rh2m", (0.0, 100.0), 12.0),    # %
+    "windSpeed": ("ws10m", (0.0, 20.0), 2.5),    # m/s
+    "pressure": ("ps", (95.0, 105.0), 0.8),      # kPa
+}
+PARAMETERS_BY_COLUMN = {column: (name, vrange, spread) for name, (column, vrange, spread) in PARAMETERS.items()}
+
+# Colour ramp stops (blue -> cyan -> green -> yellow -> red)
+_STOPS = ((0.0, (49, 54, 149)), (0.25, (69, 170, 220)), (0.5, (120, 198, 121)),
+          (0.75, (254, 224, 75)), (1.0, (215, 48, 39)))
+_ALPHA = 180
+_palette = None
+
+
+def pixel_lat_lon(z: int, x: int, y: int, size: int = TILE_SIZE):
+    """Latitudes (size,) and longitudes (size,) of the pixel centres of a tile."""
+    import numpy as np
+
+    n = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lons = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return lats, lons
+
+
+def cell_values(column: str, rows, cols, date):
+    """(mean, spread, source) of column on date for grid cells given as row/col arrays.
+
+    source is "climatology", "synthetic" or "mixed" (some cells from each).
+    """
+    import numpy as np
+    from app import arena
+    from app.grid import LAT_STEP, N_COLS, N_ROWS
+    from app.synthetic import climatology
+
+    shape = (12, N_ROWS, N_COLS)
+    spread = PARAMETERS_BY_COLUMN[column][2]
+    grid = arena.get_array(column)
+    lats = -90.0 + rows * LAT_STEP
+    if grid is None or grid.shape != shape:
+        return climatology(lats, date.timetuple().tm_yday)[column], spread, "synthetic"
+    mean = grid[date.month - 1, rows, cols].astype(np.float64)
+    std = arena.get_array(column + "_std")
+    if std is not None and std.shape == shape:
+        spread = np.nan_to_num(std[date.month - 1, rows, cols].astype(np.float64), nan=spread)
+    missing = np.isnan(mean)
+    if not missing.any():
+        return mean, spread, "climatology"
+    seasonal = np.broadcast_to(climatology(lats, date.timetuple().tm_yday)[column], mean.shape)
+    mean = np.where(missing, seasonal, mean)
+    return mean, spread, "synthetic" if missing.all() else "mixed"
+
+
+def render(parameter: str, z: int, x: int, y: int, date, threshold: float = None, operator: str = ">"):
+    """(size, size) float32 raster of parameter values, or P(value <operator> threshold),
+    and the cell_values() source it was computed from."""
+    import numpy as np
+    from app.grid import snap_many
+    from app.stats import threshold_probability
+
+    column = PARAMETERS[parameter][0]
+    lats, lons = pixel_lat_lon(z, x, y)
+    rows, cols = snap_many(lats, lons)
+    # A pixel row shares one grid row and a pixel column one grid column, so
+    # the distinct cells are the product of the distinct rows and columns
+    unique_rows, row_of = np.unique(rows, return_inverse=True)
+    unique_cols, col_of = np.unique(cols, return_inverse=True)
+    mean, spread, source = cell_values(column, unique_rows[:, None], unique_cols[None, :], date)
+    if threshold is not None:
+        values = threshold_probability(threshold, operator, mean, spread)
+    else:
+        values = mean
+    values = np.broadcast_to(values, (len(unique_rows), len(unique_cols)))
+    return np.asarray(values, dtype=np.float32)[row_of[:, None], col_of[None, :]], source
+
+
+def _get_palette():
+    global _palette
+    if _palette is None:
+        import numpy as np
+
+        t = np.linspace(0, 1, 256)
+        stops = np.array([s[0] for s in _STOPS])
+        rgb = np.stack([np.interp(t, stops, [s[1][i] for s in _STOPS]) for i in range(3)], axis=1)
+        _palette = np.concatenate([rgb, np.full((256, 1), _ALPHA)], axis=1).astype(np.uint8)
+    return _palette
+
+
+def encode_png(raster, vmin: float, vmax: float) -> bytes:
+    """RGBA PNG of raster on the colour ramp over [vmin, vmax]; NaN is transparent."""
+    import numpy as np
+
+    h, w = raster.shape
+    with np.errstate(invalid="ignore"):
+        index = np.clip((raster - vmin) / (vmax - vmin) * 255, 0, 255)
+    rgba = _get_palette()[np.nan_to_num(index).astype(np.uint8)]
+    rgba[np.isnan(raster)] = 0
+    # Each scanline is prefixed with filter type 0 (none)
+    scanlines = np.zeros((h, 1 + w * 4), dtype=np.uint8)
+    scanlines[:, 1:] = rgba.reshape(h, w * 4)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0)  # 8-bit RGBA
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6)) + chunk(b"IEND", b""))
+
+
+def encode_bin(raster) -> bytes:
+    """Raw little-endian float32, row-major from the tile's north-west corner."""
+    import numpy as np
+
+    return np.ascontiguousarray(raster, dtype="<f4").tobytes()
+
+
+def value_range(parameter: str, probability: bool):
+    return (0.0, 1.0) if probability else PARAMETERS[parameter][1]
+
+
+def tile(parameter: str, z: int, x: int, y: int, fmt: str, date, threshold: float = None, operator: str = ">"):
+    """(encoded bytes, ETag, source) of a tile, from the cache when possible."""
+    key = (parameter, z, x, y, fmt, date.isoformat(), threshold, operator if threshold is not None else None)
+    cached = tile_cache.get(key)
+    if cached is not None:
+        return cached
+    raster, source = render(parameter, z, x, y, date, threshold, operator)
+    if fmt == "png":
+        body = encode_png(raster, *value_range(parameter, threshold is not None))
+    else:
+        body = encode_bin(raster)
+    entry = (body, '"' + hashlib.sha1(body).hexdigest() + '"', source)
+    tile_cache.put(key, entry)
+    return entry
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+class TileCache:
+    """LRU of encoded tiles, bounded by bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old[0])
+            self._entries[key] = entry
+            self.nbytes += len(entry[0])
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted[0])
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+tile_cache = TileCache(int(TILE_CACHE_MB * 1024 * 1024))
+register_cache("tiles", tile_cache.stats)
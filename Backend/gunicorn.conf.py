@@ -0,0 +1,33 @@
+# Production serving mode: pre-fork master with preloaded, shared read-only state
+#   gunicorn -c gunicorn.conf.py app.main:app
+import multiprocessing, os, random
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Import the app (and everything it pulls in) once in the master before forking
+preload_app = True
+
+# Graceful recycling: each worker is replaced after a jittered number of
+# requests so they don't all restart at once; in-flight requests get
+# graceful_timeout seconds to finish. `kill -HUP <master>` re-forks all workers
+# from the already-loaded master without reloading models.
+max_requests = int(os.getenv("MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "500"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before workers are forked."""
+    from app import arena
+
+    arena.preload()
+    arena.freeze()
+    server.log.info("Arena ready: %s", arena.stats())
+
+def post_fork(server, worker):
+    # Forked workers inherit the master's RNG state; reseed so backoff jitter
+    # and the synthetic model don't move in lockstep across workers
+    random.seed()
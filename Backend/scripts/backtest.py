@@ -0,0 +1,242 @@
+"""Rolling-origin backtest of the prediction models over the local archive.
+
+For every archived grid cell and every forecast origin (every --step days in
+--years) the models are run exactly as the API runs them: the last
+--history-days before the origin go in, the next --horizon days come out.
+
+  every parameter     app.ml.predict_features on app.features rows (site/region/
+                     global forest, or the seasonal fallback for ts without a
+                     model); parameters the model doesn't predict use
+                     app.ml.persistence_forecast
+
+Each forecast is scored against what was then observed:
+
+  accuracy      RMSE, MAE and bias per parameter, and RMSE per lead day
+  calibration   /api/ml/probability's threshold probabilities for
+                "value > q-th quantile of the history window" events:
+                Brier score, skill against climatology and a reliability table
+  throughput    forecasts and predicted days per second, wall and per worker
+
+Cells are spread over --workers processes. Seed the archive first with
+python -m app.backfill. Run from the Backend directory:
+
+    python scripts/backtest.py --years 2015-2019
+    python scripts/backtest.py --cells r261c170,r262c170 --step 3 --workers 8 --json backtest.json
+"""
+import argparse, contextlib, io, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from app.config import ARCHIVE_DIR
+
+PARAMETERS = ("ts", "rh2m", "ws10m", "ps")
+N_BINS = 10
+# Origins per forest pass; bounds the (trees x rows) traversal arrays
+BATCH_ORIGINS = 512
+
+
+def _empty(horizon: int) -> dict:
+    return {
+        "forecasts": 0,
+        "days": 0,
+        "seconds": 0.0,
+        "errors": {
+            p: {"n": 0, "sum": 0.0, "sum_abs": 0.0, "sum_sq": 0.0, "lead_n": np.zeros(horizon), "lead_sq": np.zeros(horizon)}
+            for p in PARAMETERS
+        },
+        # Per parameter: reliability bins of (count, sum of p, sum of outcomes), Brier sums
+        "calibration": {
+            p: {"bins": np.zeros((N_BINS, 3)), "brier": 0.0, "base_sum": 0.0, "n": 0}
+            for p in PARAMETERS
+        },
+    }
+
+
+def _merge(total: dict, part: dict):
+    for key in ("forecasts", "days", "seconds"):
+        total[key] += part[key]
+    for p in PARAMETERS:
+        for k, v in part["errors"][p].items():
+            total["errors"][p][k] = total["errors"][p][k] + v
+        for k, v in part["calibration"][p].items():
+            total["calibration"][p][k] = total["calibration"][p][k] + v
+
+
+def backtest_cell(key: str, archive_dir: str, first_year: int, last_year: int,
+                  step: int, horizon: int, history_days: int, quantiles) -> dict:
+    """Score every origin for one cell. Runs in a worker process."""
+    import pandas as pd
+    from app import archive
+    from app.features import FeatureBlock, forecast_rows
+    from app.grid import from_key
+    from app.ml import persistence_forecast, predict_features
+    from app.qc import QC_MISSING
+    from app.series import day_number
+    from app.stats import threshold_probability
+
+    cell = from_key(key)
+    out = _empty(horizon)
+    series = archive.load(cell, archive_dir)
+    if series is None:
+        return out
+    values = {p: np.where((series.qc & QC_MISSING) == 0, series[p], np.nan).astype(np.float64)
+              for p in PARAMETERS if p in series}
+
+    first = max(day_number(f"{first_year}0101"), series.start + history_days)
+    last = min(day_number(f"{last_year}1231"), series.end - horizon)
+    origins = np.arange(first, last + 1, step)
+    started = time.process_time()
+    # Model predictions per parameter: (mean, scale or None), (origins, horizon) each
+    model = {}
+    if "ts" in values and len(origins):
+        # Features for the whole archive once; every origin's forecast is a
+        # slice of it, and the forest runs over all origins in a few batches
+        block = FeatureBlock.build(series, cell.lat, cell.lon)
+        for c in range(0, len(origins), BATCH_ORIGINS):
+            chunk = origins[c:c + BATCH_ORIGINS]
+            X = np.concatenate([forecast_rows(block, o, np.arange(o + 1, o + 1 + horizon)) for o in chunk])
+            # The seasonal fallback prints a notice on every call
+            with contextlib.redirect_stdout(io.StringIO()):
+                predicted = predict_features(X, cell.lat, cell.lon)
+            for p, (mean, _, _, scale) in predicted.items():
+                if p not in values:
+                    continue
+                if p not in model:
+                    model[p] = (np.empty((len(origins), horizon)),
+                                None if scale is None else np.empty((len(origins), horizon)))
+                model[p][0][c:c + len(chunk)] = mean.reshape(len(chunk), horizon)
+                if scale is not None:
+                    model[p][1][c:c + len(chunk)] = scale.reshape(len(chunk), horizon)
+    for n, origin in enumerate(origins):
+        i = origin - series.start
+        future_dates = pd.to_datetime(np.arange(origin + 1, origin + 1 + horizon), unit="D")
+        out["forecasts"] += 1
+        for p, column in values.items():
+            actual = column[i + 1:i + 1 + horizon]
+            past = column[i - history_days + 1:i + 1]
+            if p in model:
+                preds, scale = model[p][0][n], (model[p][1][n] if model[p][1] is not None else None)
+            else:
+                preds, scale = persistence_forecast(past[-14:], future_dates, p), None
+            if scale is None:
+                scale = np.nanstd(past, ddof=1)
+            ok = ~np.isnan(actual)
+            if not ok.any():
+                continue
+            err = np.asarray(preds, dtype=np.float64) - actual
+            e = out["errors"][p]
+            e["n"] += int(ok.sum())
+            e["sum"] += float(err[ok].sum())
+            e["sum_abs"] += float(np.abs(err[ok]).sum())
+            e["sum_sq"] += float((err[ok] ** 2).sum())
+            e["lead_n"] += ok
+            e["lead_sq"] += np.where(ok, err, 0.0) ** 2
+            out["days"] += int(ok.sum())
+
+            c = out["calibration"][p]
+            for q in quantiles:
+                threshold = np.nanquantile(past, q)
+                probs = np.broadcast_to(threshold_probability(threshold, ">", preds, scale), actual.shape)[ok]
+                outcome = (actual[ok] > threshold).astype(np.float64)
+                bins = np.minimum((probs * N_BINS).astype(int), N_BINS - 1)
+                np.add.at(c["bins"], (bins, 0), 1)
+                np.add.at(c["bins"], (bins, 1), probs)
+                np.add.at(c["bins"], (bins, 2), outcome)
+                c["brier"] += float(((probs - outcome) ** 2).sum())
+                # Climatological reference forecast: P = 1 - q every day
+                c["base_sum"] += float((((1 - q) - outcome) ** 2).sum())
+                c["n"] += len(outcome)
+    out["seconds"] = time.process_time() - started
+    return out
+
+
+def report(total: dict, wall: float, n_cells: int, workers: int) -> dict:
+    summary = {"cells": n_cells, "workers": workers, "forecasts": total["forecasts"], "accuracy": {}, "calibration": {}}
+    print(f"\n{'param':<7}{'days':>10}{'RMSE':>9}{'MAE':>9}{'bias':>9}   RMSE by lead day")
+    for p in PARAMETERS:
+        e = total["errors"][p]
+        if not e["n"]:
+            continue
+        rmse = float(np.sqrt(e["sum_sq"] / e["n"]))
+        lead = np.sqrt(e["lead_sq"] / np.maximum(e["lead_n"], 1))
+        summary["accuracy"][p] = {
+            "n": int(e["n"]), "rmse": rmse, "mae": e["sum_abs"] / e["n"], "bias": e["sum"] / e["n"],
+            "rmse_by_lead": [round(float(x), 3) for x in lead],
+        }
+        a = summary["accuracy"][p]
+        print(f"{p:<7}{e['n']:>10}{rmse:>9.3f}{a['mae']:>9.3f}{a['bias']:>9.3f}   "
+              + " ".join(f"{x:.2f}" for x in lead))
+
+    print(f"\n{'param':<7}{'events':>10}{'Brier':>9}{'skill':>9}   reliability (forecast p -> observed freq)")
+    for p in PARAMETERS:
+        c = total["calibration"][p]
+        if not c["n"]:
+            continue
+        brier = c["brier"] / c["n"]
+        skill = 1 - c["brier"] / c["base_sum"] if c["base_sum"] else None
+        rows = [
+            {"p": round(float(b[1] / b[0]), 3), "observed": round(float(b[2] / b[0]), 3), "n": int(b[0])}
+            for b in c["bins"] if b[0]
+        ]
+        summary["calibration"][p] = {"events": int(c["n"]), "brier": brier, "brier_skill": skill, "reliability": rows}
+        print(f"{p:<7}{c['n']:>10}{brier:>9.4f}{(skill if skill is not None else float('nan')):>9.3f}   "
+              + " ".join(f"{r['p']:.2f}->{r['observed']:.2f}" for r in rows))
+
+    summary["throughput"] = {
+        "wall_seconds": round(wall, 2),
+        "forecasts_per_second": total["forecasts"] / wall if wall else None,
+        "predicted_days_per_second": total["days"] / wall if wall else None,
+        "forecasts_per_worker_cpu_second": total["forecasts"] / total["seconds"] if total["seconds"] else None,
+    }
+    t = summary["throughput"]
+    print(f"\n{total['forecasts']} forecasts over {n_cells} cells in {wall:.1f}s on {workers} workers: "
+          f"{t['forecasts_per_second'] or 0:.1f} forecasts/s, {t['predicted_days_per_second'] or 0:.0f} days/s, "
+          f"{t['forecasts_per_worker_cpu_second'] or 0:.1f} forecasts per worker CPU-second")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--cells", help="comma-separated cell keys (default: every archived cell)")
+    parser.add_argument("--years", required=True, help="origin years, first-last")
+    parser.add_argument("--step", type=int, default=7, help="days between forecast origins")
+    parser.add_argument("--horizon", type=int, default=14)
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--quantiles", default="0.5,0.9", help="event thresholds as history quantiles")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--json", help="also write the summary here")
+    args = parser.parse_args()
+
+    if args.cells:
+        keys = args.cells.split(",")
+    else:
+        from app import archive
+
+        keys = [cell.key for cell in archive.cells(args.archive_dir)]
+    if not keys:
+        parser.error(f"no archived cells in {args.archive_dir}; run python -m app.backfill first")
+    first, _, last = args.years.partition("-")
+    quantiles = [float(q) for q in args.quantiles.split(",")]
+
+    total = _empty(args.horizon)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(backtest_cell, key, args.archive_dir, int(first), int(last or first),
+                        args.step, args.horizon, args.history_days, quantiles)
+            for key in keys
+        ]
+        for n, future in enumerate(as_completed(futures), 1):
+            _merge(total, future.result())
+            print(f"\r{n}/{len(keys)} cells", end="", flush=True)
+    summary = report(total, time.perf_counter() - started, len(keys), args.workers)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark POWER daily payload decoding: old DataFrame path vs typed-array decoder.
+
+Builds realistic POWER JSON payloads locally (no network) and times:
+
+  legacy  json.loads -> pd.DataFrame(dict of dicts) -> pd.to_datetime -> rename
+  arrays  loads -> decode_daily (float32 arrays, computed date range)
+  frame   arrays + to_frame, for callers that still want a DataFrame
+
+Run from the Backend directory:
+
+    python scripts/bench_power_decode.py
+    python scripts/bench_power_decode.py --days 365 3650 --params TS,WS10M,RH2M,PS,T2M
+"""
+import argparse, datetime as dt, json, os, random, sys, timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from app.nasa_client import _loads, decode_daily, to_frame
+
+def make_payload(days: int, params) -> bytes:
+    start = dt.date(2000, 1, 1)
+    dates = [(start + dt.timedelta(days=i)).strftime("%Y%m%d") for i in range(days)]
+    parameter = {
+        p: {d: (-999.0 if random.random() < 0.02 else round(random.uniform(0, 100), 2)) for d in dates}
+        for p in params
+    }
+    return json.dumps({"properties": {"parameter": parameter}}).encode()
+
+def legacy(content: bytes):
+    j = json.loads(content)
+    df = pd.DataFrame(j["properties"]["parameter"])
+    df.index = pd.to_datetime(df.index, format="%Y%m%d")
+    return df.rename(columns={p: p.lower() for p in df.columns})
+
+def arrays(content: bytes):
+    return decode_daily(_loads(content)["properties"]["parameter"])
+
+def frame(content: bytes):
+    return to_frame(*arrays(content))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[90, 365, 3650])
+    parser.add_argument("--params", default="TS,WS10M,RH2M,PS")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    params = args.params.split(",")
+
+    print(f"JSON decoder: {_loads.__module__}")
+    print(f"{'days':>6} {'legacy ms':>10} {'arrays ms':>10} {'frame ms':>10} {'speedup':>8}")
+    for days in args.days:
+        content = make_payload(days, params)
+        number = max(1, 2000 // days)
+        results = {}
+        for name, fn in (("legacy", legacy), ("arrays", arrays), ("frame", frame)):
+            best = min(timeit.repeat(lambda: fn(content), number=number, repeat=args.repeat))
+            results[name] = best / number * 1000
+        print(
+            f"{days:>6} {results['legacy']:>10.2f} {results['arrays']:>10.2f} "
+            f"{results['frame']:>10.2f} {results['legacy'] / results['frame']:>7.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
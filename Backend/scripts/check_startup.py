@@ -0,0 +1,60 @@
+"""Fail when importing the app takes longer than the startup budget.
+
+Cold start time decides how fast new instances can take traffic during a
+burst, so heavy imports (pandas, sklearn, scipy, ...) must stay off the import
+path of app.main. Run from the Backend directory:
+
+    python scripts/check_startup.py                  # budget from STARTUP_BUDGET_MS
+    python scripts/check_startup.py --budget-ms 800 --runs 5
+"""
+import argparse, os, re, statistics, subprocess, sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+def measure_once(module: str) -> float:
+    """Import module in a fresh interpreter and return the import time in ms."""
+    out = subprocess.run(
+        [sys.executable, "-c", MEASURE.format(module=module)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+def slowest_imports(module: str, top: int = 10):
+    """Return the top (cumulative_us, name) pairs from python -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(.*)", line)
+        if m:
+            rows.append((int(m.group(1)), m.group(2).strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1000")))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    times = [measure_once(args.module) for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f"import {args.module}: median {median:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if median <= args.budget_ms:
+        print("✅ Startup within budget")
+        return 0
+
+    print("❌ Startup over budget. Slowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(args.module):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
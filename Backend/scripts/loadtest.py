@@ -0,0 +1,273 @@
+"""End-to-end load test of app.main:app against a local stand-in for POWER.
+
+Starts a fake POWER server (deterministic daily series, optional added
+latency) and the app under uvicorn with NASA_POWER_URL pointing at it, then
+drives a weighted mix of /api/weather/* and /api/ml/* requests over a pool of
+locations from --concurrency client threads for --duration seconds. Per route
+it reports requests/s, error rate (anything but 2xx/304, with the 4xx share
+shown separately) and p50/p95/p99 latency.
+
+Gating (exit code 1):
+  * p99 above the endpoint's latency SLO (app.config.LATENCY_SLO_MS)
+  * p95/p99 more than --tolerance above the --baseline recorded earlier
+  * error rate above --max-error-rate
+
+Run from the Backend directory:
+
+    python scripts/loadtest.py --record loadtest-baseline.json
+    python scripts/loadtest.py --baseline loadtest-baseline.json --concurrency 32 --duration 60
+    python scripts/loadtest.py --url http://staging:8000 --baseline loadtest-baseline.json
+"""
+import argparse, datetime as dt, json, math, os, random, socket, subprocess, sys, threading, time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import numpy as np, requests
+from app.config import LATENCY_SLO_MS
+
+# route name -> (weight, method, path, SLO key or None)
+MIX = {
+    "current": (40, "GET", "/api/weather/current", "current"),
+    "forecast": (15, "GET", "/api/weather/forecast", None),
+    "forecast_hourly": (10, "GET", "/api/weather/forecast/hourly", None),
+    "historical": (5, "GET", "/api/weather/historical", None),
+    "predict": (10, "GET", "/api/ml/predict", "predict"),
+    "probability": (15, "GET", "/api/ml/probability", "probability"),
+    "analyze": (5, "POST", "/api/ml/analyze", "analyze"),
+}
+
+
+class FakePower(BaseHTTPRequestHandler):
+    """Answers POWER daily/point requests with a smooth deterministic series."""
+
+    latency = 0.0
+
+    def do_GET(self):
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        time.sleep(self.latency)
+        start = dt.datetime.strptime(q["start"], "%Y%m%d").date()
+        end = dt.datetime.strptime(q["end"], "%Y%m%d").date()
+        lat = float(q.get("latitude", 0))
+        days = [start + dt.timedelta(days=i) for i in range((end - start).days + 1)]
+        base = {
+            "TS": lambda d: 5 + 25 * (1 - abs(lat) / 90) + 10 * math.sin((d.timetuple().tm_yday - 80) / 58),
+            "T2M": lambda d: 14 + 10 * math.sin((d.timetuple().tm_yday - 80) / 58),
+            "RH2M": lambda d: 60 + 10 * math.cos(d.toordinal() / 7),
+            "WS10M": lambda d: 4 + 2 * math.sin(d.toordinal() / 3),
+            "PS": lambda d: 101 + 0.5 * math.sin(d.toordinal() / 5),
+        }
+        parameter = {
+            name: {d.strftime("%Y%m%d"): round(base.get(name, lambda d: 0.0)(d), 2) for d in days}
+            for name in q.get("parameters", "TS").split(",")
+        }
+        body = json.dumps({"properties": {"parameter": parameter}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(power_url: str, workers: int):
+    """Start uvicorn on a free port; returns (process, base url) once it answers."""
+    port = free_port()
+    env = dict(os.environ, NASA_POWER_URL=power_url, PYTHONPATH=BACKEND)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if requests.get(url + "/", timeout=1).status_code == 200:
+                return proc, url
+        except requests.ConnectionError:
+            pass
+        if proc.poll() is not None:
+            raise SystemExit("app exited during startup")
+        time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("app did not become ready")
+
+
+def request_params(route: str, lat: float, lon: float, rng: random.Random) -> dict:
+    params = {"lat": lat, "lon": lon}
+    today = dt.date.today()
+    if route == "forecast":
+        params["days"] = 14
+    elif route == "forecast_hourly":
+        params["hours"] = 48
+    elif route == "historical":
+        params["start"] = (today - dt.timedelta(days=30)).isoformat()
+        params["end"] = today.isoformat()
+    elif route == "predict":
+        params["days"] = 14
+    elif route == "probability":
+        params.update(threshold=rng.choice([10, 20, 30]), days=7)
+    elif route == "analyze":
+        params.update(
+            location_name="loadtest", threshold=rng.choice([10, 20, 30]),
+            parameter=rng.choice(["temperature", "humidity", "windSpeed", "pressure"]),
+            start_date=(today + dt.timedelta(days=1)).isoformat(),
+            end_date=(today + dt.timedelta(days=8)).isoformat(),
+        )
+    return params
+
+
+def drive(url: str, concurrency: int, duration: float, warmup: float, n_locations: int, seed: int):
+    """Run the mix; returns {route: [(latency_ms, status)]} for requests after the warm-up and the measured seconds.
+
+    status is the HTTP status code, or 0 when no response arrived.
+    """
+    rng = random.Random(seed)
+    locations = [(round(rng.uniform(-60, 70), 3), round(rng.uniform(-180, 180), 3)) for _ in range(n_locations)]
+    names = list(MIX)
+    weights = [MIX[n][0] for n in names]
+    results = defaultdict(list)
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    def client(i):
+        local = random.Random(seed + i)
+        session = requests.Session()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            route = local.choices(names, weights)[0]
+            _, method, path, _ = MIX[route]
+            lat, lon = local.choice(locations)
+            t0 = time.perf_counter()
+            try:
+                r = session.request(method, url + path, params=request_params(route, lat, lon, local), timeout=30)
+                status = r.status_code
+            except requests.RequestException:
+                status = 0
+            if t0 >= measure_from:
+                with lock:
+                    results[route].append(((time.perf_counter() - t0) * 1000, status))
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, duration
+
+
+def summarize(results, seconds: float) -> dict:
+    summary = {}
+    for route in MIX:
+        samples = results.get(route)
+        if not samples:
+            continue
+        latency = np.array([s[0] for s in samples])
+        status = np.array([s[1] for s in samples])
+        ok = ((status >= 200) & (status < 300)) | (status == 304)
+        client_errors = (status >= 400) & (status < 500)
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        summary[route] = {
+            "requests": len(samples),
+            "rps": len(samples) / seconds,
+            "error_rate": float((~ok).mean()),
+            "client_error_rate": float(client_errors.mean()),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+        }
+    return summary
+
+
+def gate(summary: dict, baseline: dict, tolerance: float, slack_ms: float, max_error_rate: float):
+    """Human-readable failures; empty when everything is within bounds."""
+    failures = []
+    for route, s in summary.items():
+        slo_key = MIX[route][3]
+        if slo_key and s["p99_ms"] > LATENCY_SLO_MS[slo_key]:
+            failures.append(f"{route}: p99 {s['p99_ms']:.0f} ms over the {LATENCY_SLO_MS[slo_key]:.0f} ms SLO")
+        if s["error_rate"] > max_error_rate:
+            failures.append(f"{route}: error rate {s['error_rate']:.1%} over {max_error_rate:.1%}"
+                            f" ({s['client_error_rate']:.1%} 4xx)")
+        base = (baseline or {}).get(route)
+        if base:
+            for q in ("p95_ms", "p99_ms"):
+                limit = base[q] * (1 + tolerance) + slack_ms
+                if s[q] > limit:
+                    failures.append(f"{route}: {q[:3]} {s[q]:.1f} ms vs baseline {base[q]:.1f} ms (limit {limit:.1f})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="test a running server instead of starting one (no fake POWER)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds first")
+    parser.add_argument("--locations", type=int, default=50, help="distinct locations in the mix")
+    parser.add_argument("--power-latency-ms", type=float, default=50, help="added fake POWER latency")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", help="write this run's numbers as the new baseline")
+    parser.add_argument("--baseline", help="fail if latency regresses against this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95/p99 increase")
+    parser.add_argument("--slack-ms", type=float, default=5, help="allowed absolute increase on top")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    power = proc = None
+    url = args.url
+    if not url:
+        FakePower.latency = args.power_latency_ms / 1000
+        power = ThreadingHTTPServer(("127.0.0.1", free_port()), FakePower)
+        threading.Thread(target=power.serve_forever, daemon=True).start()
+        proc, url = start_app(f"http://127.0.0.1:{power.server_port}", args.workers)
+    try:
+        print(f"Driving {url} with {args.concurrency} clients for {args.warmup:.0f}s warm-up + {args.duration:.0f}s")
+        results, seconds = drive(url, args.concurrency, args.duration, args.warmup, args.locations, args.seed)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if power:
+            power.shutdown()
+
+    summary = summarize(results, seconds)
+    total = sum(s["requests"] for s in summary.values())
+    print(f"\n{'route':<17}{'req':>7}{'rps':>8}{'err':>7}{'4xx':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, s in summary.items():
+        print(f"{route:<17}{s['requests']:>7}{s['rps']:>8.1f}{s['error_rate']:>7.1%}{s['client_error_rate']:>7.1%}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}")
+    print(f"{'total':<17}{total:>7}{total / seconds:>8.1f}")
+
+    if args.record:
+        with open(args.record, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nBaseline written to {args.record}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = gate(summary, baseline, args.tolerance, args.slack_ms, args.max_error_rate)
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nAll routes within SLOs" + (" and baseline" if baseline else ""))
+
+
+if __name__ == "__main__":
+    main()
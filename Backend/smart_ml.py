@@ -1,12 +1,12 @@
 # Smart ML imports - works with or without ML libraries
-try:
-    import pandas as pd
-    import numpy as np
-    from sklearn.ensemble import RandomForestRegressor
-    ML_AVAILABLE = True
-    print("✅ ML libraries loaded - ML features enabled")
-except ImportError:
-    ML_AVAILABLE = False
+# Only check that the ML stack is installed here; the actual (slow) imports
+# happen the first time an ML prediction is requested
+from importlib.util import find_spec
+
+ML_AVAILABLE = all(find_spec(m) is not None for m in ("pandas", "numpy", "sklearn"))
+if ML_AVAILABLE:
+    print("✅ ML libraries found - ML features enabled")
+else:
     print("⚠️  ML libraries not found - using fallback predictions")
 
 def predict_weather(lat, lon, days=7):
@@ -0,0 +1,4 @@
+import os, sys
+
+# Tests import the app package the same way the server does (from Backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
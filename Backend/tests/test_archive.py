@@ -0,0 +1,88 @@
+import functools
+from datetime import datetime
+import numpy as np
+from app import archive, nasa_client, sources
+from app.grid import snap
+from app.qc import QC_MISSING
+from app.series import LocationSeries, day_number
+from app.sources import Deadline, history_cache
+
+
+def power(calls, value=15.0):
+    def fetch(lat, lon, start, end, timeout=30, **kwargs):
+        calls.append((start, end))
+        first = datetime.strptime(start, "%Y%m%d").date()
+        n = (datetime.strptime(end, "%Y%m%d").date() - first).days + 1
+        columns = {name: np.full(n, value, dtype=np.float32) for name in ("ts", "ws10m", "rh2m", "ps")}
+        return first, columns, np.zeros(n, dtype=np.uint8)
+    return fetch
+
+
+def backfill(cell, start, end, directory, value=10.0):
+    series = LocationSeries.from_arrays(*power([], value)(cell.lat, cell.lon, start, end))
+    archive.write(cell, series, str(directory))
+
+
+def use_archive(monkeypatch, tmp_path):
+    monkeypatch.setattr(archive, "read_window", functools.partial(archive.read_window, directory=str(tmp_path)))
+
+
+def test_read_window_returns_the_covered_prefix(tmp_path):
+    cell = snap(10.0, 20.0)
+    backfill(cell, "20200101", "20231231", tmp_path)
+    window = archive.read_window(cell, "20231201", "20240115", str(tmp_path))
+    assert window.start == day_number("20231201") and window.end == day_number("20231231")
+    assert archive.read_window(cell, "20190101", "20200131", str(tmp_path)) is None
+    assert archive.read_window(cell, "20240101", "20240131", str(tmp_path)) is None
+
+
+def test_backfilled_cell_is_served_from_the_archive(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(nasa_client, "fetch_power_arrays", power(calls))
+    use_archive(monkeypatch, tmp_path)
+    lat, lon = 41.3, -72.9
+    backfill(snap(lat, lon), "20200101", "20231231", tmp_path)
+
+    frame, provenance = sources.fetch_history(lat, lon, "20230101", "20231231", Deadline(5))
+    assert provenance["source"] == "archive" and not provenance["degraded"]
+    assert calls == []
+    assert len(frame) == 365 and float(frame["ts"].iloc[-1]) == 10.0
+
+
+def test_archive_asks_power_only_for_the_days_since_the_backfill(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(nasa_client, "fetch_power_arrays", power(calls, value=20.0))
+    use_archive(monkeypatch, tmp_path)
+    lat, lon = -23.5, -46.6
+    cell = snap(lat, lon)
+    backfill(cell, "20200101", "20240310", tmp_path)
+
+    frame, provenance = sources.fetch_history(lat, lon, "20231215", "20240315", Deadline(5))
+    assert provenance["source"] == "archive"
+    assert calls == [("20240311", "20240315")]
+    assert len(frame) == 92
+    assert float(frame["ts"].iloc[0]) == 10.0 and float(frame["ts"].iloc[-1]) == 20.0
+    assert history_cache.get(cell, "20231215", "20240315") is not None
+
+
+def constant(start, n, value):
+    return LocationSeries(day_number(start), ("ts", "rh2m"), np.full((2, n), value, dtype=np.float32))
+
+
+def test_merge_fills_from_both_and_prefers_new_values_unless_missing():
+    old = constant("20240101", 5, 1.0)
+    new = constant("20240104", 5, 2.0)
+    new.values[:, 1] = np.nan
+    new.qc[1] = QC_MISSING  # 2024-01-05 is missing in the new data
+    merged = archive.merge(old, new)
+    assert merged.start == old.start and merged.end == new.end
+    assert list(merged["ts"]) == [1, 1, 1, 2, 1, 2, 2, 2]
+    assert merged.qc[4] == 0
+
+
+def test_cells_skip_files_still_being_written(tmp_path):
+    cell = snap(10.0, 20.0)
+    backfill(cell, "20200101", "20201231", tmp_path)
+    (tmp_path / (snap(11.0, 20.0).key + archive.TMP_SUFFIX)).write_bytes(b"partial")
+    assert archive.cells(str(tmp_path)) == [cell]
+    assert archive.cells(str(tmp_path / "missing")) == []
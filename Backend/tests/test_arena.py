@@ -0,0 +1,94 @@
+import os, random, runpy, threading
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from app import arena, ml
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(arena, "_models", {})
+    monkeypatch.setattr(arena, "_arrays", {})
+    monkeypatch.setattr(arena, "_preloaded", False)
+
+
+def test_arrays_come_back_contiguous_and_read_only(fresh):
+    source = np.arange(12, dtype=np.float32).reshape(3, 4)[:, ::2]
+    stored = arena.put_array("grid", source)
+    assert arena.get_array("grid") is stored
+    assert stored.flags.c_contiguous and not stored.flags.writeable
+    with pytest.raises(ValueError):
+        stored[0, 0] = 1
+    assert arena.stats()["arrays"] == {"grid": stored.nbytes}
+
+
+def test_climatology_files_are_memory_mapped_read_only(fresh, tmp_path):
+    np.save(tmp_path / "ts.npy", np.ones((12, 3, 4), dtype=np.float32))
+    (tmp_path / "notes.txt").write_text("not an array")
+    assert arena.load_climatology(str(tmp_path)) == 1
+    grid = arena.get_array("ts")
+    assert grid.shape == (12, 3, 4) and not grid.flags.writeable and not grid.flags.owndata
+    assert arena.load_climatology(str(tmp_path / "missing")) == 0
+
+
+def test_preload_runs_once(fresh, monkeypatch):
+    loads = []
+    monkeypatch.setattr(ml, "load_forest", lambda: loads.append(1))
+    monkeypatch.setattr(arena, "load_climatology", lambda: loads.append(2) or 0)
+    arena.preload()
+    arena.preload()
+    assert loads == [1, 2]
+
+
+def test_preload_survives_a_missing_model(fresh, monkeypatch):
+    def missing():
+        raise FileNotFoundError("Run training first")
+
+    monkeypatch.setattr(ml, "load_forest", missing)
+    monkeypatch.setattr(arena, "load_climatology", lambda: 0)
+    arena.preload()
+    assert arena._preloaded
+
+
+def test_get_model_loads_once_under_concurrency(fresh):
+    loads = []
+    barrier = threading.Barrier(8)
+
+    def loader():
+        loads.append(1)
+        return object()
+
+    def worker(out):
+        barrier.wait()
+        out.append(arena.get_model("m", loader))
+
+    out = []
+    threads = [threading.Thread(target=worker, args=(out,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1 and len({id(m) for m in out}) == 1
+
+
+def test_gunicorn_master_preloads_and_freezes_before_forking(monkeypatch):
+    config = runpy.run_path(os.path.join(BACKEND, "gunicorn.conf.py"))
+    assert config["preload_app"] is True
+    assert config["max_requests"] > 0 and 0 < config["max_requests_jitter"] < config["max_requests"]
+    calls = []
+    monkeypatch.setattr(arena, "preload", lambda: calls.append("preload"))
+    monkeypatch.setattr(arena, "freeze", lambda: calls.append("freeze"))
+    server = SimpleNamespace(log=SimpleNamespace(info=lambda *args: calls.append("log")))
+    config["when_ready"](server)
+    assert calls == ["preload", "freeze", "log"]
+
+
+def test_forked_workers_reseed_their_rng():
+    config = runpy.run_path(os.path.join(BACKEND, "gunicorn.conf.py"))
+    random.seed(1)
+    inherited = random.random()
+    random.seed(1)
+    config["post_fork"](None, None)
+    assert random.random() != inherited
@@ -0,0 +1,62 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from app.features import FEATURE_SCHEMA, LAG_DAYS
+from app.forest import IncompatibleModelError, compile_forest
+from app.model_store import ModelStore
+
+
+def data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURE_SCHEMA))).astype(np.float32)
+    Y = np.stack([X[:, 4] * 2 + X[:, 7], np.sin(X[:, 5]) - X[:, 6]], axis=1)
+    return X, Y
+
+
+def fitted(X, Y, **attrs):
+    model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(X, Y)
+    model.targets_ = ("ts", "rh2m")
+    model.feature_schema_ = FEATURE_SCHEMA[:X.shape[1]]
+    model.lag_days_ = LAG_DAYS
+    for name, value in attrs.items():
+        setattr(model, name, value)
+    return model
+
+
+def with_gaps(X, seed=1, fraction=0.2):
+    X = X.copy()
+    X[np.random.default_rng(seed).random(X.shape) < fraction] = np.nan
+    return X
+
+
+@pytest.mark.parametrize("train_with_gaps", [False, True])
+def test_compiled_forest_matches_sklearn_on_missing_features(train_with_gaps):
+    X, Y = data()
+    if train_with_gaps:
+        X = with_gaps(X, seed=2)
+    model = fitted(X, Y)
+    X_test = with_gaps(data(200, seed=3)[0])
+    forest = compile_forest(model)
+    np.testing.assert_allclose(forest.predict(X_test), model.predict(X_test), rtol=1e-9, atol=1e-9)
+    assert forest.missing_left.any()
+
+
+def test_models_without_the_current_schema_are_refused():
+    X, Y = data()
+    old = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, Y)
+    with pytest.raises(IncompatibleModelError):
+        compile_forest(old)
+    with pytest.raises(IncompatibleModelError):
+        compile_forest(fitted(X, Y, lag_days_=LAG_DAYS + 1))
+    with pytest.raises(IncompatibleModelError):
+        compile_forest(fitted(X, Y, feature_schema_=FEATURE_SCHEMA[::-1]))
+
+
+def test_model_store_skips_incompatible_models(tmp_path):
+    X, Y = data()
+    store = ModelStore(str(tmp_path), max_bytes=1 << 30)
+    joblib.dump(RandomForestRegressor(n_estimators=5, random_state=0).fit(X, Y), store.path("r100c100"))
+    store.save("r100c101", fitted(X, Y))
+    assert store.get("r100c100") is None and "r100c100" not in store.available()
+    assert store.get("r100c101").targets == ("ts", "rh2m")
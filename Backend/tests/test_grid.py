@@ -0,0 +1,44 @@
+import numpy as np
+from app.grid import LAT_STEP, LON_STEP, N_COLS, N_ROWS, Cell, CellIndex, from_key, snap, snap_many
+
+
+def test_snap_to_the_nearest_merra2_cell_centre():
+    cell = snap(40.71, -74.01)
+    assert (cell.lat, cell.lon) == (40.5, -73.75)
+    # Points a few hundred metres apart share a cell
+    assert snap(40.712, -74.006) == cell
+    assert abs(cell.lat - 40.71) <= LAT_STEP / 2 and abs(cell.lon + 74.01) <= LON_STEP / 2
+
+
+def test_snap_clamps_the_poles_and_wraps_the_antimeridian():
+    assert snap(90, 0).row == N_ROWS - 1 and snap(-90, 0).row == 0
+    assert snap(0, 180) == snap(0, -180)
+    assert snap(0, 179.9).col == 0 and snap(0, 179.9).lon == -180.0
+    assert snap(0, 540) == snap(0, 180)
+
+
+def test_snap_many_matches_snap():
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500)
+    rows, cols = snap_many(lats, lons)
+    assert [Cell(int(r), int(c)) for r, c in zip(rows, cols)] == [snap(a, b) for a, b in zip(lats, lons)]
+    assert rows.max() < N_ROWS and cols.max() < N_COLS
+
+
+def test_keys_round_trip():
+    cell = snap(-33.87, 151.21)
+    assert cell.key == f"r{cell.row:03d}c{cell.col:03d}"
+    assert from_key(cell.key) == cell
+
+
+def test_cell_index_finds_known_cells_nearest_first():
+    index = CellIndex()
+    near, far, other = snap(51.5, -0.1), snap(52.0, -0.1), snap(48.9, 2.4)
+    for cell in (far, other, near):
+        index.add(cell)
+    assert index.within(51.5, -0.1, 75) == [near, far]
+    assert index.nearest(51.5, -0.1, 75) == near
+    assert index.nearest(0, 0, 75) is None
+    index.discard(near)
+    assert index.nearest(51.5, -0.1, 75) == far and near not in index
+    assert len(index) == 2
@@ -0,0 +1,14 @@
+from datetime import date, datetime
+import numpy as np
+import pytest
+from app.series import HourlySeries, hour_number
+
+
+def test_hourly_series_interpolates_only_between_neighbouring_rows():
+    s = HourlySeries.from_arrays(date(2024, 1, 1), {"ts": np.array([0, 10, np.nan, 30], dtype=np.float32)})
+    base = hour_number(datetime(2024, 1, 1))
+    out = s.at([base + 0.5, base + 1, base + 1.5, base + 3, base - 1, base + 4])["ts"]
+    assert out[0] == pytest.approx(5.0) and out[1] == 10.0
+    assert np.isnan(out[2]) and out[3] == 30.0
+    assert np.isnan(out[4]) and np.isnan(out[5])
+    assert not s.covers("20240101", "20240101")  # only four of its 24 hours
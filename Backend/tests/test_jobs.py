@@ -0,0 +1,63 @@
+import json, threading, time
+import pytest
+from app.jobs import DONE, FAILED, JobQueue, QueueFullError
+from app.routers import ml as ml_router
+
+
+def test_identical_submissions_share_one_job():
+    jobs = JobQueue(workers=1, max_pending=10, result_ttl=60)
+    gate = threading.Event()
+    runs = []
+    fn = lambda: runs.append(1) or gate.wait(1) or "done"
+    first, created = jobs.submit("k", fn)
+    second, created_again = jobs.submit("k", fn)
+    gate.set()
+    assert first.wait(2)
+    assert created and not created_again and first is second
+    assert first.status == DONE and len(runs) == 1
+
+
+def test_failed_jobs_are_resubmitted():
+    jobs = JobQueue(workers=1, max_pending=10, result_ttl=60)
+    job, _ = jobs.submit("k", lambda: 1 / 0)
+    assert job.wait(2) and job.status == FAILED
+    retry, created = jobs.submit("k", lambda: 2)
+    assert created and retry.wait(2) and retry.result == 2
+
+
+def test_queue_full():
+    jobs = JobQueue(workers=1, max_pending=1, result_ttl=60)
+    gate = threading.Event()
+    running, _ = jobs.submit("running", lambda: gate.wait(2))
+    while running.status != "running":
+        time.sleep(0.001)
+    jobs.submit("queued", lambda: None)
+    with pytest.raises(QueueFullError):
+        jobs.submit("rejected", lambda: None)
+    gate.set()
+
+
+def test_expired_jobs_are_pruned_and_rerun():
+    jobs = JobQueue(workers=1, max_pending=10, result_ttl=0)
+    job, _ = jobs.submit("a", lambda: "a")
+    job.wait(2)
+    again, created = jobs.submit("a", lambda: "again")
+    assert created and again is not job
+    assert again.wait(2) and jobs.get("a").result == "again"
+
+
+def test_analyses_with_different_thresholds_get_their_own_status_url(monkeypatch):
+    monkeypatch.setattr(
+        ml_router, "_analyze_and_store",
+        lambda lat, lon, name, threshold, parameter, operator, start, end, deadline=None:
+            {"threshold": threshold, "operator": operator},
+    )
+    common = dict(lat=51.5, lon=-0.1, location_name="London", parameter="temperature",
+                  start_date="2031-06-01", end_date="2031-06-10")
+    hot = ml_router._submit_analysis(threshold=5.0, operator=">", **common)
+    cold = ml_router._submit_analysis(threshold=25.0, operator="<", **common)
+    ids = [json.loads(r.body)["analysis_id"] for r in (hot, cold)]
+    assert ids[0] != ids[1]
+    for analysis_id, expected in zip(ids, ({"threshold": 5.0, "operator": ">"}, {"threshold": 25.0, "operator": "<"})):
+        job = ml_router.analysis_jobs.get(analysis_id)
+        assert job.wait(2) and job.result == expected
@@ -0,0 +1,57 @@
+import json
+import pytest
+from app import memo
+from app.memo import TTLMemo, analysis_key
+
+
+class Clock:
+    now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(memo, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_their_ttl(clock):
+    m = TTLMemo(max_bytes=1 << 20)
+    m.put("a", {"v": 1}, ttl=10)
+    clock.now += 9
+    assert m.get("a") == {"v": 1}
+    clock.now += 1
+    assert m.get("a") is None
+    assert len(m) == 0 and m.nbytes == 0
+    assert m.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_cap(clock):
+    size = len(json.dumps({"v": "x" * 10}))
+    m = TTLMemo(max_bytes=3 * size)
+    for key in "abc":
+        m.put(key, {"v": "x" * 10}, ttl=60)
+    m.get("a")  # b is now the least recently used
+    m.put("d", {"v": "x" * 10}, ttl=60)
+    assert m.get("b") is None
+    assert all(m.get(k) is not None for k in "acd")
+    assert m.nbytes == 3 * size and m.stats()["evictions"] == 1
+
+
+def test_replacing_an_entry_keeps_the_byte_count_and_oversized_values_are_skipped(clock):
+    m = TTLMemo(max_bytes=100)
+    m.put("a", {"v": 1}, ttl=60)
+    m.put("a", {"v": 22}, ttl=60)
+    assert m.nbytes == len(json.dumps({"v": 22})) and len(m) == 1
+    m.put("big", {"v": "x" * 200}, ttl=60)
+    assert m.get("big") is None and m.get("a") == {"v": 22}
+
+
+def test_analysis_key_normalizes_location_and_threshold():
+    a = analysis_key(40.71, -74.01, "temperature", ">", 30, "2031-06-01", "2031-06-10")
+    b = analysis_key(40.712, -74.006, "temperature", ">", 30.0, "2031-06-01", "2031-06-10")
+    assert a == b
+    assert a != analysis_key(40.71, -74.01, "temperature", ">=", 30, "2031-06-01", "2031-06-10")
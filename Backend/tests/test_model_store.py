@@ -0,0 +1,15 @@
+from app.grid import snap
+from app.model_store import candidate_keys, region_key
+
+
+def test_points_of_one_cell_share_a_region_across_a_region_boundary():
+    # 5° boundaries at 40°N and 75°W; both points snap to the cell centred on 40.0, -75.0
+    inside, outside = (40.1, -74.9), (39.9, -75.1)
+    assert snap(*inside) == snap(*outside)
+    assert region_key(*inside, degrees=5) == region_key(*outside, degrees=5)
+    assert candidate_keys(*inside) == candidate_keys(*outside)
+
+
+def test_region_key_follows_the_cell_centre():
+    cell = snap(-33.87, 151.21)
+    assert region_key(-33.87, 151.21) == region_key(cell.lat, cell.lon)
@@ -0,0 +1,85 @@
+import json, threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from app import montecarlo
+from app.http_cache import compute_etag
+from app.montecarlo import SimulationBudgetExceeded, simulate
+from app.routers import ml as ml_router
+
+MEAN = 20 + 3 * np.sin(np.arange(14) / 3)
+
+
+def history():
+    end = datetime.utcnow().date()
+    index = pd.date_range(end - timedelta(days=120), end, freq="D")
+    t = np.arange(len(index))
+    frame = pd.DataFrame({
+        "ts": 18 + 4 * np.sin(t / 9), "rh2m": 60 + 5 * np.cos(t / 7),
+        "ws10m": 4 + np.sin(t / 3), "ps": 101 + 0.3 * np.sin(t / 5),
+    }, index=index).astype(np.float32)
+    return frame, {"source": "cache", "degraded": False}
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(10000))
+
+
+def test_simulate_draws_every_sample_and_repeats_exactly():
+    first = simulate(MEAN, 2.0, 21.0, ">", phi=0.6, seed=42)
+    stop = threading.Event()
+    hogs = [threading.Thread(target=busy, args=(stop,)) for _ in range(4)]
+    for t in hogs:
+        t.start()
+    try:
+        second = simulate(MEAN, 2.0, 21.0, ">", phi=0.6, seed=42)
+    finally:
+        stop.set()
+        for t in hogs:
+            t.join()
+    assert first["samples"] == second["samples"] == montecarlo.MONTE_CARLO_SAMPLES
+    assert json.dumps(first, sort_keys=True) == json.dumps(second, sort_keys=True)
+
+
+def test_simulate_refuses_to_answer_from_fewer_samples_past_the_budget():
+    with pytest.raises(SimulationBudgetExceeded):
+        simulate(MEAN, 2.0, 21.0, ">", phi=0.6, seed=42, samples=5 * montecarlo.BATCH, budget_ms=0)
+
+
+def test_identical_probability_requests_give_identical_payloads():
+    args = dict(lat=40.7, lon=-74.0, threshold=21.0, operator=">", days=10, history=history())
+    first = ml_router.compute_probability(**args)
+    second = ml_router.compute_probability(**args)
+    assert not first["provenance"]["degraded"]
+    drop = lambda p: {k: v for k, v in p.items() if k != "provenance"}
+    assert json.dumps(drop(first), sort_keys=True) == json.dumps(drop(second), sort_keys=True)
+    assert compute_etag(first) == compute_etag(second)
+
+
+def test_over_budget_simulation_falls_back_and_is_flagged(monkeypatch):
+    def over_budget(*args, **kwargs):
+        raise SimulationBudgetExceeded("1000 of 8000 trajectories drawn in 250 ms")
+
+    monkeypatch.setattr(montecarlo, "simulate", over_budget)
+    payload = ml_router.compute_probability(40.7, -74.0, 21.0, operator=">", days=10, history=history())
+    assert payload["provenance"]["degraded"]
+    assert "error" in payload["simulation"]
+    assert payload["overall_probability"] == payload["independent_days_probability"]
+
+
+def test_analysis_with_an_over_budget_simulation_is_degraded_and_memoized_briefly(monkeypatch):
+    def over_budget(*args, **kwargs):
+        raise SimulationBudgetExceeded("1000 of 8000 trajectories drawn in 250 ms")
+
+    ttls = []
+    monkeypatch.setattr(montecarlo, "simulate", over_budget)
+    monkeypatch.setattr(ml_router, "fetch_history", lambda *args, **kwargs: history())
+    monkeypatch.setattr(ml_router.analysis_memo, "put", lambda key, value, ttl: ttls.append(ttl))
+    start = (datetime.utcnow().date() + timedelta(days=1)).isoformat()
+    end = (datetime.utcnow().date() + timedelta(days=7)).isoformat()
+    result = ml_router._analyze_and_store(40.7, -74.0, "NYC", 21.0, "temperature", ">", start, end)
+    assert result["provenance"]["degraded"]
+    assert result["data_source"] == "NASA POWER API"
+    assert ttls == [ml_router.FALLBACK_MAX_AGE]
@@ -0,0 +1,23 @@
+from datetime import date
+import numpy as np
+from app.nasa_client import decode_daily
+
+
+def payload(days, **params):
+    return {name: {d: v for d, v in zip(days, values)} for name, values in params.items()}
+
+
+def test_decode_daily_streams_contiguous_payloads_into_float32():
+    start, columns = decode_daily(payload(["20240301", "20240302", "20240303"],
+                                          TS=[1.5, 2.5, -999], RH2M=[50, 51, 52]))
+    assert start == date(2024, 3, 1)
+    assert set(columns) == {"ts", "rh2m"}
+    assert all(c.dtype == np.float32 for c in columns.values())
+    np.testing.assert_array_equal(columns["ts"], [1.5, 2.5, -999])
+
+
+def test_decode_daily_places_gappy_payloads_by_date():
+    start, columns = decode_daily(payload(["20240303", "20240301"], TS=[3.0, 1.0]))
+    assert start == date(2024, 3, 1)
+    assert columns["ts"].dtype == np.float32
+    np.testing.assert_array_equal(columns["ts"], [1.0, np.nan, 3.0])
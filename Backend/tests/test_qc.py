@@ -0,0 +1,35 @@
+import numpy as np
+from app.qc import QC_FILL, QC_INTERPOLATED, QC_MISSING, QC_RANGE, clean_columns
+
+
+def column(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_fill_values_are_masked_and_short_gaps_interpolated():
+    columns = {"ts": column(10, -999, -999, 13, 14)}
+    flags = clean_columns(columns, max_gap=3)
+    np.testing.assert_allclose(columns["ts"], [10, 11, 12, 13, 14])
+    assert list(flags) == [0, QC_FILL | QC_INTERPOLATED, QC_FILL | QC_INTERPOLATED, 0, 0]
+
+
+def test_gaps_longer_than_max_gap_stay_missing():
+    columns = {"ts": column(10, -999, -999, -999, -999, 15)}
+    flags = clean_columns(columns, max_gap=3)
+    assert np.isnan(columns["ts"][1:5]).all()
+    assert all(f == QC_FILL | QC_MISSING for f in flags[1:5])
+
+
+def test_edges_are_never_extrapolated():
+    columns = {"ts": column(-999, 11, 12, -999)}
+    flags = clean_columns(columns, max_gap=3)
+    assert np.isnan(columns["ts"][[0, 3]]).all()
+    assert flags[0] & QC_MISSING and flags[3] & QC_MISSING
+
+
+def test_out_of_range_values_are_masked_and_flags_combine_across_columns():
+    columns = {"rh2m": column(50, 140, 52), "ws10m": column(3, 4, -999)}
+    flags = clean_columns(columns, max_gap=3)
+    assert columns["rh2m"][1] == 51 and flags[1] == QC_RANGE | QC_INTERPOLATED
+    assert np.isnan(columns["ws10m"][2]) and flags[2] == QC_FILL | QC_MISSING
+    assert columns["rh2m"].dtype == np.float32
@@ -0,0 +1,145 @@
+import threading
+from types import SimpleNamespace
+import pytest
+import requests
+from app import resilience
+from app.nasa_client import upstream_failure
+from app.resilience import CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def breaker(**kwargs):
+    options = dict(window=60, min_calls=4, error_rate=0.5, base_backoff=10, max_backoff=80, is_failure=upstream_failure)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+
+def fail(exc):
+    def fn():
+        raise exc
+    return fn
+
+
+def trip(b):
+    for _ in range(b.min_calls):
+        with pytest.raises(requests.ConnectionError):
+            b.call(fail(requests.ConnectionError("down")))
+    assert b.state == "open"
+
+
+def test_upstream_failures_are_connection_errors_timeouts_and_5xx():
+    assert upstream_failure(requests.ConnectionError())
+    assert upstream_failure(requests.ReadTimeout())
+    assert upstream_failure(http_error(503))
+    assert not upstream_failure(http_error(404))
+    assert not upstream_failure(http_error(422))
+    assert not upstream_failure(TimeoutError("caller deadline"))
+    assert not upstream_failure(ValueError("bad payload"))
+
+
+def test_trips_on_error_rate_and_fails_fast(clock):
+    b = breaker()
+    b.call(lambda: "ok")
+    for _ in range(3):
+        with pytest.raises(requests.Timeout):
+            b.call(fail(requests.Timeout()))
+    assert b.state == "open"
+    with pytest.raises(CircuitOpenError):
+        b.call(lambda: "never")
+
+
+def test_client_errors_and_caller_timeouts_do_not_trip(clock):
+    b = breaker()
+    for exc in [http_error(404), http_error(400), TimeoutError("deadline")] * 3:
+        with pytest.raises(type(exc)):
+            b.call(fail(exc))
+    assert b.state == "closed"
+    assert b.stats()["error_rate"] == 0.0
+
+
+def test_half_open_lets_one_probe_through_and_it_closes_the_breaker(clock):
+    b = breaker()
+    trip(b)
+    clock.now = b._open_until
+    started, release = threading.Event(), threading.Event()
+
+    def probe():
+        started.set()
+        release.wait(5)
+        return "ok"
+
+    thread = threading.Thread(target=b.call, args=(probe,))
+    thread.start()
+    assert started.wait(5)
+    assert b.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        b.call(lambda: "second caller")
+    release.set()
+    thread.join()
+    assert b.state == "closed" and b.stats()["trips"] == 0
+
+
+def test_only_the_probe_decides_half_open(clock):
+    b = breaker()
+    b._trips = 1
+    b.state, b._open_until = "half_open", clock.now
+    # A call admitted before the trip finishes now: it must not close the breaker
+    b.record_success()
+    assert b.state == "half_open"
+    b.record_failure()
+    assert b.state == "half_open"
+    assert b.admit() is True
+    b.record_failure(probe=True)
+    assert b.state == "open" and b.stats()["trips"] == 2
+
+
+def test_failed_probe_reopens_with_a_longer_backoff(clock):
+    b = breaker()
+    trip(b)
+    first = b._open_until - clock.now
+    clock.now = b._open_until
+    with pytest.raises(requests.ConnectionError):
+        b.call(fail(requests.ConnectionError("still down")))
+    assert b.state == "open"
+    assert 10 <= b._open_until - clock.now <= 20 and 5 <= first <= 10
+
+
+def test_probe_answered_with_a_4xx_closes_the_breaker(clock):
+    b = breaker()
+    trip(b)
+    clock.now = b._open_until
+    with pytest.raises(requests.HTTPError):
+        b.call(fail(http_error(404)))
+    assert b.state == "closed"
+
+
+def test_backoff_is_jittered_within_the_exponential_ceiling(monkeypatch):
+    b = breaker()
+    for trips, ceiling in [(1, 10), (2, 20), (3, 40), (4, 80), (5, 80), (12, 80)]:
+        b._trips = trips
+        delays = [b._backoff() for _ in range(200)]
+        assert all(ceiling / 2 <= d <= ceiling for d in delays)
+        assert max(delays) - min(delays) > ceiling / 10  # actually jittered
+    b._trips = 1
+    monkeypatch.setattr(resilience.random, "uniform", lambda lo, hi: lo)
+    assert b._backoff() == 5
@@ -0,0 +1,35 @@
+from datetime import date
+import numpy as np
+from app.series import LocationSeries, day_number
+
+
+def series(start="20240101", n=10, value=None):
+    values = np.arange(2 * n, dtype=np.float32).reshape(2, n) if value is None else np.full((2, n), value, np.float32)
+    return LocationSeries(day_number(start), ("ts", "rh2m"), values)
+
+
+def test_location_series_is_slotted_float32_with_views():
+    s = LocationSeries.from_arrays(date(2024, 1, 1), {"ts": np.arange(5.0), "ps": np.ones(5)})
+    assert not hasattr(s, "__dict__")
+    assert s.values.dtype == np.float32 and s.qc.dtype == np.uint8
+    assert s.start_date == date(2024, 1, 1) and s.end == s.start + 4 and "ps" in s
+    window = s.window("20240102", "20240103")
+    assert np.shares_memory(window.values, s.values)
+    assert list(window["ts"]) == [1.0, 2.0] and window.start == day_number("20240102")
+
+
+def test_window_clips_and_covers_checks_both_ends():
+    s = series()
+    assert s.covers("20240101", "20240110") and not s.covers("20231231", "20240105")
+    assert not s.covers("20240105", "20240111")
+    assert len(s.window("20231201", "20240103")) == 3
+    assert len(s.window("20240201", "20240301")) == 0
+
+
+def test_frame_round_trip_keeps_qc_and_fills_missing_days():
+    s = series(n=4)
+    s.qc[2] = 8
+    frame = s.to_frame()
+    assert list(frame.columns) == ["ts", "rh2m", "qc"]
+    back = LocationSeries.from_frame(frame.drop(frame.index[1]))
+    assert len(back) == 4 and np.isnan(back["ts"][1]) and back.qc[2] == 8
@@ -0,0 +1,152 @@
+import threading, time
+from datetime import datetime
+import numpy as np
+import pytest
+from app import archive, nasa_client, sources
+from app.grid import snap
+from app.routers import weather
+from app.sources import Deadline, Source, first_available, history_cache, single_flight
+
+UPSTREAM_LATENCY = 0.8
+# Long enough for the cache and archive misses, far shorter than the upstream
+DEADLINE = 0.3
+
+
+def wait_for(condition, timeout=5.0):
+    until = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < until, "timed out"
+        time.sleep(0.01)
+
+
+def fake_power(calls, latency=UPSTREAM_LATENCY):
+    def fetch(lat, lon, start, end, timeout=30, **kwargs):
+        calls.append(timeout)
+        time.sleep(latency)
+        first = datetime.strptime(start, "%Y%m%d").date()
+        n = (datetime.strptime(end, "%Y%m%d").date() - first).days + 1
+        columns = {name: np.full(n, value, dtype=np.float32)
+                   for name, value in (("ts", 15.0), ("ws10m", 3.0), ("rh2m", 60.0), ("ps", 101.0))}
+        return first, columns, np.zeros(n, dtype=np.uint8)
+    return fetch
+
+
+def test_first_available_stops_waiting_at_the_deadline():
+    started = time.monotonic()
+    value, provenance = first_available(
+        [Source("slow", lambda dl: time.sleep(0.5) or "late")],
+        [Source("fallback", lambda dl: "fallback")],
+        Deadline(0.05),
+    )
+    assert value == "fallback" and provenance["degraded"]
+    assert time.monotonic() - started < 0.3
+
+
+def test_a_slow_source_is_hedged_by_the_next_one():
+    started = time.monotonic()
+    value, provenance = first_available(
+        [Source("slow", lambda dl: time.sleep(0.5) or "late", hedge_after=0.05), Source("fast", lambda dl: "fast")],
+        [Source("fallback", lambda dl: "fallback")],
+        Deadline(0.4),
+    )
+    assert value == "fast" and not provenance["degraded"]
+    assert provenance["attempted"] == ["slow", "fast"]
+    assert time.monotonic() - started < 0.3
+
+
+def test_slow_archive_read_is_hedged_by_power(monkeypatch):
+    calls = []
+    monkeypatch.setattr(nasa_client, "fetch_power_arrays", fake_power(calls, latency=0.05))
+    monkeypatch.setattr(archive, "read_window", lambda *a, **k: time.sleep(2.0))
+    lat, lon = 35.7, 139.7
+    started = time.monotonic()
+    frame, provenance = sources.fetch_history(lat, lon, "20240101", "20240131", Deadline(1.5))
+    assert provenance["source"] == "nasa_power" and provenance["attempted"] == ["cache", "archive", "nasa_power"]
+    assert time.monotonic() - started < 1.5
+    assert len(frame) == 31
+
+
+def test_slow_upstream_fills_the_history_cache_for_the_next_request(monkeypatch):
+    calls = []
+    monkeypatch.setattr(nasa_client, "fetch_power_arrays", fake_power(calls))
+    monkeypatch.setattr(archive, "read_window", lambda *a, **k: None)
+    lat, lon = -33.0, 151.0
+    cell = snap(lat, lon)
+    args = (lat, lon, "20240101", "20240331")
+
+    _, first = sources.fetch_history(*args, Deadline(DEADLINE))
+    assert first["degraded"]
+    # The upstream call outlives the deadline and lands in the cache
+    wait_for(lambda: history_cache.get(cell, "20240101", "20240331") is not None)
+    frame, second = sources.fetch_history(*args, Deadline(DEADLINE))
+    assert second["source"] == "cache" and not second["degraded"]
+    assert float(frame["ts"].iloc[0]) == 15.0
+    # Upstream gets its own timeout, not what was left of the deadline
+    assert calls == [sources.POWER_TIMEOUT_SECONDS]
+
+
+def test_current_is_served_from_cache_after_a_slow_upstream(monkeypatch):
+    calls = []
+
+    def slow(lat, lon, timeout=None):
+        calls.append(1)
+        time.sleep(Deadline.for_endpoint("current").budget + 0.2)
+        return {"temperature": 21.5, "humidity": 50.0, "wind_speed": 2.0, "pressure": 101.0,
+                "visibility": 10.0, "cloud_cover": 20, "description": "Pleasant and mild"}
+
+    monkeypatch.setattr(weather, "fetch_nasa_power_direct", slow)
+    lat, lon = 48.9, 2.4
+    first = weather.current_payload(lat, lon)
+    assert first["provenance"]["degraded"]
+    wait_for(lambda: weather.current_cache.peek(snap(lat, lon))[0] is not None)
+    second = weather.current_payload(lat, lon)
+    assert second["provenance"]["source"] == "cache"
+    assert second["current"]["temperature"] == 21.5
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_one_call():
+    calls = []
+    gate = threading.Event()
+
+    def fn():
+        calls.append(1)
+        gate.wait(1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(single_flight("k", fn))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    wait_for(lambda: len(calls) == 1)
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert results == ["value"] * 5 and len(calls) == 1
+
+
+def test_single_flight_propagates_errors_and_forgets_the_key():
+    with pytest.raises(ValueError):
+        single_flight("err", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert single_flight("err", lambda: 1) == 1
+
+
+def test_history_cache_keeps_the_series_with_the_newest_days():
+    from app.series import LocationSeries, day_number
+    from app.sources import HistoryCache
+
+    def series(start, n):
+        return LocationSeries(day_number(start), ("ts",), np.zeros((1, n), dtype=np.float32))
+
+    cache = HistoryCache(1 << 20)
+    cell = snap(0, 0)
+    cache.put(cell, series("20240101", 366))
+    cache.put(cell, series("20231222", 300))  # starts earlier but ends earlier
+    assert cache.get(cell, "20240101", "20241231") is not None
+    cache.put(cell, series("20240201", 335))  # inside it
+    assert cache.get(cell, "20240101", "20240131") is not None
+    cache.put(cell, series("20240101", 400))  # extends it
+    assert cache.get(cell, "20240101", "20250203") is not None
+    assert cache.nbytes == 400 * 4 + 400
+
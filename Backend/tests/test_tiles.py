@@ -0,0 +1,65 @@
+from datetime import date
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app import arena, archive, climatology, tiles
+from app.grid import N_COLS, N_ROWS, snap
+from app.main import app
+from app.series import LocationSeries
+
+
+def archived(cell, directory, ts):
+    first = date(2015, 1, 1)
+    n = (date(2019, 12, 31) - first).days + 1
+    columns = {name: np.full(n, value, dtype=np.float32) for name, value in (("ts", ts), ("rh2m", 55.0))}
+    columns["ts"][::2] += 1.0  # some spread
+    archive.write(cell, LocationSeries.from_arrays(first, columns), str(directory))
+
+
+@pytest.fixture
+def grids(tmp_path, monkeypatch):
+    cell = snap(40.0, -74.0)
+    archived(cell, tmp_path / "archive", ts=11.0)
+    built, n = climatology.build(str(tmp_path / "archive"))
+    climatology.write(built, str(tmp_path / "climatology"))
+    monkeypatch.setattr(arena, "_arrays", {})
+    assert n == 1 and arena.load_climatology(str(tmp_path / "climatology")) == len(built)
+    tiles.tile_cache._entries.clear()
+    yield cell
+    tiles.tile_cache._entries.clear()
+
+
+def test_build_writes_monthly_grids_from_the_archive(grids):
+    ts, std = arena.get_array("ts"), arena.get_array("ts_std")
+    assert ts.shape == std.shape == (12, N_ROWS, N_COLS)
+    assert ts[6, grids.row, grids.col] == pytest.approx(11.5, abs=0.05)
+    assert std[6, grids.row, grids.col] == pytest.approx(0.5, abs=0.05)
+    assert arena.get_array("rh2m")[0, grids.row, grids.col] == pytest.approx(55.0)
+    # Cells never archived stay empty
+    assert np.isnan(ts[6, grids.row + 10, grids.col])
+
+
+def test_cell_values_fall_back_per_cell_and_report_their_source(grids):
+    rows = np.array([[grids.row], [grids.row + 10]])
+    cols = np.array([[grids.col]])
+    mean, spread, source = tiles.cell_values("ts", rows, cols, date(2024, 7, 1))
+    assert source == "mixed"
+    assert mean[0, 0] == pytest.approx(11.5, abs=0.05) and not np.isnan(mean[1, 0])
+    assert spread[1, 0] == tiles.PARAMETERS["temperature"][2]
+    _, _, source = tiles.cell_values("ts", rows[:1], cols, date(2024, 7, 1))
+    assert source == "climatology"
+
+
+def test_tile_without_grids_is_labelled_synthetic(monkeypatch):
+    monkeypatch.setattr(arena, "_arrays", {})
+    tiles.tile_cache._entries.clear()
+    response = TestClient(app).get("/api/weather/tiles/3/2/3.bin", params={"date": "2024-07-01"})
+    assert response.status_code == 200
+    assert response.headers["X-Tile-Source"] == "synthetic"
+    assert len(response.content) == tiles.TILE_SIZE ** 2 * 4
+
+
+@pytest.mark.parametrize("value, status", [("2024-13-45", 400), ("x2024-07-01", 422), ("2024-07-01x", 422)])
+def test_tile_rejects_malformed_dates(value, status):
+    response = TestClient(app).get("/api/weather/tiles/3/2/3.png", params={"date": value})
+    assert response.status_code == status
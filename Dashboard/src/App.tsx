@@ -281,6 +281,37 @@ const App: React.FC = () => {
   const [weatherStats, setWeatherStats] = useState<WeatherStats | null>(null);
   const [analyticsLoading, setAnalyticsLoading] = useState<boolean>(false);
 
+  // Transform API response to match our WeatherData interface
+  const toWeatherData = (
+    weatherData: any,
+    lat: number,
+    lon: number,
+    locationName?: string
+  ): WeatherData => {
+    const current = weatherData.current || weatherData;
+    return {
+      location:
+        locationName ||
+        currentLocation.name ||
+        `${lat.toFixed(4)}, ${lon.toFixed(4)}`,
+      temperature: current.ts || current.temperature || 20,
+      humidity: current.rh2m || current.humidity || 60,
+      windSpeed: current.ws10m || current.windSpeed || 5,
+      pressure: current.ps || current.pressure || 1013,
+      condition: current.condition || "Clear",
+      description:
+        current.description ||
+        generateWeatherDescription(
+          current.ts || current.temperature || 20,
+          current.rh2m || current.humidity || 60,
+          current.ws10m || current.windSpeed || 5,
+          current.ps || current.pressure || 1013
+        ),
+      rawTemp: current.ts || current.T2M || current.rawTemp || 22,
+      timestamp: new Date().toISOString(),
+    };
+  };
+
   const fetchWeatherData = async (
     lat: number,
     lon: number,
@@ -291,29 +322,7 @@ const App: React.FC = () => {
       console.log("Fetching weather for coordinates:", { lat, lon });
       const weatherData = await api.getCurrent(lat, lon);
 
-      // Transform API response to match our WeatherData interface
-      const current = weatherData.current || weatherData;
-      const transformedData: WeatherData = {
-        location:
-          locationName ||
-          currentLocation.name ||
-          `${lat.toFixed(4)}, ${lon.toFixed(4)}`,
-        temperature: current.ts || current.temperature || 20,
-        humidity: current.rh2m || current.humidity || 60,
-        windSpeed: current.ws10m || current.windSpeed || 5,
-        pressure: current.ps || current.pressure || 1013,
-        condition: current.condition || "Clear",
-        description:
-          current.description ||
-          generateWeatherDescription(
-            current.ts || current.temperature || 20,
-            current.rh2m || current.humidity || 60,
-            current.ws10m || current.windSpeed || 5,
-            current.ps || current.pressure || 1013
-          ),
-        rawTemp: current.ts || current.T2M || current.rawTemp || 22,
-        timestamp: new Date().toISOString(),
-      };
+      const transformedData = toWeatherData(weatherData, lat, lon, locationName);
 
       setCurrentWeather(transformedData);
       console.log("Weather data updated:", transformedData);
@@ -534,6 +543,15 @@ const App: React.FC = () => {
     fetchWeatherData(coordinates.lat, coordinates.lon);
   }, []);
 
+  // Live updates for the selected location: the server pushes a new reading
+  // only when it changes, instead of every tab polling /current
+  useEffect(() => {
+    const { lat, lon, name } = currentLocation;
+    return api.subscribeCurrent(lat, lon, (weatherData) => {
+      setCurrentWeather(toWeatherData(weatherData, lat, lon, name));
+    });
+  }, [currentLocation.lat, currentLocation.lon]);
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-sky-400 via-blue-500 to-indigo-600">
       {/* Animated Background Elements */}
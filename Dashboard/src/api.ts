@@ -38,6 +38,24 @@ export async function getCurrent(lat: number, lon: number) {
   }
 }
 
+// Subscribe to pushed /current updates for a location. Returns an unsubscribe
+// function; EventSource reconnects on its own if the stream drops.
+export function subscribeCurrent(
+  lat: number,
+  lon: number,
+  onUpdate: (data: any) => void
+): () => void {
+  const params = new URLSearchParams({ lat: String(lat), lon: String(lon) });
+  const source = new EventSource(`${api.defaults.baseURL}/weather/stream?${params}`);
+  source.addEventListener("current", (event) => {
+    onUpdate(JSON.parse((event as MessageEvent).data));
+  });
+  source.onerror = () => {
+    console.warn("Current-conditions stream interrupted, reconnecting...");
+  };
+  return () => source.close();
+}
+
 export async function getForecast(lat: number, lon: number, days = 14) {
   try {
     const { data } = await api.get("/weather/forecast", { params: { lat, lon, days } });
@@ -70,6 +88,21 @@ export async function getWeatherAtTime(lat: number, lon: number, datetime: strin
   }
 }
 
+// Leaflet URL template for heatmap tiles of a parameter, or of the probability
+// of crossing a threshold when one is given
+export function weatherTileUrl(
+  parameter = "temperature",
+  options: { date?: string; threshold?: number; operator?: string } = {}
+): string {
+  const params = new URLSearchParams({ parameter });
+  if (options.date) params.set("date", options.date);
+  if (options.threshold !== undefined) {
+    params.set("threshold", String(options.threshold));
+    params.set("operator", options.operator ?? ">");
+  }
+  return `${api.defaults.baseURL}/weather/tiles/{z}/{x}/{y}.png?${params}`;
+}
+
 export async function getMLPredict(lat: number, lon: number, days = 14) {
   try {
     const { data } = await api.get("/ml/predict", { params: { lat, lon, days } });
@@ -108,6 +141,11 @@ export async function getProbabilityAnalysis(
   }
 }
 
+// Analyses run as background jobs on the server: submit, then long-poll for the
+// result so slow upstream fetches don't trip the 10 second request timeout
+const ANALYSIS_POLL_WAIT = 20;            // seconds the server may hold each poll
+const ANALYSIS_MAX_DURATION = 120000;     // give up after 2 minutes
+
 export async function analyzeWeatherRisk(
   lat: number,
   lon: number,
@@ -119,7 +157,7 @@ export async function analyzeWeatherRisk(
   endDate: string
 ) {
   try {
-    const { data } = await api.post("/ml/analyze", null, {
+    const { data: submitted } = await api.post("/ml/analyze", null, {
       params: {
         lat,
         lon,
@@ -128,10 +166,30 @@ export async function analyzeWeatherRisk(
         parameter,
         operator,
         start_date: startDate,
-        end_date: endDate
+        end_date: endDate,
+        mode: "job"
       }
     });
-    return data;
+
+    // Analyses the server has already computed come back immediately
+    if (submitted.status === "done") {
+      return submitted.result;
+    }
+
+    const giveUpAt = Date.now() + ANALYSIS_MAX_DURATION;
+    while (Date.now() < giveUpAt) {
+      const { data: job } = await api.get(`/ml/analyze/${encodeURIComponent(submitted.analysis_id)}`, {
+        params: { wait: ANALYSIS_POLL_WAIT },
+        timeout: (ANALYSIS_POLL_WAIT + 5) * 1000
+      });
+      if (job.status === "done") {
+        return job.result;
+      }
+      if (job.status === "failed") {
+        throw new Error(`Analysis failed: ${job.error}`);
+      }
+    }
+    throw new Error("Analysis timed out");
   } catch (error) {
     console.error('Failed to analyze weather risk:', error);
     throw error;
@@ -9,6 +9,7 @@ import {
 } from "react-leaflet";
 import { LatLngExpression, Icon, DivIcon } from "leaflet";
 import "leaflet/dist/leaflet.css";
+import { weatherTileUrl } from "../api";
 
 // Fix for default markers in react-leaflet
 // Fix leaflet's default icon issue with webpack
@@ -36,6 +37,8 @@ interface WeatherMapProps {
     windSpeed: number;
     condition: string;
   };
+  // Parameter to draw as a heatmap over the base map (e.g. "temperature")
+  heatmapParameter?: string;
 }
 
 // Component to handle map clicks
@@ -105,6 +108,7 @@ export const WeatherMap: React.FC<WeatherMapProps> = ({
   onLocationSelect,
   currentLocation,
   weatherData,
+  heatmapParameter,
 }) => {
   const [mapCenter, setMapCenter] = useState<LatLngExpression>(center);
 
@@ -130,6 +134,14 @@ export const WeatherMap: React.FC<WeatherMapProps> = ({
           attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
           url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
         />
+        {heatmapParameter && (
+          <TileLayer
+            key={heatmapParameter}
+            url={weatherTileUrl(heatmapParameter)}
+            opacity={0.6}
+            maxNativeZoom={12}
+          />
+        )}
 
         <MapCenterUpdater center={mapCenter} />
         <LocationSelector onLocationSelect={onLocationSelect} />